@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Benchmark chapters.parse_chapter against the previous line-based parser.
+
+Run:  python tests/bench_read_chapter.py [--rounds 5]
+Parses every chapter_*.md in the repo with both parsers and fails if any title
+or body differs, then reports the time per pass over the whole corpus.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from translator.skills.chapters import _CONTENT_HEADING, _TITLE_HEADING, parse_chapter, read_chapter  # noqa: E402
+
+_TIMESTAMP_FOOTER = re.compile(r"^\*?\s*(生成时间|Thời gian tạo)", re.IGNORECASE)
+
+
+def legacy_parse(raw: str) -> Tuple[str, str]:
+    """The line-based parser parse_chapter replaced, kept as the reference."""
+    lines = raw.splitlines()
+
+    title = ""
+    body_start = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if not title:
+            if stripped.startswith("#") and not _TITLE_HEADING.match(stripped) and not _CONTENT_HEADING.match(stripped):
+                title = stripped.lstrip("#").strip()
+            elif _TITLE_HEADING.match(stripped):
+                for j in range(i + 1, len(lines)):
+                    t = lines[j].strip()
+                    if t and t != "---" and not t.startswith("#"):
+                        title = t
+                        break
+        if _CONTENT_HEADING.match(stripped):
+            body_start = i + 1
+            break
+
+    if body_start is None:
+        body_lines = lines[1:] if title else lines
+    else:
+        body_lines = lines[body_start:]
+
+    body = "\n".join(body_lines).strip()
+    body = re.sub(r"^(---\s*\n?)+", "", body).strip()
+    cleaned: List[str] = []
+    for line in body.splitlines():
+        if _TIMESTAMP_FOOTER.match(line.strip()):
+            break
+        cleaned.append(line)
+    body = "\n".join(cleaned).strip()
+    body = re.sub(r"\n?-{3,}\s*$", "", body).strip()
+
+    return title or "Untitled", body
+
+
+# Layout drift the corpus may not cover.
+EDGE_CASES = [
+    "",
+    "---",
+    "# 第1章 标题\r\n## 内容\r\n正文。\r\n---\r\n*生成时间: 2024*\r\n",
+    "## 标题\n\n---\n## 内容\n正文\n",
+    "plain first line\nsecond\n  *Thời gian tạo: x\nfooter",
+    "# T\n## Nội dung\n----\n---  \n\nbody\n\n  ---- \n",
+    "# T\nbody ---\n-----",
+    "\n\n# T\nno heading body\n---\n",
+    "### Tiêu đề\n### still heading\nTên chương\n### Nội dung\nA B\n",
+    "# T\n## 内容\n*生成时间: 2024*\nnot body",
+    "# T\n## Content\npara\n\n   \n \t THỜI GIAN TẠO: x\n",
+    "# T\n## 内容\npara\u2028second\x85third\r\nfourth",
+]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rounds", type=int, default=5, help="Timed passes over the corpus (best is reported)")
+    args = ap.parse_args()
+
+    paths = sorted(p for p in REPO_ROOT.rglob("chapter_*.md") if ".cache" not in p.parts)
+    texts = [p.read_text(encoding="utf-8") for p in paths]
+    mismatches = 0
+    for name, raw in [(str(p.relative_to(REPO_ROOT)), t) for p, t in zip(paths, texts)] + [
+        (f"edge case {i}", t) for i, t in enumerate(EDGE_CASES)
+    ]:
+        doc = parse_chapter(raw)
+        if (doc.title, doc.body) != legacy_parse(raw):
+            mismatches += 1
+            print(f"  MISMATCH {name}")
+    print(f"{len(texts)} chapter file(s) + {len(EDGE_CASES)} edge cases, {mismatches} mismatch(es)")
+
+    def best(fn) -> float:
+        times = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            for raw in texts:
+                fn(raw)
+            times.append(time.perf_counter() - started)
+        return min(times)
+
+    old, new = best(legacy_parse), best(parse_chapter)
+    print(f"legacy parser   {old * 1000:8.1f} ms / pass")
+    print(f"parse_chapter   {new * 1000:8.1f} ms / pass   ({old / new:.1f}x)")
+    started = time.perf_counter()
+    for p in paths:
+        read_chapter(p)
+    print(f"read_chapter    {(time.perf_counter() - started) * 1000:8.1f} ms / pass incl. file reads")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,20 +2,26 @@
 """Offline smoke tests — no LLM/network required.
 
 Run:  python tests/smoke_test.py
-Exercises chapter parsing, paragraph chunking, glossary loading, the tool
+Exercises chapter parsing, paragraph chunking (chars and tokens), glossary loading, the tool
 registry, and QA's deterministic checks (good vs. bad chapter).
 """
 
 from __future__ import annotations
 
+import contextlib
+import os
 import sys
+import tempfile
 from pathlib import Path
+from typing import Iterator
+
+import yaml
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(REPO_ROOT))
 
 from translator.skills import TOOL_REGISTRY, tool_schemas  # noqa: E402
-from translator.skills.chapters import chunk_paragraphs, read_chapter  # noqa: E402
+from translator.skills.chapters import chunk_paragraphs, pack_paragraphs, read_chapter  # noqa: E402
 from translator.skills.glossary import load_glossary  # noqa: E402
 from translator.skills.qa_chapter import qa_chapter  # noqa: E402
 
@@ -36,6 +42,27 @@ def check(name: str, cond: bool) -> None:
         print(f"  FAIL {name}")
 
 
+@contextlib.contextmanager
+def temp_config(data: dict) -> Iterator[Path]:
+    """Run with ``data`` (over the built-in defaults) as the config, via $TRANSLATOR_CONFIG."""
+    from translator.config import load_config
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "config.yaml"
+        path.write_text(yaml.safe_dump(data, allow_unicode=True), encoding="utf-8")
+        previous = os.environ.get("TRANSLATOR_CONFIG")
+        os.environ["TRANSLATOR_CONFIG"] = str(path)
+        load_config.cache_clear()
+        try:
+            yield path
+        finally:
+            if previous is None:
+                os.environ.pop("TRANSLATOR_CONFIG", None)
+            else:
+                os.environ["TRANSLATOR_CONFIG"] = previous
+            load_config.cache_clear()
+
+
 def main() -> int:
     # Registry / schemas
     check("registry has 7 tools", len(TOOL_REGISTRY) == 7)
@@ -52,6 +79,343 @@ def main() -> int:
     chunks = chunk_paragraphs("a\n\n" * 50 + ("x" * 100), max_chars=120)
     check("chunking splits >max_chars", len(chunks) > 1)
 
+    # Token packing: same chunk count as greedy, but no tiny trailing chunk.
+    from translator.llm.tokens import heuristic_tokens  # noqa: E402
+
+    text = "\n\n".join(["段" * 100] * 9 + ["尾" * 5])
+    packed = [heuristic_tokens(c) for c in pack_paragraphs(text, 450, heuristic_tokens)]
+    check("token packing stays within budget", len(packed) == 3 and max(packed) <= 450)
+    check("token packing balances chunk sizes", min(packed) > 0.8 * max(packed))
+
+    # Provider usage: Anthropic's input_tokens excludes cache reads.
+    from translator.llm.usage import anthropic_usage  # noqa: E402
+
+    u = anthropic_usage({"usage": {"input_tokens": 10, "cache_read_input_tokens": 990, "output_tokens": 5}})
+    check("cached prompt tokens are counted", u.prompt_tokens == 1000 and u.cached_tokens == 990)
+    from translator.llm.provider import Endpoint, _openai_request  # noqa: E402
+
+    _, _, payload = _openai_request("sys", "user", Endpoint(base_url="http://x/v1"), "m", 0.3, None, stream=True)
+    check("streamed OpenAI requests ask for usage", payload.get("stream_options") == {"include_usage": True})
+
+    # Response cache: hits, max age, LRU eviction, and the run-wide bypass.
+    import time  # noqa: E402
+
+    from translator.llm import cache as llm_cache  # noqa: E402
+    from translator.llm.router import EndpointPool  # noqa: E402
+    from translator.llm.roles import _cacheable  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rc = llm_cache.ResponseCache(Path(tmp) / "responses.sqlite", max_bytes=25, max_age_s=3600)
+        for key in ("a", "b", "c"):
+            rc.put(key, key * 10)
+            time.sleep(0.01)
+        hit = rc.get("a")
+        rc.evict()  # 30 bytes > 25: drops the least recently used ("b")
+        check("response cache serves a stored reply", hit == "a" * 10 and rc.get("c") == "c" * 10)
+        check("response cache evicts least recently used first", rc.get("b") is None and rc.get("a") == "a" * 10)
+        stale = llm_cache.ResponseCache(Path(tmp) / "responses.sqlite", max_bytes=1 << 20, max_age_s=-1)
+        check("response cache ignores entries past max age", stale.get("a") is None)
+    os.environ["TRANSLATOR_NO_CACHE"] = "1"
+    env_off = llm_cache.response_cache() is None
+    del os.environ["TRANSLATOR_NO_CACHE"]
+    llm_cache.disable()
+    cli_off = llm_cache.response_cache() is None
+    llm_cache._disabled = False
+    check("TRANSLATOR_NO_CACHE and --no-cache bypass the response cache", env_off and cli_off)
+    member, paid = Endpoint(base_url="http://a/v1", name="a"), Endpoint(provider="anthropic", name="paid")
+    pool = EndpointPool([(member, 1.0)], fallback=(paid, "claude"))
+    check(
+        "pooled replies from the fallback are not cached",
+        _cacheable(pool, [member]) and not _cacheable(pool, [paid]) and _cacheable(None, []),
+    )
+
+    # Endpoint pool: least score wins, saturated/ejected members are skipped, fallback last.
+    from translator.llm import router  # noqa: E402
+
+    # Hosted-API members: their re-admission probe passes without a network call.
+    fast, slow, spare = (
+        Endpoint(provider="anthropic", name=f"smoke-{n}", pool_size=2) for n in ("fast", "slow", "spare")
+    )
+    router.stats_for(fast).latency_s, router.stats_for(slow).latency_s = 1.0, 3.0
+    pool = EndpointPool([(fast, 1.0), (slow, 1.0)], fallback=(spare, "other"))
+    first, second = pool.pick("m")[0], pool.pick("m")[0]  # fast: 1.0, then 2.0 vs slow's 3.0
+    third = pool.pick("m")[0]  # fast is saturated (2 in flight)
+    check("pool picks the lowest score and skips saturated members", (first, second, third) == (fast, fast, slow))
+    for ep in (fast, fast, slow):
+        pool.record(ep, True, 1.0)
+    for _ in range(router.FAILURE_THRESHOLD):
+        pool.pick("m")
+        pool.record(fast, False, 1.0)
+    ejected = router.stats_for(fast).open_until > time.time() and pool.pick("m")[0] == slow
+    pool.record(slow, True, 3.0)
+    router.stats_for(fast).open_until = time.time() - 1  # cooldown over
+    readmitted = pool.pick("m")[0] == fast and router.stats_for(fast).failures == router.FAILURE_THRESHOLD - 1
+    pool.record(fast, True, 1.0)
+    check("pool ejects a failing member and re-admits it half-open after the probe", ejected and readmitted)
+    router.stats_for(slow).open_until = time.time() + 60
+    router.stats_for(fast).inflight = 2
+    fallback = pool.pick("m")
+    router.stats_for(fast).inflight = 0
+    router.stats_for(slow).open_until = 0.0
+    pool.record(spare, True, 1.0)
+    check(
+        "pool uses the fallback only when every member is out",
+        fallback == (spare, "other") and pool.pick("m")[0] == fast,
+    )
+
+    # Rate limiter: buckets make later callers wait; a 429 blocks the endpoint for everyone.
+    from translator.llm.ratelimit import RateLimiter, _debit  # noqa: E402
+
+    balance, first = _debit(None, 1, 60, 0.0)  # 1 req/s, a 10 s burst
+    drained = [_debit(balance - n, 1, 60, 0.0)[1] for n in range(10)]
+    check("rate buckets wait only once the burst is spent", first == 0.0 and drained[8] == 0.0 and drained[9] == 1.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        rl = RateLimiter(Path(tmp) / "ratelimit.sqlite")
+        unlimited = rl.reserve("local", 100, None, None)
+        blocked_s = rl.observe("local", 429, {"Retry-After": "30"})
+        check(
+            "a 429 with Retry-After blocks the endpoint",
+            unlimited == 0.0 and blocked_s == 30.0 and 29.0 < rl.reserve("local", 100, None, None) <= 30.0,
+        )
+
+    # Telemetry latency histogram: percentile estimate lands in the right bucket.
+    from translator.llm.telemetry import Histogram  # noqa: E402
+
+    h = Histogram()
+    for v in [1.5] * 90 + [50.0] * 10:
+        h.observe(v)
+    check("latency histogram percentiles", 1 <= h.quantile(0.5) <= 2.5 and 45 <= h.quantile(0.95) <= 60)
+
+    # Hedging: a stalled primary is overtaken by the duplicate and cancelled.
+    from translator.llm.hedge import HedgePolicy  # noqa: E402
+
+    policy = HedgePolicy(min_delay_s=0.05, max_extra=1.0, min_samples=1)
+    policy.observe(0, 0.01)
+    legs = []
+
+    def leg(cancel):
+        legs.append(cancel)
+        if len(legs) == 1:
+            cancel.wait(5)
+            raise RuntimeError("stalled")
+        return "hedge"
+
+    check("hedged call returns the faster leg", policy.run(leg) == "hedge" and legs[0].is_set())
+
+    # Stream guards: a retry (a new Stream) is guarded from its first characters again.
+    from translator.llm.streaming import Stream, StreamAborted, repetition_guard  # noqa: E402
+
+    def aborted_at(guard):
+        stream = Stream(({"t": "vòng lặp "} for _ in range(60)), lambda e: e["t"], lambda: None, abort_if=guard)
+        try:
+            stream.read()
+        except StreamAborted:
+            return len(stream.text)
+        return None
+
+    guard = repetition_guard()
+    first = aborted_at(guard)
+    check("stream guard restarts for each attempt", first is not None and aborted_at(guard) == first)
+
+    # Mock LLM: glossary terms come out as their Hán Việt, no CJK is left.
+    from translator.llm.mock_server import pseudo_translate  # noqa: E402
+
+    mocked = pseudo_translate("江秋秋说：“你好。”", [("江秋秋", "Giang Thu Thu")])
+    check("mock translation keeps glossary terms", "Giang Thu Thu" in mocked and "你" not in mocked)
+
+    # Cassette: a recorded call replays by prompt, whatever endpoint recorded it.
+    from translator.llm.cassette import Cassette  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tape = Cassette(Path(tmp) / "tape.jsonl", "record")
+        tape.record(
+            provider="openai", endpoint="prod", model="m", role="translator", temperature=0.25, max_tokens=None,
+            system="sys", user="你好", text="Xin chào", wall_s=2.0, ttft_s=None, attempts=1, usage=None,
+        )
+        replay = Cassette(Path(tmp) / "tape.jsonl", "replay", latency_scale=0.5)
+        take = replay.take("sys", "你好", 0.25, None)
+        check(
+            "cassette replays a recorded reply",
+            take is not None and take.text == "Xin chào" and replay.delay_s(take) == 1.0
+            and replay.take("sys", "khác", 0.25, None) is None,
+        )
+
+    # Chapter cache: written output is served from memory; an outside edit is seen.
+    from translator.skills.chapters import write_chapter  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "chapter_0001.md"
+        write_chapter(path, "# Chương 1\n\nMột.")
+        first = read_chapter(path)
+        cached = first is read_chapter(path)
+        path.write_text("# Chương 1\n\nHai, dài hơn.", encoding="utf-8")
+        check("chapter cache hits, then sees edits", cached and read_chapter(path).body == "Hai, dài hơn.")
+
+    # Chunk checkpoint: finished requests survive a crash, a torn last line is ignored.
+    from translator.skills.translate_chapter import ChunkCheckpoint  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = ChunkCheckpoint(Path(tmp) / ".chapter_0001.md.chunks.jsonl", "m")
+        saved.put(saved.key("sys", "第一段"), "Đoạn một")
+        with open(saved.path, "a", encoding="utf-8") as f:
+            f.write('{"key": "torn')
+        resumed = ChunkCheckpoint(saved.path, "m")
+        check(
+            "chunk checkpoint resumes finished chunks",
+            resumed.get(resumed.key("sys", "第一段")) == "Đoạn một"
+            and resumed.get(ChunkCheckpoint(saved.path, "other-model").key("sys", "第一段")) is None,
+        )
+
+    # Translation memory: exact repeats are served, near repeats become hints.
+    from translator.skills.memory import TranslationMemory  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tm = TranslationMemory(Path(tmp) / "tm.sqlite")
+        notice = "【系统提示：宿主完成每日签到，奖励积分一百点。】"
+        tm.put_many("book", "translate", [(notice, "[Hệ thống: ký chủ điểm danh, thưởng 100 điểm.]", "t")])
+        check(
+            "translation memory serves repeats and hints near ones",
+            tm.lookup("book", "translate", notice, "t") is not None
+            and tm.lookup("book", "translate", notice, "glossary changed") is None
+            and len(tm.similar("book", "translate", notice.replace("一百", "两百"))) == 1,
+        )
+
+    # Batched titles: a numbered reply is accepted only if it maps one-to-one.
+    from translator.skills.titles import parse_numbered  # noqa: E402
+
+    check(
+        "batched titles map back one-to-one",
+        parse_numbered("2. Chương 2: Về nhà\n1. Chương 1: Xuất phát", 2) == ["Chương 1: Xuất phát", "Chương 2: Về nhà"]
+        and parse_numbered("1. Chương 1\n1. Chương 2", 2) is None
+        and parse_numbered("1. Chương 1\n2. 第二章", 2) is None,
+    )
+
+    # Chapter packing: a packed reply splits back per chapter, or not at all.
+    from translator.skills.packing import split_packed  # noqa: E402
+
+    sources = ["第一页。" * 20, "第二页。" * 30]
+    check(
+        "packed chapters split back on their markers",
+        split_packed("<<<1>>>\n" + "Một." * 20 + "\n\n<<<2>>>\n" + "Hai." * 30, sources) == ["Một." * 20, "Hai." * 30]
+        and split_packed("<<<1>>>\n" + "Một." * 20 + "\n\n<<<1>>>\n" + "Hai." * 30, sources) is None
+        and split_packed("<<<1>>>\n" + "Một." * 50 + "\n\n<<<2>>>\nHai.", sources) is None,
+    )
+
+    # Pack budget: the packed chapters' glossary terms can push a pack past the context window.
+    from translator.llm.prompts import PromptAsset  # noqa: E402
+    from translator.skills.glossary import glossary_prompt  # noqa: E402
+    from translator.skills.packing import _fit_packs, _pack_fits, _packs  # noqa: E402
+
+    with temp_config({"roles": {"translator": {"context_window": 760}}, "pipeline": {"output_expansion": 1.0}}):
+        rules = PromptAsset("<test>", "Quy tắc.", "rules")
+        term = {"chinese": "江秋秋", "hanviet": "Giang Thu Thu", "note": "ghi chú " * 80}
+        bodies = ["江秋秋" + "走" * 97, "山" * 100]
+        packs = _packs([(f"chapter_{i:04d}.md", "", b, len(b)) for i, b in enumerate(bodies, 1)], 250)
+        plain = _fit_packs(packs, _pack_fits(lambda text: glossary_prompt(rules, []), len, 4000))
+        with_terms = _fit_packs(
+            packs, _pack_fits(lambda text: glossary_prompt(rules, [term] if "江秋秋" in text else []), len, 4000)
+        )
+    check("packs that outgrow the window with their glossary are split", len(plain) == 1 and with_terms == [])
+
+    # Batch mode: prepare -> submit (local backend, mock server) -> collect round-trips custom_ids.
+    from translator.llm.mock_server import MockConfig, MockLLMServer  # noqa: E402
+    from translator.workflow import batch  # noqa: E402
+
+    server = MockLLMServer(MockConfig(latency_ms=1, jitter=0)).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp, temp_config(
+            {
+                "endpoints": {"mock": {"provider": "openai", "base_url": server.openai_base_url, "api_key": "mock"}},
+                "roles": {"translator": {"endpoint": "mock", "model": "mock-model"}},
+                "cache": {"enabled": False},
+                "rate_limit": {"enabled": False},
+                "telemetry": {"enabled": False},
+                "pipeline": {"chunk_chars": 40},
+            }
+        ):
+            (Path(tmp) / "raw_chinese").mkdir()
+            for n, paragraphs in ((1, ["江秋秋来了。"]), (2, ["第一段" * 8 + "。", "第二段" * 8 + "。"])):
+                write_chapter(
+                    Path(tmp) / "raw_chinese" / f"chapter_{n:04d}.md", f"# 第{n}章\n\n## Nội dung\n\n" + "\n\n".join(paragraphs)
+                )
+            name = batch.prepare(tmp, name="smoke")
+            submitted = batch.submit(tmp, name, "local", workers=2)
+            collected = batch.collect(tmp, name)
+            second = read_chapter(Path(tmp) / "raw_vietnamese" / "chapter_0002.md")
+            requests = len((Path(tmp) / "batches" / name / "requests.jsonl").read_text(encoding="utf-8").splitlines())
+    finally:
+        server.stop()
+    check(
+        "batch prepare/submit/collect reassembles chapters",
+        submitted["status"] == "completed" and requests == 5
+        and collected == {"written": ["chapter_0001.md", "chapter_0002.md"], "incomplete": []}
+        and not second.has_cjk_body() and len(second.body.split("\n\n")) == 2 and "第" not in second.title,
+    )
+
+    # Compiled glossary: one scan finds nested and overlapping terms with positions.
+    from translator.skills.glossary import CompiledGlossary  # noqa: E402
+
+    found = CompiledGlossary([{"chinese": "江秋秋", "hanviet": "Giang Thu Thu"}, {"chinese": "秋秋", "hanviet": "Thu Thu"}]).find(
+        "江秋秋和秋秋秋"
+    )
+    check("compiled glossary finds every occurrence", [m.positions for m in found] == [[0], [1, 4, 5]])
+
+    # Glossary registry: parsed once per file version, refreshed by glossary_update.
+    from translator.skills import glossary as glo  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as tmp:
+        glo.glossary_update({"book_id": tmp, "chinese": "江秋秋", "hanviet": "Giang Thu Thu"})
+        glo.load_glossary(tmp)
+        loads = glo.registry_stats["loads"]
+        glo.compiled_glossary(tmp)  # same version: no re-parse
+        glo.glossary_update({"book_id": tmp, "terms": [{"chinese": "秋秋", "hanviet": "Thu Thu"}]})
+        check(
+            "glossary registry caches and invalidates",
+            len(glo.load_glossary(tmp)) == 2 and glo.registry_stats["loads"] == loads + 1,
+        )
+        check("glossary change log compacts", glo.compact_glossary(tmp) == 2 and len(glo.load_glossary(tmp)) == 2)
+        kept = glo.update_terms(tmp, [{"chinese": "秋秋", "hanviet": "Thu"}, {"chinese": "星网", "hanviet": "Tinh Võng"}], replace=False)
+        check(
+            "update_terms without replace keeps existing terms",
+            (kept["added"], kept["skipped"]) == (1, 1)
+            and {t["chinese"]: t["hanviet"] for t in glo.load_glossary(tmp)}["秋秋"] == "Thu Thu",
+        )
+
+    # Prompt assets: a rules file is read once per version; rendered prompts carry their digest.
+    from translator.llm import prompts  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "EDITOR.md"
+        path.write_text("Quy tắc.", encoding="utf-8")
+        rules = prompts.load_asset(path, "mặc định")
+        system = glo.glossary_prompt(rules, [{"chinese": "江秋秋", "hanviet": "Giang Thu Thu"}])
+        cached = prompts.load_asset(path, "mặc định") is rules and glo.glossary_prompt(
+            rules, [{"chinese": "江秋秋", "hanviet": "Giang Thu Thu"}]
+        ) is system
+        path.write_text("Quy tắc mới, dài hơn.", encoding="utf-8")
+        check(
+            "prompt assets load once per version and expose their digest",
+            cached and system.digest == prompts.prompt_digest(str(system))
+            and prompts.load_asset(path, "mặc định").digest != rules.digest,
+        )
+
+    # Term index: reterm targets only chapters whose text lacks the current rendering.
+    from translator.skills.term_index import term_index  # noqa: E402
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for stage, chapters in (("raw_chinese", ["江秋秋来了。", "没有人。"]), ("edited_vietnamese", ["Giang Thu Thu tới.", "Không ai."])):
+            (Path(tmp) / stage).mkdir()
+            for n, body in enumerate(chapters, 1):
+                write_chapter(Path(tmp) / stage / f"chapter_{n:04d}.md", f"# Chương {n}\n\n## Nội dung\n\n{body}")
+        glo.glossary_update({"book_id": tmp, "chinese": "江秋秋", "hanviet": "Giang Thu Thu"})
+        fresh = term_index(tmp).stale_chapters()
+        glo.glossary_update({"book_id": tmp, "chinese": "江秋秋", "hanviet": "Giang Thu"})
+        index = term_index(tmp)
+        check(
+            "term index scopes reterm to affected chapters",
+            fresh == {} and index.stale_chapters() == {"chapter_0001.md": ["江秋秋"]} and index.scanned == 0,
+        )
+
     # Glossary
     check("biqu glossary loads terms", len(load_glossary(BOOK)) >= 1)
 
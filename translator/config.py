@@ -43,10 +43,55 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "critic": {"endpoint": "local", "model": "${LLM_MODEL}", "temperature": 0.3},
         "glossary": {"endpoint": "local", "model": "${LLM_MODEL}", "temperature": 0.1},
     },
+    # On-disk LLM response cache (translator.llm.cache).
+    "cache": {
+        "enabled": True,
+        "path": ".cache/llm_responses.sqlite",
+        "max_mb": 512,
+        "max_age_days": 30,
+    },
+    # Host-wide rpm/tpm token buckets (translator.llm.ratelimit).
+    "rate_limit": {
+        "enabled": True,
+        "path": ".cache/ratelimit.sqlite",
+    },
+    "telemetry": {
+        "enabled": True,
+        "trace": ".cache/telemetry/calls-{run}.jsonl",
+        "textfile": None,
+        "port": None,
+    },
+    # Paragraph-level translation memory (translator.skills.memory).
+    "memory": {
+        "enabled": False,
+        "path": ".cache/translation_memory.sqlite",
+        "shared": False,
+        "min_chars": 12,
+        "fuzzy_threshold": 0.8,
+        "max_hints": 5,
+    },
+    # Record/replay of LLM traffic (translator.llm.cassette); mode: record | replay.
+    "cassette": {
+        "mode": None,
+        "path": ".cache/cassettes/session-{run}.jsonl",
+        "latency_scale": 1.0,
+        "on_miss": "error",
+    },
     "pipeline": {
         "chunk_chars": 4000,
+        # Token-aware chunking (translator.llm.tokens): an explicit budget, or
+        # derived from roles.<role>.context_window and the output expansion.
+        "chunk_tokens": None,
+        "output_expansion": 1.6,
+        "prompt_layout": "per_chunk",  # or "stable_prefix" (provider prompt caching)
         "max_fix_attempts": 2,
-        "request_delay_s": 1.0,
+        "request_delay_s": 0.0,
+        "stream": False,
+        "chapter_cache_mb": 64,
+        "chunk_concurrency": 4,  # translator requests in flight per chapter (1 = sequential)
+        "batch_titles": True,  # translate a run's titles up front in packed requests
+        "title_batch": 100,  # titles per packed request
+        "pack_chapters": True,  # translate runs of short chapters in one request each
     },
 }
 
@@ -1,6 +1,10 @@
-"""Model-agnostic LLM access."""
+"""Model-agnostic LLM access.
 
-from translator.llm.provider import chat
-from translator.llm.roles import chat_as
+``achat`` (the raw async client) lives in ``translator.llm.aio`` because it needs
+the optional httpx dependency; ``achat_as`` imports it lazily.
+"""
 
-__all__ = ["chat", "chat_as"]
+from translator.llm.provider import chat, stream_chat
+from translator.llm.roles import achat_as, chat_as, stream_as
+
+__all__ = ["chat", "chat_as", "achat_as", "stream_chat", "stream_as"]
@@ -0,0 +1,138 @@
+"""Native asyncio chat client.
+
+``achat()`` is the awaitable twin of ``provider.chat()``: same backends, same
+request payloads, same retry/backoff semantics — but on ``httpx.AsyncClient`` so
+one process can keep many requests in flight without an OS thread each.
+
+Each endpoint gets one pooled client and an ``asyncio.Semaphore`` capping
+in-flight requests at ``max_concurrency`` (falls back to ``pool_size``), both set
+per endpoint in config.yaml. Requests draw from the same host-wide rpm/tpm
+buckets as the blocking client; the limiter's SQLite transactions (which can
+wait on another process's lock) run in worker threads, off the event loop.
+
+Optional dependency: ``pip install -r requirements-async.txt``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from translator.llm.provider import (
+    Endpoint,
+    LLMError,
+    RateLimited,
+    _backend,
+    backoff_s,
+    cassette_record,
+    cassette_take,
+    _usage_parser,
+    check_response,
+    pace_s,
+    record_call,
+    record_usage,
+    request_tokens,
+)
+from translator.llm.ratelimit import limiter
+
+logger = logging.getLogger(__name__)
+
+# Clients and semaphores are bound to the event loop that created them.
+_Key = Tuple[Endpoint, asyncio.AbstractEventLoop]
+_clients: Dict[_Key, httpx.AsyncClient] = {}
+_slots: Dict[_Key, asyncio.Semaphore] = {}
+
+
+def _limit(ep: Endpoint) -> int:
+    return ep.max_concurrency or ep.pool_size
+
+
+def _client(ep: Endpoint) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    key = (ep, asyncio.get_running_loop())
+    client = _clients.get(key)
+    if client is None:
+        cap = _limit(ep)
+        limits = httpx.Limits(max_connections=cap, max_keepalive_connections=cap if ep.keepalive else 0)
+        client = _clients[key] = httpx.AsyncClient(http2=ep.http2, limits=limits)
+        _slots[key] = asyncio.Semaphore(cap)
+    return client, _slots[key]
+
+
+async def aclose_clients() -> None:
+    """Close the pooled clients owned by the running event loop."""
+    loop = asyncio.get_running_loop()
+    for key in [k for k in _clients if k[1] is loop]:
+        await _clients.pop(key).aclose()
+        _slots.pop(key, None)
+
+
+async def achat(
+    system: str,
+    user: str,
+    *,
+    endpoint: Endpoint,
+    model: str,
+    temperature: float = 0.3,
+    max_tokens: Optional[int] = None,
+    retries: int = 3,
+    timeout: int = 180,
+    cache_prefix: bool = False,
+    role: Optional[str] = None,
+) -> str:
+    """Awaitable ``chat()``: return the assistant text for one system+user turn.
+
+    Raises ``LLMError`` if all retries fail.
+    """
+    provider = (endpoint.provider or "openai").lower()
+    build, parse = _backend(provider)
+    tokens = request_tokens(system, user, max_tokens)
+    last_err: Optional[str] = None
+    started = time.monotonic()
+
+    replay = cassette_take(system, user, temperature, max_tokens, endpoint=endpoint, model=model, role=role)
+    if replay is not None:
+        take, delay = replay
+        await asyncio.sleep(delay)
+        usage = record_usage(endpoint, model, take.usage)
+        record_call(role, endpoint, model, started, 1, usage=usage, ttft_s=take.ttft_s)
+        return take.text
+
+    for attempt in range(1, retries + 1):
+        paced = False
+        try:
+            url, headers, payload = build(
+                system, user, endpoint, model, temperature, max_tokens, cache_prefix=cache_prefix
+            )
+            wait = await asyncio.to_thread(pace_s, endpoint, tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            client, slots = _client(endpoint)
+            # Hold a slot only while the request is on the wire, not while backing off.
+            async with slots:
+                resp = await client.post(url, headers=headers, json=payload, timeout=timeout)
+            await asyncio.to_thread(check_response, endpoint, resp.status_code, resp.headers, lambda: resp.text)
+            data = resp.json()
+            text = parse(data)
+            usage = record_usage(endpoint, model, _usage_parser(provider)(data))
+            if text is not None and text.strip():
+                record_call(role, endpoint, model, started, attempt, usage=usage)
+                cassette_record(
+                    system, user, temperature, max_tokens, text.strip(), endpoint=endpoint, model=model,
+                    role=role, started=started, attempts=attempt, usage=usage,
+                )
+                return text.strip()
+            last_err = "empty response"
+        except Exception as e:  # noqa: BLE001 - surfaced via LLMError below
+            last_err = str(e)
+            paced = isinstance(e, RateLimited) and limiter() is not None
+            logger.warning("LLM call failed (attempt %d/%d): %s", attempt, retries, e)
+
+        if attempt < retries and not paced:
+            await asyncio.sleep(backoff_s(attempt))
+
+    record_call(role, endpoint, model, started, retries, error=last_err)
+    raise LLMError(f"{provider}:{model} failed after {retries} attempts: {last_err}")
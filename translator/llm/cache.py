@@ -0,0 +1,181 @@
+"""Content-addressed, on-disk cache of LLM responses.
+
+Sits underneath ``chat_as``: a call whose inputs (role, endpoint, model,
+temperature, max_tokens, system prompt digest, user text) hash to a key already in the
+cache returns the stored reply without touching the network. Re-running a stage
+with ``--force`` or retrying a crashed Prefect task therefore only pays for
+chunks whose prompt actually changed.
+
+Backed by one SQLite file (safe across threads and processes), evicted by age
+and by total size (least recently used first). Configured under ``cache:`` in
+config.yaml; bypass per call with ``chat_as(..., cache=False)`` or for a whole
+run with ``--no-cache`` / ``TRANSLATOR_NO_CACHE=1``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from translator.config import REPO_ROOT, load_config
+from translator.llm.prompts import prompt_digest
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key       TEXT PRIMARY KEY,
+    text      TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used);
+"""
+
+# Run eviction once per this many writes rather than on every put.
+_EVICT_EVERY = 100
+
+
+def cache_key(
+    role: str,
+    provider: str,
+    base_url: Optional[str],
+    model: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    system: str,
+    user: str,
+) -> str:
+    """sha256 over every input that can change the completion.
+
+    The system prompt enters by its digest (translator.llm.prompts), computed
+    once per rendered prompt rather than re-hashed on every call.
+    """
+    blob = json.dumps(
+        [role, provider, base_url or "", model, round(float(temperature), 4), max_tokens, prompt_digest(system), user],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response store with LRU size and max-age eviction."""
+
+    def __init__(self, path: Path, *, max_bytes: int, max_age_s: float) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age_s:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, text: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, text, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, text, len(text.encode("utf-8")), now, now),
+            )
+            self.writes += 1
+            if self.writes % _EVICT_EVERY == 0:
+                self._evict(now)
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        with self._lock:
+            return self._evict(time.time())
+
+    def _evict(self, now: float) -> int:
+        removed = self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age_s,)).rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            doomed = []
+            for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                doomed.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            removed += len(doomed)
+        self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+_disabled = False
+
+
+def disable() -> None:
+    """Bypass the cache for the rest of this process (``--no-cache``)."""
+    global _disabled
+    _disabled = True
+
+
+def response_cache() -> Optional[ResponseCache]:
+    """The process-wide cache, or None when disabled in config/env/CLI."""
+    global _cache
+    if _disabled or os.getenv("TRANSLATOR_NO_CACHE"):
+        return None
+    cfg = load_config().get("cache", {}) or {}
+    if not cfg.get("enabled", True):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                path = Path(cfg.get("path", ".cache/llm_responses.sqlite"))
+                if not path.is_absolute():
+                    path = REPO_ROOT / path
+                _cache = ResponseCache(
+                    path,
+                    max_bytes=int(float(cfg.get("max_mb", 512)) * 1024 * 1024),
+                    max_age_s=float(cfg.get("max_age_days", 30)) * 86400,
+                )
+    return _cache
+
+
+def stats() -> Dict[str, int]:
+    """Hit/miss counters for this process (all zero if the cache is off)."""
+    if _cache is None:
+        return {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "entries": 0, "bytes": 0}
+    return _cache.stats()
@@ -0,0 +1,237 @@
+"""Record and replay LLM traffic as a JSONL "cassette".
+
+Recording appends every successful ``chat()`` / ``achat()`` call to the
+cassette: the prompt, the reply, the reported usage, the wall time and TTFT
+(retries included, as the caller experienced them), the attempts and the
+telemetry labels (book, chapter). Replaying answers calls from the cassette
+instead of the network, sleeping the recorded wall time scaled by
+``latency_scale`` (0 = instant), so a production session can be rerun offline
+to measure how a change to chunking, concurrency or caching moves throughput.
+
+    python -m translator.workflow.pipeline --book 52shuku/bjXRF --range 1-100 --record .cache/cassettes/prod.jsonl
+    python -m translator.workflow.pipeline --book ... --replay .cache/cassettes/prod.jsonl --replay-scale 0.1
+
+Calls are matched on system prompt, user text, temperature and max_tokens,
+not on endpoint or model, so a cassette recorded against a production pool
+replays under any local config. A prompt recorded more than once is replayed
+in recording order, and the last reply is reused once they run out. A prompt
+the cassette does not have (e.g. after a chunking change) raises ``LLMError``
+with ``on_miss: error``, or goes to the configured endpoint with
+``on_miss: live``. Point that endpoint at ``translator.llm.mock_server`` to
+keep a replay fully offline (``translator.workflow.benchmark --replay``).
+
+Each system prompt is stored once (``{"type": "prompt"}`` lines, by sha256)
+and referenced from the ``{"type": "call"}`` lines, since chunks of one book
+share a few long system prompts. The response cache sits above the provider
+layer, so record with ``--no-cache`` to capture every call. Replaying turns
+that cache off.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Deque, Dict, Optional
+
+from translator.config import REPO_ROOT, load_config
+from translator.llm import telemetry
+from translator.llm.prompts import prompt_digest
+from translator.llm.usage import Usage
+
+logger = logging.getLogger(__name__)
+
+MODES = ("record", "replay")
+ON_MISS = ("error", "live")
+
+
+def request_key(system: str, user: str, temperature: float, max_tokens: Optional[int]) -> str:
+    """sha256 over the inputs a recorded reply is matched on."""
+    blob = json.dumps(
+        [system, user, round(float(temperature), 4), max_tokens], ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Take:
+    """One recorded reply, as served back on replay."""
+
+    text: str
+    wall_s: float
+    ttft_s: Optional[float]
+    usage: Usage
+
+
+class Cassette:
+    """A JSONL cassette opened for recording or replay."""
+
+    def __init__(self, path: Path, mode: str, *, latency_scale: float = 1.0, on_miss: str = "error") -> None:
+        if mode not in MODES:
+            raise ValueError(f"cassette mode must be one of {MODES}, got {mode!r}")
+        if on_miss not in ON_MISS:
+            raise ValueError(f"cassette on_miss must be one of {ON_MISS}, got {on_miss!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.on_miss = on_miss
+        self.counts = {"recorded": 0, "replayed": 0, "missed": 0}
+        self._lock = threading.Lock()
+        self._prompts: set = set()
+        self._takes: Dict[str, Deque[Take]] = {}
+        if mode == "replay":
+            self._load()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists():  # appending to an earlier recording: don't repeat its prompts
+                self._prompts = {r["sha"] for r in self._lines() if r.get("type") == "prompt"}
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def _lines(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _load(self) -> None:
+        prompts: Dict[str, str] = {}
+        calls = 0
+        for r in self._lines():
+            if r.get("type") == "prompt":
+                prompts[r["sha"]] = r["text"]
+            elif r.get("type") == "call":
+                key = request_key(prompts[r["system"]], r["user"], r["temperature"], r["max_tokens"])
+                take = Take(r["text"], float(r["wall_s"]), r.get("ttft_s"), Usage(**(r.get("usage") or {})))
+                self._takes.setdefault(key, deque()).append(take)
+                calls += 1
+        logger.info("cassette %s: %d call(s), %d distinct prompt(s)", self.path, calls, len(self._takes))
+
+    def take(self, system: str, user: str, temperature: float, max_tokens: Optional[int]) -> Optional[Take]:
+        """The next recorded reply for this request, or None if it was never recorded."""
+        key = request_key(system, user, temperature, max_tokens)
+        with self._lock:
+            takes = self._takes.get(key)
+            if not takes:
+                self.counts["missed"] += 1
+                return None
+            self.counts["replayed"] += 1
+            return takes.popleft() if len(takes) > 1 else takes[0]
+
+    def delay_s(self, take: Take) -> float:
+        return max(0.0, take.wall_s * self.latency_scale)
+
+    def record(
+        self,
+        *,
+        provider: str,
+        endpoint: str,
+        model: str,
+        role: Optional[str],
+        temperature: float,
+        max_tokens: Optional[int],
+        system: str,
+        user: str,
+        text: str,
+        wall_s: float,
+        ttft_s: Optional[float],
+        attempts: int,
+        usage: Optional[Usage],
+    ) -> None:
+        sha = prompt_digest(system)
+        call = {
+            "type": "call",
+            "ts": round(time.time(), 3),
+            "role": role,
+            "provider": provider,
+            "endpoint": endpoint,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "system": sha,
+            "user": user,
+            "text": text,
+            "wall_s": round(wall_s, 4),
+            "ttft_s": None if ttft_s is None else round(ttft_s, 4),
+            "attempts": attempts,
+            "usage": asdict(usage) if usage is not None else None,
+            "labels": telemetry.labels(),
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                if sha not in self._prompts:
+                    f.write(json.dumps({"type": "prompt", "sha": sha, "text": system}, ensure_ascii=False) + "\n")
+                    self._prompts.add(sha)
+                f.write(json.dumps(call, ensure_ascii=False) + "\n")
+            self.counts["recorded"] += 1
+
+
+# --- Process-wide cassette ----------------------------------------------------------
+
+_cassette: Optional[Cassette] = None
+_configured = False
+_cassette_lock = threading.Lock()
+
+
+def _path(value: str) -> Path:
+    path = Path(value.format(run=time.strftime("%Y%m%d-%H%M%S")))
+    return path if path.is_absolute() else REPO_ROOT / path
+
+
+def start(mode: str, path: str, *, latency_scale: float = 1.0, on_miss: str = "error") -> Cassette:
+    """Record to / replay from ``path`` for the rest of this process."""
+    global _cassette, _configured
+    with _cassette_lock:
+        _cassette = Cassette(_path(path), mode, latency_scale=latency_scale, on_miss=on_miss)
+        _configured = True
+    if mode == "replay":
+        from translator.llm import cache as llm_cache
+
+        llm_cache.disable()  # a cached reply would skip the recorded latency
+    logger.info("cassette: %s %s", "replaying" if mode == "replay" else "recording to", _cassette.path)
+    return _cassette
+
+
+def active() -> Optional[Cassette]:
+    """The process-wide cassette from ``start()`` or ``cassette:`` in config, if any."""
+    global _configured
+    if not _configured:
+        cfg = load_config().get("cassette", {}) or {}
+        if cfg.get("mode"):
+            return start(
+                cfg["mode"],
+                cfg.get("path") or ".cache/cassettes/session-{run}.jsonl",
+                latency_scale=float(cfg.get("latency_scale", 1.0)),
+                on_miss=cfg.get("on_miss", "error"),
+            )
+        _configured = True
+    return _cassette
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    """``--record`` / ``--replay`` flags for the runners."""
+    group = ap.add_mutually_exclusive_group()
+    group.add_argument("--record", metavar="PATH", help="Record every LLM call to this JSONL cassette")
+    group.add_argument("--replay", metavar="PATH", help="Answer LLM calls from this cassette")
+    ap.add_argument("--replay-scale", type=float, default=1.0, help="Scale recorded latencies (0 = instant)")
+    ap.add_argument("--replay-miss", choices=ON_MISS, default="error", help="Unrecorded prompt: fail, or call the endpoint")
+
+
+def from_args(args: argparse.Namespace) -> Optional[Cassette]:
+    if args.record:
+        return start("record", args.record)
+    if args.replay:
+        return start("replay", args.replay, latency_scale=args.replay_scale, on_miss=args.replay_miss)
+    return active()
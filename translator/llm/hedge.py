@@ -0,0 +1,208 @@
+"""Tail-latency hedging: duplicate a slow request, keep whichever answers first.
+
+A role with ``hedge:`` configured runs each call as a primary "leg". If the
+primary has not finished after the ``percentile``-th latency recently observed
+for calls of that size, a second, identical leg is started. For pooled roles
+the second leg goes to whichever endpoint the pool picks next, usually another
+replica. The first successful leg wins. The loser is cancelled, and its
+connection is shut down so the server can abort the generation.
+
+    roles:
+      editor:
+        hedge: {percentile: 95, max_extra: 0.05}
+
+Extra load is capped by a token bucket: every primary earns ``max_extra``
+hedge credits and a hedge spends one, so at most ~5% more requests (by default)
+reach the servers. Until ``min_samples`` calls have been observed nothing is
+hedged.
+
+``Cancel`` is the cancellation token the legs share with ``provider.chat()``.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Cancel:
+    """Thread-safe cancellation token: ``cancel()`` runs registered callbacks once."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds, waking early on cancel; True if cancelled."""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Run ``fn`` on cancel (now, if already cancelled); returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return lambda: self._discard(fn)
+        _quietly(fn)
+        return lambda: None
+
+    def _discard(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            _quietly(fn)
+
+
+def _quietly(fn: Callable[[], None]) -> None:
+    try:
+        fn()
+    except Exception as e:  # noqa: BLE001 - cancelling must never raise
+        logger.debug("cancel callback failed: %s", e)
+
+
+def _size_class(size: int) -> int:
+    """Power-of-two bucket of the prompt size: titles and full chunks differ a lot."""
+    return max(0, size).bit_length()
+
+
+class HedgePolicy:
+    """Per-role hedging settings plus the latency samples and budget they act on."""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_delay_s: float = 1.0,
+        max_extra: float = 0.05,
+        burst: float = 2.0,
+        min_samples: int = 20,
+        window: int = 200,
+    ) -> None:
+        self.percentile = percentile
+        self.min_delay_s = min_delay_s  # never hedge sooner than this
+        self.max_extra = max_extra  # hedge credits earned per primary request
+        self.burst = burst  # most credits that can be banked
+        self.min_samples = min_samples
+        self.window = window  # recent latencies kept per size class
+        self.counts = {"calls": 0, "hedged": 0, "hedge_won": 0}
+        self._samples: Dict[int, Deque[float]] = {}
+        self._credit = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, size: int, latency_s: float) -> None:
+        with self._lock:
+            self._samples.setdefault(_size_class(size), deque(maxlen=self.window)).append(latency_s)
+
+    def delay_s(self, size: int) -> Optional[float]:
+        """Seconds to wait before hedging a call of ``size``; None = not enough data."""
+        with self._lock:
+            samples = self._samples.get(_size_class(size)) or ()
+            if len(samples) < self.min_samples:
+                # Fall back to every size class before giving up.
+                samples = [s for d in self._samples.values() for s in d]
+            if len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        idx = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        return max(self.min_delay_s, ordered[idx])
+
+    def _earn(self) -> None:
+        with self._lock:
+            self.counts["calls"] += 1
+            self._credit = min(self.burst, self._credit + self.max_extra)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                return False
+            self._credit -= 1.0
+            self.counts["hedged"] += 1
+            return True
+
+    def run(self, call: Callable[[Cancel], Any], size: int = 0) -> Any:
+        """Run ``call(cancel)`` with hedging; returns the first successful result.
+
+        ``call`` must honour its ``Cancel`` (``provider.chat(cancel=...)`` does).
+        When both legs fail, the primary's error is raised.
+        """
+        self._earn()
+        delay = self.delay_s(size)
+        started = time.monotonic()
+        if delay is None:
+            result = call(Cancel())
+            self.observe(size, time.monotonic() - started)
+            return result
+
+        results: "queue.Queue[Tuple[int, bool, Any]]" = queue.Queue()
+        legs: List[Cancel] = []
+
+        def start() -> None:
+            idx, cancel = len(legs), Cancel()
+            legs.append(cancel)
+
+            def run_leg() -> None:
+                try:
+                    results.put((idx, True, call(cancel)))
+                except BaseException as e:  # noqa: BLE001 - re-raised in the caller
+                    results.put((idx, False, e))
+
+            # Legs inherit the caller's context (telemetry labels).
+            ctx = contextvars.copy_context()
+            threading.Thread(target=ctx.run, args=(run_leg,), name=f"hedge-leg-{idx}", daemon=True).start()
+
+        start()
+        try:
+            first = results.get(timeout=delay)
+        except queue.Empty:
+            if self._spend():
+                logger.info("no reply after %.1fs; hedging with a duplicate request", delay)
+                start()
+            first = results.get()
+
+        outcomes = [first]
+        while not outcomes[-1][1] and len(outcomes) < len(legs):
+            outcomes.append(results.get())
+        for cancel in legs:  # the winner's token is spent already; cancelling it is a no-op
+            cancel.cancel()
+
+        winner = next((o for o in outcomes if o[1]), None)
+        if winner is None:
+            raise next((o for o in outcomes if o[0] == 0), outcomes[0])[2]
+        if winner[0] == 1:
+            with self._lock:
+                self.counts["hedge_won"] += 1
+        self.observe(size, time.monotonic() - started)
+        return winner[2]
+
+
+def policy_from_config(cfg: Any) -> Optional[HedgePolicy]:
+    """``hedge: true`` or ``hedge: {percentile, min_delay_s, max_extra, ...}``."""
+    if not cfg:
+        return None
+    if cfg is True:
+        return HedgePolicy()
+    return HedgePolicy(
+        percentile=float(cfg.get("percentile", 95.0)),
+        min_delay_s=float(cfg.get("min_delay_s", 1.0)),
+        max_extra=float(cfg.get("max_extra", 0.05)),
+        burst=float(cfg.get("burst", 2.0)),
+        min_samples=int(cfg.get("min_samples", 20)),
+        window=int(cfg.get("window", 200)),
+    )
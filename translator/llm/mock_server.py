@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""Deterministic mock LLM server for offline benchmarks and tests.
+
+Speaks the three wire formats ``provider.py`` uses, streamed (SSE) and not:
+
+- OpenAI-compatible: ``POST /v1/chat/completions`` (+ ``GET /v1/models``)
+- Anthropic:         ``POST /v1/messages``
+- Gemini:            ``POST /v1beta/models/<model>:generateContent`` /
+                     ``:streamGenerateContent?alt=sse``
+
+Replies are pseudo-translations, not real ones, but they keep the pipeline's
+invariants: glossary terms from the system prompt are rendered as their Hán
+Việt, every other Chinese character becomes a Vietnamese-looking syllable,
+and paragraphs and punctuation are preserved. The editor role gets its rough
+translation back, the QA critic answers ``OK``, and glossary extraction
+returns ``[]``. So translate -> edit -> QA runs clean end to end.
+
+Latency is ``latency_ms`` x lognormal(``jitter``) plus ``ms_per_char`` per reply
+character. Failures come from ``error_rate`` (HTTP 500 after the latency) and
+``rate_429`` (an immediate HTTP 429 with ``Retry-After``). ``max_concurrency``
+makes requests queue for a slot like a saturated vLLM would. Every random draw is seeded from (``seed``, request body,
+how many times that body was seen), so a run is reproducible, yet a retried
+request gets a fresh draw.
+
+    python -m translator.llm.mock_server --port 8000 --latency-ms 800 --jitter 0.4 --rate-429 0.02
+    # then point an endpoint at http://127.0.0.1:8000/v1 (openai) or :8000 (anthropic/google)
+
+In-process use (``translator.workflow.benchmark`` does this)::
+
+    server = MockLLMServer(MockConfig(latency_ms=50)).start()
+    ... server.openai_base_url ... server.stats() ...
+    server.stop()
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from translator.llm.tokens import heuristic_tokens
+
+_CJK = re.compile(r"[一-鿿㐀-䶿]")
+_GLOSSARY_LINE = re.compile(r"^- (.+?) → (.+?)(?:  \(.*\))?$", re.MULTILINE)
+_CHAPTER_NO = re.compile(r"第\s*(\d+)\s*章")
+_BATCHED = re.compile(r"Dịch \d+ tiêu đề chương sau|Văn bản dưới đây gồm \d+ chương")
+_STREAM_PIECE = 24  # characters per streamed delta
+
+# Syllables for pseudo-translating CJK characters (picked by code point).
+_SYLLABLES = (
+    "an bạch bình cao chân chí đại đạo đông gia giang hà hải hạo hoa hoàng hồng huyền khí kiếm lâm linh "
+    "long lục minh mộc nam nhân ngọc phong phúc quang sơn tâm thanh thiên thủy tiên tinh trường tuyết "
+    "vân văn việt vũ xuân yên ảnh bảo cẩm diệp đình hạ hương khang lạc mai nguyệt nhật phương thu vĩnh"
+).split()
+
+_PUNCT = {
+    "，": ", ", "。": ". ", "！": "! ", "？": "? ", "：": ": ", "；": "; ", "、": ", ",
+    "“": '"', "”": '"', "‘": "'", "’": "'", "【": "[", "】": "]", "《": "«", "》": "»",
+    "（": "(", "）": ")", "…": "...", "—": "-", "～": "~", "　": " ",
+}
+
+
+@dataclass
+class MockConfig:
+    """Knobs of the simulated model server."""
+
+    latency_ms: float = 200.0  # median time before the reply starts
+    jitter: float = 0.25  # lognormal sigma around latency_ms (0 = fixed)
+    ms_per_char: float = 0.0  # generation time per reply character
+    error_rate: float = 0.0  # share of requests answered with HTTP 500
+    rate_429: float = 0.0  # share answered with HTTP 429
+    retry_after_s: float = 1.0
+    max_concurrency: Optional[int] = None  # server-side slots; None = unlimited
+    seed: int = 0
+
+
+# --- Pseudo-translation -----------------------------------------------------------
+
+
+def _glossary(system: str) -> List[Tuple[str, str]]:
+    """(chinese, hanviet) pairs from a format_glossary_block in the prompt, longest first."""
+    pairs = [(m.group(1).strip(), m.group(2).strip()) for m in _GLOSSARY_LINE.finditer(system)]
+    return sorted(pairs, key=lambda p: len(p[0]), reverse=True)
+
+
+def pseudo_translate(text: str, glossary: List[Tuple[str, str]] = ()) -> str:
+    """Deterministic CJK -> Vietnamese-looking text; non-CJK passes through."""
+    text = _CHAPTER_NO.sub(lambda m: f"Chương {m.group(1)} ", text)
+    for zh, vi in glossary:
+        text = text.replace(zh, f" {vi} ")
+    out: List[str] = []
+    for ch in text:
+        if _CJK.match(ch):
+            out.append(" " + _SYLLABLES[ord(ch) % len(_SYLLABLES)] + " ")
+        else:
+            out.append(_PUNCT.get(ch, ch))
+    # Tidy the spacing the substitutions introduce, line by line.
+    lines = [re.sub(r" {2,}", " ", line).strip() for line in "".join(out).split("\n")]
+    lines = [re.sub(r" ([,.!?:;)\]»])", r"\1", line) for line in lines]
+    return "\n".join(line[:1].upper() + line[1:] for line in lines)
+
+
+def _section(user: str, heading: str) -> Optional[str]:
+    """Body of a '## heading' section in an editor prompt."""
+    start = user.find(heading)
+    if start < 0:
+        return None
+    body = user[start + len(heading):]
+    for stop in ("\n\n## ", "\n\nYÊU CẦU:", "\n\nHãy trả về"):
+        cut = body.find(stop)
+        if cut >= 0:
+            body = body[:cut]
+    return body.strip()
+
+
+def reply_for(system: str, user: str) -> str:
+    """What the mock model answers for one system+user turn."""
+    if 'trả về đúng chữ "OK"' in system:  # QA critic
+        return "OK"
+    if "mảng JSON" in system:  # glossary extraction
+        return "[]"
+    glossary = _glossary(system)
+    for heading in ("## Bản dịch thô (cần biên tập):\n", "## Bản dịch đã biên tập:\n"):  # editor
+        draft = _section(user, heading)
+        if draft is not None:
+            return pseudo_translate(draft, glossary)
+    if user.startswith("Dịch tiêu đề chương sau:\n"):
+        return pseudo_translate(user.split("\n", 1)[1], glossary)
+    if _BATCHED.match(user):  # batched titles / packed chapters: instructions, then the text
+        return pseudo_translate(user.split("\n", 1)[1].lstrip("\n"), glossary)
+    return pseudo_translate(user, glossary)
+
+
+# --- Request parsing / reply shapes per wire format ---------------------------------
+
+
+def _openai_prompt(body: dict) -> Tuple[str, str]:
+    system = "\n".join(m["content"] for m in body.get("messages", []) if m.get("role") == "system")
+    user = "\n".join(m["content"] for m in body.get("messages", []) if m.get("role") == "user")
+    return system, user
+
+
+def _anthropic_prompt(body: dict) -> Tuple[str, str]:
+    system = body.get("system") or ""
+    if isinstance(system, list):  # cache_control blocks
+        system = "".join(b.get("text", "") for b in system)
+    content = (body.get("messages") or [{}])[0].get("content", "")
+    if isinstance(content, list):
+        content = "".join(b.get("text", "") for b in content)
+    return system, content
+
+
+def _google_prompt(body: dict) -> Tuple[str, str]:
+    system = "".join(p.get("text", "") for p in (body.get("system_instruction") or {}).get("parts", []))
+    user = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+    return system, user
+
+
+def _pieces(text: str) -> Iterator[str]:
+    for i in range(0, len(text), _STREAM_PIECE):
+        yield text[i:i + _STREAM_PIECE]
+
+
+# --- Server ---------------------------------------------------------------------------
+
+
+class _Stats:
+    """Request counters plus in-flight tracking (peak and time-weighted mean)."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.by_status: Dict[int, int] = {}
+        self.inflight = 0
+        self.peak_inflight = 0
+        self._busy = 0.0  # integral of in-flight over time
+        self._since = time.monotonic()
+        self._last = self._since
+        self._first: Optional[float] = None
+
+    def _advance(self) -> None:
+        now = time.monotonic()
+        self._busy += self.inflight * (now - self._last)
+        self._last = now
+
+    def enter(self) -> None:
+        with self.lock:
+            self._advance()
+            if self._first is None:
+                self._first = self._last
+            self.requests += 1
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+
+    def leave(self, status: int) -> None:
+        with self.lock:
+            self._advance()
+            self.inflight -= 1
+            self.by_status[status] = self.by_status.get(status, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            self._advance()
+            window = self._last - (self._first if self._first is not None else self._since)
+            return {
+                "requests": self.requests,
+                "by_status": dict(sorted(self.by_status.items())),
+                "inflight": self.inflight,
+                "peak_inflight": self.peak_inflight,
+                "mean_inflight": round(self._busy / window, 2) if window > 0 else 0.0,
+            }
+
+
+class MockLLMServer:
+    """A ThreadingHTTPServer answering like an LLM provider (see module doc)."""
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or MockConfig()
+        self._stats = _Stats()
+        self._seen: Dict[str, int] = {}
+        self._seen_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.config.max_concurrency) if self.config.max_concurrency else None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        return self.base_url + "/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self) -> Dict:
+        return self._stats.snapshot()
+
+    # --- behaviour -----------------------------------------------------------
+
+    def _rng(self, raw: bytes) -> random.Random:
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._seen_lock:
+            n = self._seen[digest] = self._seen.get(digest, 0) + 1
+        return random.Random(f"{self.config.seed}:{digest}:{n}")
+
+    def _latency_s(self, rng: random.Random) -> float:
+        c = self.config
+        factor = math.exp(rng.gauss(0.0, c.jitter)) if c.jitter > 0 else 1.0
+        return c.latency_ms * factor / 1000.0
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                if self.path.rstrip("/").endswith("/models"):
+                    self._json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+                elif self.path.rstrip("/") == "/stats":
+                    self._json(200, server.stats())
+                else:
+                    self._json(404, {"error": {"message": f"no route {self.path}"}})
+
+            def do_POST(self) -> None:  # noqa: N802 - http.server API
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                path = self.path.split("?")[0]
+                if path.endswith("/chat/completions"):
+                    kind, parse = "openai", _openai_prompt
+                elif path.endswith("/v1/messages"):
+                    kind, parse = "anthropic", _anthropic_prompt
+                elif ":generateContent" in path or ":streamGenerateContent" in path:
+                    kind, parse = "google", _google_prompt
+                else:
+                    self._json(404, {"error": {"message": f"no route {self.path}"}})
+                    return
+                body = json.loads(raw or b"{}")
+                stream = bool(body.get("stream")) or ":streamGenerateContent" in path
+
+                server._stats.enter()
+                status = 200
+                slot = server._slots
+                if slot is not None:
+                    slot.acquire()
+                try:
+                    rng = server._rng(raw)
+                    roll = rng.random()
+                    if roll < server.config.rate_429:  # rejected up front, like a real gateway
+                        status = 429
+                        retry_after = {"Retry-After": f"{server.config.retry_after_s:g}"}
+                        self._json(429, {"error": {"message": "mock rate limit"}}, retry_after)
+                        return
+                    time.sleep(server._latency_s(rng))
+                    if roll < server.config.rate_429 + server.config.error_rate:
+                        status = 500
+                        self._json(500, {"error": {"message": "mock server error"}})
+                        return
+                    system, user = parse(body)
+                    text = reply_for(system, user)
+                    usage = (heuristic_tokens(system) + heuristic_tokens(user), heuristic_tokens(text))
+                    model = body.get("model") or path.rsplit("/", 1)[-1].split(":")[0]
+                    if stream:
+                        if kind == "openai" and not (body.get("stream_options") or {}).get("include_usage"):
+                            usage = None  # OpenAI only reports a stream's usage when asked
+                        self._stream(kind, model, text, usage)
+                    else:
+                        time.sleep(len(text) * server.config.ms_per_char / 1000.0)
+                        self._json(200, _reply(kind, model, text, usage))
+                except (BrokenPipeError, ConnectionResetError):
+                    status = 499  # client went away (e.g. a cancelled hedge leg)
+                finally:
+                    if slot is not None:
+                        slot.release()
+                    server._stats.leave(status)
+
+            # --- writers -------------------------------------------------------
+
+            def _json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, kind: str, model: str, text: str, usage: Optional[Tuple[int, int]]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                per_piece = _STREAM_PIECE * server.config.ms_per_char / 1000.0
+                for event in _events(kind, model, text, usage):
+                    if event.get("_delta") and per_piece:
+                        time.sleep(per_piece)
+                    event.pop("_delta", None)
+                    self._chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                if kind == "openai":
+                    self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _chunk(self, s: str) -> None:
+                data = s.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def _reply(kind: str, model: str, text: str, usage: Tuple[int, int]) -> dict:
+    prompt, completion = usage
+    if kind == "anthropic":
+        return {
+            "type": "message", "role": "assistant", "model": model,
+            "content": [{"type": "text", "text": text}],
+            "usage": {"input_tokens": prompt, "output_tokens": completion},
+        }
+    if kind == "google":
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": prompt, "candidatesTokenCount": completion},
+        }
+    return {
+        "object": "chat.completion", "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion},
+    }
+
+
+def _events(kind: str, model: str, text: str, usage: Optional[Tuple[int, int]]) -> Iterator[dict]:
+    """SSE payloads for a streamed reply; text-bearing ones are tagged ``_delta``.
+
+    ``usage`` may be None for OpenAI (no ``stream_options.include_usage``).
+    """
+    prompt, completion = usage or (0, 0)
+    if kind == "anthropic":
+        yield {"type": "message_start", "message": {"model": model, "usage": {"input_tokens": prompt, "output_tokens": 1}}}
+        yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+        for piece in _pieces(text):
+            yield {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}, "_delta": True}
+        yield {"type": "content_block_stop", "index": 0}
+        yield {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": completion}}
+        yield {"type": "message_stop"}
+    elif kind == "google":
+        for piece in _pieces(text):
+            yield {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}], "_delta": True}
+        yield {
+            "candidates": [{"content": {"parts": [{"text": ""}], "role": "model"}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": prompt, "candidatesTokenCount": completion},
+        }
+    else:
+        for piece in _pieces(text):
+            yield {"object": "chat.completion.chunk", "model": model, "choices": [{"index": 0, "delta": {"content": piece}}], "_delta": True}
+        yield {"object": "chat.completion.chunk", "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        if usage is not None:  # a last chunk with no choices, as OpenAI sends it
+            yield {
+                "object": "chat.completion.chunk", "model": model, "choices": [],
+                "usage": {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion},
+            }
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    """The MockConfig knobs as CLI flags (shared with the benchmark command)."""
+    defaults = MockConfig()
+    ap.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Median reply latency")
+    ap.add_argument("--jitter", type=float, default=defaults.jitter, help="Lognormal sigma of the latency")
+    ap.add_argument("--ms-per-char", type=float, default=defaults.ms_per_char, help="Generation time per reply char")
+    ap.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Share of HTTP 500 replies")
+    ap.add_argument("--rate-429", type=float, default=defaults.rate_429, help="Share of HTTP 429 replies")
+    ap.add_argument("--retry-after", type=float, default=defaults.retry_after_s, help="Retry-After on 429s (s)")
+    ap.add_argument("--server-concurrency", type=int, help="Server-side slots (default unlimited)")
+    ap.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        jitter=args.jitter,
+        ms_per_char=args.ms_per_char,
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        retry_after_s=args.retry_after,
+        max_concurrency=args.server_concurrency,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Deterministic mock LLM server (OpenAI / Anthropic / Gemini)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    add_arguments(ap)
+    args = ap.parse_args()
+    server = MockLLMServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"mock LLM on {server.base_url} (OpenAI base_url {server.openai_base_url}): {asdict(server.config)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
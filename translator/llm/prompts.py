@@ -0,0 +1,112 @@
+"""Prompt assets and rendered system prompts, loaded and hashed once.
+
+Rules files (the repo's TRANSLATOR.md, a book's EDITOR.md) are read once per
+file version (mtime + size) and held as ``PromptAsset``s with a sha256 of their
+text, so a run reads each file once however many chapters, chunks and QA
+fix passes use it, and still sees an edit made mid-run.
+
+System prompts built from them (rules + a glossary block) are memoized by
+``render`` on a caller-chosen key (the rules digest plus the terms it
+injects), in a bounded LRU. Each is a ``SystemPrompt``: a ``str`` carrying
+its sha256 ``digest``, computed once when rendered. ``prompt_digest`` returns
+that digest for any system prompt (hashing plain strings). The response cache
+keys on it and telemetry records it as the ``prompt`` label, so a trace can be
+grouped by the exact system prompt.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+RENDER_CACHE_SIZE = 1024  # rendered prompts kept (one per distinct glossary subset)
+DEFAULT_ASSET = "<default>"
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class PromptAsset:
+    """One rules file as loaded: where from, its text and its sha256."""
+
+    source: str  # the file's path, or DEFAULT_ASSET for the built-in fallback
+    text: str
+    digest: str
+
+
+class SystemPrompt(str):
+    """A rendered system prompt that knows its sha256 (``digest``)."""
+
+    digest: str
+
+    def __new__(cls, text: str) -> "SystemPrompt":
+        prompt = super().__new__(cls, text)
+        prompt.digest = _sha(text)
+        return prompt
+
+
+def prompt_digest(text: str) -> str:
+    """sha256 of a system prompt; free for a ``SystemPrompt``."""
+    digest = getattr(text, "digest", None)
+    return digest if digest is not None else _sha(text)
+
+
+_lock = threading.Lock()
+_assets: Dict[Path, Tuple[Optional[Tuple[int, int]], PromptAsset]] = {}
+_rendered: "OrderedDict[Hashable, SystemPrompt]" = OrderedDict()
+counts = {"loads": 0, "renders": 0, "hits": 0}
+
+
+def _file_version(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_asset(path: Path, default: str) -> PromptAsset:
+    """The rules file at ``path`` (``default`` if it doesn't exist), read once per version."""
+    version = _file_version(path)
+    with _lock:
+        cached = _assets.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    if version is not None:
+        text, source = path.read_text(encoding="utf-8"), str(path)
+    else:
+        text, source = default, DEFAULT_ASSET
+    asset = PromptAsset(source, text, _sha(text))
+    with _lock:
+        _assets[path] = (version, asset)
+        counts["loads"] += 1
+    return asset
+
+
+def render(key: Hashable, build: Callable[[], str]) -> SystemPrompt:
+    """The system prompt for ``key``, built by ``build()`` on first use."""
+    with _lock:
+        prompt = _rendered.get(key)
+        if prompt is not None:
+            _rendered.move_to_end(key)
+            counts["hits"] += 1
+            return prompt
+    prompt = SystemPrompt(build())  # outside the lock; a racing thread builds an equal one
+    with _lock:
+        _rendered[key] = prompt
+        _rendered.move_to_end(key)
+        while len(_rendered) > RENDER_CACHE_SIZE:
+            _rendered.popitem(last=False)
+        counts["renders"] += 1
+    return prompt
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {**counts, "assets": len(_assets), "rendered": len(_rendered)}
@@ -10,33 +10,332 @@ Backends:
 - ``anthropic``: Messages API
 
 Retries with backoff live here so callers never re-implement them.
+``stream_chat()`` / ``chat(stream=True)`` read replies as server-sent events so
+a runaway generation can be aborted early (see ``translator.llm.streaming``).
+Every attempt first reserves capacity from the endpoint's shared rpm/tpm token
+buckets, which also honor 429 / Retry-After (see ``translator.llm.ratelimit``).
+
+Connections are pooled per ``Endpoint``: every call to the same endpoint reuses
+one shared, keep-alive HTTP client, so a parallel fan-out does not pay a fresh
+TCP/TLS handshake per chunk. ``http2: true`` on an endpoint switches that client
+to ``httpx`` (optional: ``pip install -r requirements-async.txt``). The asyncio
+twin of ``chat()`` lives in ``translator.llm.aio``.
+
+``cache_prefix=True`` marks the system prompt as a reusable prefix: Anthropic
+gets an explicit ``cache_control`` breakpoint, while OpenAI-compatible servers
+(incl. vLLM automatic prefix caching) and Gemini cache identical prefixes on
+their own. Reported usage, cache hits included, is totalled in
+``translator.llm.usage``. Each ``chat()`` call (wall time, TTFT, tokens,
+attempts, outcome) is recorded in ``translator.llm.telemetry``. ``hedge=`` runs
+a call with tail-latency hedging (``translator.llm.hedge``). Calls can be
+recorded to, or replayed from, a cassette (``translator.llm.cassette``).
 """
 
 from __future__ import annotations
 
 import logging
+import socket
+import threading
 import time
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from translator.llm import cassette, telemetry
+from translator.llm.hedge import Cancel, HedgePolicy
+from translator.llm.ratelimit import estimate_tokens, limiter
+from translator.llm.streaming import AbortPredicate, Stream, sse_data
+from translator.llm.usage import Usage, anthropic_usage, google_usage, openai_usage, totals
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(frozen=True)
 class Endpoint:
-    """A resolved provider endpoint."""
+    """A resolved provider endpoint (hashable: it keys the connection pool)."""
 
     provider: str = "openai"  # openai | google | anthropic
     base_url: Optional[str] = None
     api_key: Optional[str] = None
+    name: Optional[str] = None  # config.endpoints key, for logs
+    pool_size: int = 10  # max pooled connections to this endpoint
+    keepalive: bool = True
+    http2: bool = False  # needs httpx[http2]
+    max_concurrency: Optional[int] = None  # in-flight cap for the async client (default pool_size)
+    rpm: Optional[float] = None  # requests/min ceiling (shared host-wide)
+    tpm: Optional[float] = None  # tokens/min ceiling (shared host-wide)
+
+    @property
+    def label(self) -> str:
+        """Stable name for limiter keys, usage totals and metrics."""
+        return self.name or self.base_url or self.provider
 
 
 class LLMError(RuntimeError):
     """Raised when a completion cannot be obtained after all retries."""
 
 
+class RateLimited(LLMError):
+    """The provider answered 429; the shared limiter already paused the endpoint."""
+
+
+class Cancelled(LLMError):
+    """The call's ``Cancel`` token fired (e.g. it lost a hedged race)."""
+
+
+# --- Rate limiting ------------------------------------------------------------
+
+
+def request_tokens(system: str, user: str, max_tokens: Optional[int]) -> int:
+    """Tokens to reserve for one call: the prompt plus the expected reply."""
+    return estimate_tokens(system) + estimate_tokens(user) + (max_tokens or estimate_tokens(user))
+
+
+def pace_s(ep: Endpoint, tokens: int) -> float:
+    """Reserve capacity on ``ep``'s shared buckets; return seconds to wait first."""
+    rl = limiter()
+    if rl is None:
+        return 0.0
+    return rl.reserve(ep.label, tokens, ep.rpm, ep.tpm)
+
+
+def check_response(ep: Endpoint, status: int, headers: Any, body: Callable[[], str]) -> None:
+    """Feed rate-limit headers to the limiter and raise on a non-200 status."""
+    rl = limiter()
+    if rl is not None:
+        rl.observe(ep.label, status, headers)
+    if status == 429:
+        raise RateLimited(f"HTTP 429: {body()[:300]}")
+    if status != 200:
+        raise LLMError(f"HTTP {status}: {body()[:300]}")
+
+
+def record_usage(ep: Endpoint, model: str, usage: Optional[Usage]) -> Optional[Usage]:
+    """Add one call's reported usage to the process-wide totals; return it."""
+    if usage is not None:
+        totals.add(ep.label, model, usage)
+        if usage.cached_tokens:
+            logger.debug("%s: %d/%d prompt tokens from cache", model, usage.cached_tokens, usage.prompt_tokens)
+    return usage
+
+
+def record_call(
+    role: Optional[str],
+    ep: Endpoint,
+    model: str,
+    started: float,
+    attempts: int,
+    *,
+    usage: Optional[Usage] = None,
+    ttft_s: Optional[float] = None,
+    error: Optional[str] = None,
+    cancelled: bool = False,
+) -> None:
+    """Report one finished ``chat()`` call to telemetry."""
+    usage = usage or Usage()
+    outcome = "cancelled" if cancelled else "error" if error else "ok"
+    telemetry.record(
+        telemetry.CallRecord(
+            role=role or "-",
+            model=model,
+            endpoint=ep.label,
+            outcome=outcome,
+            wall_s=round(time.monotonic() - started, 4),
+            attempts=attempts,
+            ttft_s=None if ttft_s is None else round(ttft_s, 4),
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+            error=error[:300] if error else None,
+        )
+    )
+
+
+def cassette_take(
+    system: str,
+    user: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    *,
+    endpoint: Endpoint,
+    model: str,
+    role: Optional[str],
+) -> Optional[Tuple[cassette.Take, float]]:
+    """Replay mode: the recorded reply and how long to wait before returning it.
+
+    None when not replaying, or on a miss with ``on_miss: live``.
+    """
+    tape = cassette.active()
+    if tape is None or not tape.replaying:
+        return None
+    take = tape.take(system, user, temperature, max_tokens)
+    if take is None:
+        if tape.on_miss == "live":
+            return None
+        err = f"prompt not in cassette {tape.path}"
+        record_call(role, endpoint, model, time.monotonic(), 1, error=err)
+        raise LLMError(f"{endpoint.provider}:{model}: {err}")
+    return take, tape.delay_s(take)
+
+
+def cassette_record(
+    system: str,
+    user: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    text: str,
+    *,
+    endpoint: Endpoint,
+    model: str,
+    role: Optional[str],
+    started: float,
+    attempts: int,
+    usage: Optional[Usage] = None,
+    ttft_s: Optional[float] = None,
+) -> None:
+    """Record mode: append one successful call to the cassette."""
+    tape = cassette.active()
+    if tape is None or not tape.recording:
+        return
+    tape.record(
+        provider=(endpoint.provider or "openai").lower(), endpoint=endpoint.label, model=model, role=role,
+        temperature=temperature, max_tokens=max_tokens, system=system, user=user, text=text,
+        wall_s=time.monotonic() - started, ttft_s=ttft_s, attempts=attempts, usage=usage,
+    )
+
+
+# --- Connection pooling -------------------------------------------------------
+
+# Endpoint -> shared HTTP client (requests.Session or httpx.Client). Both pool
+# connections in a thread-safe urllib3/httpcore pool, so one client per endpoint
+# is shared by every worker thread.
+_clients: Dict[Endpoint, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _new_client(ep: Endpoint) -> Any:
+    if ep.http2:
+        try:
+            import httpx
+        except ImportError as e:
+            raise LLMError("http2: true requires httpx: pip install -r requirements-async.txt") from e
+        limits = httpx.Limits(
+            max_connections=ep.pool_size,
+            max_keepalive_connections=ep.pool_size if ep.keepalive else 0,
+        )
+        return httpx.Client(http2=True, limits=limits)
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ep.pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not ep.keepalive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def _client(ep: Endpoint) -> Any:
+    """The pooled HTTP client for ``ep``, created on first use."""
+    client = _clients.get(ep)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(ep)
+            if client is None:
+                client = _clients[ep] = _new_client(ep)
+    return client
+
+
+def close_clients() -> None:
+    """Close every pooled connection (e.g. at the end of a run or in tests)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def _post(ep: Endpoint, url: str, headers: Dict[str, str], payload: dict, timeout: int) -> Any:
+    return _client(ep).post(url, headers=headers, json=payload, timeout=timeout)
+
+
+def _abort(resp: Any) -> None:
+    """Close a response from any thread, waking a reader blocked on its socket.
+
+    ``close()`` alone does not interrupt a blocked ``recv`` on Linux; shutting
+    the socket down does, and sends the FIN that lets vLLM abort the request.
+    """
+    if isinstance(resp, requests.Response):
+        sock = getattr(getattr(resp.raw, "_connection", None), "sock", None)
+        if sock is None:  # connection already detached (close-delimited body): ask http.client
+            fp = getattr(getattr(resp.raw, "_fp", None), "fp", None)
+            sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    else:
+        stream = resp.extensions.get("network_stream")
+        sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    resp.close()
+
+
+def _post_stream(
+    ep: Endpoint, url: str, headers: Dict[str, str], payload: dict, timeout: int
+) -> Tuple[Iterator[str], Callable[[], None]]:
+    """POST and return (decoded response lines, close) without reading the body."""
+    client = _client(ep)
+    if isinstance(client, requests.Session):
+        resp = client.post(url, headers=headers, json=payload, timeout=timeout, stream=True)
+        body = ""
+        if resp.status_code != 200:
+            body = resp.text  # read the error body before closing drops it
+            resp.close()
+        check_response(ep, resp.status_code, resp.headers, lambda: body)
+        resp.encoding = "utf-8"  # SSE has no charset; requests would assume latin-1
+        return resp.iter_lines(decode_unicode=True), lambda: _abort(resp)
+    resp = client.send(client.build_request("POST", url, headers=headers, json=payload, timeout=timeout), stream=True)
+    body = ""
+    if resp.status_code != 200:
+        body = resp.read().decode("utf-8", "replace")
+        resp.close()
+    check_response(ep, resp.status_code, resp.headers, lambda: body)
+    return resp.iter_lines(), lambda: _abort(resp)
+
+
+def stream_chat(
+    system: str,
+    user: str,
+    *,
+    endpoint: Endpoint,
+    model: str,
+    temperature: float = 0.3,
+    max_tokens: Optional[int] = None,
+    timeout: int = 180,
+    abort_if: Optional[AbortPredicate] = None,
+    cache_prefix: bool = False,
+) -> Stream:
+    """Start a streamed completion and return its ``Stream`` of text deltas.
+
+    One attempt, no retries: once tokens have been handed to the caller the
+    request cannot be replayed transparently. ``chat(stream=True)`` wraps this
+    with the usual retry loop.
+    """
+    provider = (endpoint.provider or "openai").lower()
+    build, _ = _backend(provider)
+    delta = _DELTAS.get(provider, _DELTAS["openai"])
+    started = time.monotonic()
+    url, headers, payload = build(
+        system, user, endpoint, model, temperature, max_tokens, stream=True, cache_prefix=cache_prefix
+    )
+    wait = pace_s(endpoint, request_tokens(system, user, max_tokens))
+    if wait > 0:
+        time.sleep(wait)
+    lines, close = _post_stream(endpoint, url, headers, payload, timeout)
+    return Stream(sse_data(lines), delta, close, abort_if=abort_if, started=started, usage_of=_usage_parser(provider))
+
+
 def chat(
     system: str,
     user: str,
@@ -47,36 +346,143 @@ def chat(
     max_tokens: Optional[int] = None,
     retries: int = 3,
     timeout: int = 180,
+    stream: bool = False,
+    abort_if: Optional[AbortPredicate] = None,
+    cache_prefix: bool = False,
+    role: Optional[str] = None,
+    hedge: Optional[HedgePolicy] = None,
+    cancel: Optional[Cancel] = None,
 ) -> str:
     """Return the assistant text for a single system+user turn.
 
+    ``stream=True`` reads the reply incrementally so ``abort_if(text_so_far)``
+    can cut off a runaway generation early; an abort counts as a failed attempt
+    and is retried like any other error. ``cache_prefix=True`` asks the
+    provider to cache the system prompt as a shared prefix (see module doc).
+    ``role`` only labels the call's telemetry record.
+
+    ``hedge`` duplicates the call if it runs past the policy's latency
+    percentile and keeps the first reply; ``cancel`` aborts the call from
+    another thread, raising ``Cancelled``. A cancellable call is always
+    streamed: a non-streamed reply only starts (headers included) once the
+    whole generation is done, too late for a cancel to spare the server any
+    work. Once the stream is open its connection is shut down at once, which
+    lets the server abort the generation; before that the call is abandoned
+    and its connection dropped as soon as the response headers arrive.
+
     Raises ``LLMError`` if all retries fail.
     """
+    if hedge is not None:
+        return hedge.run(
+            lambda leg: chat(
+                system, user, endpoint=endpoint, model=model, temperature=temperature, max_tokens=max_tokens,
+                retries=retries, timeout=timeout, stream=stream, abort_if=abort_if, cache_prefix=cache_prefix,
+                role=role, cancel=leg,
+            ),
+            size=len(user),
+        )
+    stream = stream or cancel is not None
     provider = (endpoint.provider or "openai").lower()
+    build, parse = _backend(provider)
+    tokens = request_tokens(system, user, max_tokens)
     last_err: Optional[str] = None
+    started = time.monotonic()
+
+    replay = cassette_take(system, user, temperature, max_tokens, endpoint=endpoint, model=model, role=role)
+    if replay is not None:
+        take, delay = replay
+        if cancel is not None and cancel.wait(delay):
+            record_call(role, endpoint, model, started, 1, error="cancelled", cancelled=True)
+            raise Cancelled(f"{provider}:{model} cancelled")
+        if cancel is None:
+            time.sleep(delay)
+        usage = record_usage(endpoint, model, take.usage)
+        record_call(role, endpoint, model, started, 1, usage=usage, ttft_s=take.ttft_s)
+        return take.text
 
     for attempt in range(1, retries + 1):
+        paced = False
+        ttft_s = None
+        if cancel is not None and cancel.is_set():
+            break
         try:
-            if provider == "google":
-                text = _google(system, user, endpoint, model, temperature, max_tokens, timeout)
-            elif provider == "anthropic":
-                text = _anthropic(system, user, endpoint, model, temperature, max_tokens, timeout)
+            if stream:
+                s = stream_chat(
+                    system, user, endpoint=endpoint, model=model, temperature=temperature,
+                    max_tokens=max_tokens, timeout=timeout, abort_if=abort_if, cache_prefix=cache_prefix,
+                )
+                unregister = cancel.on_cancel(s.close) if cancel is not None else None
+                try:
+                    text = s.read()
+                finally:
+                    if unregister is not None:
+                        unregister()
+                usage, ttft_s = record_usage(endpoint, model, s.usage), s.ttft_s
+                logger.debug("stream from %s: ttft=%s total=%.2fs", model, s.ttft_s, s.elapsed_s)
             else:
-                text = _openai(system, user, endpoint, model, temperature, max_tokens, timeout)
+                url, headers, payload = build(
+                    system, user, endpoint, model, temperature, max_tokens, cache_prefix=cache_prefix
+                )
+                wait = pace_s(endpoint, tokens)
+                if wait > 0:
+                    time.sleep(wait)
+                resp = _post(endpoint, url, headers, payload, timeout)
+                check_response(endpoint, resp.status_code, resp.headers, lambda: resp.text)
+                data = resp.json()
+                text = parse(data)
+                usage = record_usage(endpoint, model, _usage_parser(provider)(data))
+            if cancel is not None and cancel.is_set():
+                break  # finished after losing the race: the reply is discarded
             if text is not None and text.strip():
+                record_call(role, endpoint, model, started, attempt, usage=usage, ttft_s=ttft_s)
+                cassette_record(
+                    system, user, temperature, max_tokens, text.strip(), endpoint=endpoint, model=model,
+                    role=role, started=started, attempts=attempt, usage=usage, ttft_s=ttft_s,
+                )
                 return text.strip()
             last_err = "empty response"
         except Exception as e:  # noqa: BLE001 - surfaced via LLMError below
             last_err = str(e)
+            if cancel is not None and cancel.is_set():
+                break
+            # After a 429 the shared limiter holds the next attempt until the
+            # provider's reset time, so a fixed backoff on top would only add delay.
+            paced = isinstance(e, RateLimited) and limiter() is not None
             logger.warning("LLM call failed (attempt %d/%d): %s", attempt, retries, e)
 
-        if attempt < retries:
-            time.sleep(2 * attempt)
+        if attempt < retries and not paced:
+            if cancel is not None:
+                cancel.wait(backoff_s(attempt))
+            else:
+                time.sleep(backoff_s(attempt))
 
+    if cancel is not None and cancel.is_set():
+        record_call(role, endpoint, model, started, attempt, error="cancelled", cancelled=True)
+        raise Cancelled(f"{provider}:{model} cancelled")
+    record_call(role, endpoint, model, started, retries, error=last_err)
     raise LLMError(f"{provider}:{model} failed after {retries} attempts: {last_err}")
 
 
-def _openai(system, user, ep: Endpoint, model, temperature, max_tokens, timeout) -> Optional[str]:
+def backoff_s(attempt: int) -> float:
+    """Seconds to wait after failed attempt number ``attempt`` (1-based)."""
+    return 2.0 * attempt
+
+
+# --- Backends -----------------------------------------------------------------
+#
+# Each backend is a (build, parse) pair: ``build`` returns the (url, headers,
+# payload) of the HTTP request, ``parse`` extracts the text from the JSON reply.
+# ``_USAGE`` maps a provider to its token-usage parser (replies and SSE events).
+# Keeping them transport-free lets the sync and async clients share them.
+
+Request = Tuple[str, Dict[str, str], dict]
+
+
+def _openai_request(
+    system, user, ep: Endpoint, model, temperature, max_tokens, stream=False, cache_prefix=False
+) -> Request:
+    # Prefix caching is automatic (OpenAI, vLLM --enable-prefix-caching):
+    # ``cache_prefix`` needs nothing beyond a byte-identical system message.
     if not ep.base_url:
         raise LLMError("openai-compatible endpoint requires base_url")
     headers = {"Content-Type": "application/json"}
@@ -92,22 +498,33 @@ def _openai(system, user, ep: Endpoint, model, temperature, max_tokens, timeout)
     }
     if max_tokens:
         payload["max_tokens"] = max_tokens
-    resp = requests.post(
-        f"{ep.base_url.rstrip('/')}/chat/completions",
-        headers=headers,
-        json=payload,
-        timeout=timeout,
-    )
-    if resp.status_code != 200:
-        raise LLMError(f"HTTP {resp.status_code}: {resp.text[:300]}")
-    return resp.json()["choices"][0]["message"]["content"]
+    if stream:
+        # Without include_usage OpenAI and vLLM report no token counts for a stream.
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+    return f"{ep.base_url.rstrip('/')}/chat/completions", headers, payload
+
+
+def _openai_text(data: dict) -> Optional[str]:
+    return data["choices"][0]["message"]["content"]
+
+
+def _openai_delta(event: dict) -> Optional[str]:
+    choices = event.get("choices") or []
+    return (choices[0].get("delta") or {}).get("content") if choices else None
 
 
-def _google(system, user, ep: Endpoint, model, temperature, max_tokens, timeout) -> Optional[str]:
+def _google_request(
+    system, user, ep: Endpoint, model, temperature, max_tokens, stream=False, cache_prefix=False
+) -> Request:
+    # Gemini 2.x caches repeated prefixes implicitly; nothing to mark.
     if not ep.api_key:
         raise LLMError("google endpoint requires api_key")
     base = (ep.base_url or "https://generativelanguage.googleapis.com").rstrip("/")
-    url = f"{base}/v1beta/models/{model}:generateContent?key={ep.api_key}"
+    if stream:
+        url = f"{base}/v1beta/models/{model}:streamGenerateContent?alt=sse&key={ep.api_key}"
+    else:
+        url = f"{base}/v1beta/models/{model}:generateContent?key={ep.api_key}"
     gen_cfg = {"temperature": temperature}
     if max_tokens:
         gen_cfg["maxOutputTokens"] = max_tokens
@@ -116,10 +533,10 @@ def _google(system, user, ep: Endpoint, model, temperature, max_tokens, timeout)
         "contents": [{"parts": [{"text": user}]}],
         "generationConfig": gen_cfg,
     }
-    resp = requests.post(url, headers={"Content-Type": "application/json"}, json=payload, timeout=timeout)
-    if resp.status_code != 200:
-        raise LLMError(f"HTTP {resp.status_code}: {resp.text[:300]}")
-    data = resp.json()
+    return url, {"Content-Type": "application/json"}, payload
+
+
+def _google_text(data: dict) -> Optional[str]:
     candidates = data.get("candidates") or []
     if not candidates:
         raise LLMError(f"no candidates: {str(data)[:300]}")
@@ -127,24 +544,78 @@ def _google(system, user, ep: Endpoint, model, temperature, max_tokens, timeout)
     return "".join(p.get("text", "") for p in parts)
 
 
-def _anthropic(system, user, ep: Endpoint, model, temperature, max_tokens, timeout) -> Optional[str]:
+def _google_delta(event: dict) -> Optional[str]:
+    # Each streamed event is a partial GenerateContentResponse.
+    return _google_text(event) if event.get("candidates") else None
+
+
+def _anthropic_request(
+    system, user, ep: Endpoint, model, temperature, max_tokens, stream=False, cache_prefix=False
+) -> Request:
     if not ep.api_key:
         raise LLMError("anthropic endpoint requires api_key")
     base = (ep.base_url or "https://api.anthropic.com").rstrip("/")
     payload = {
         "model": model,
-        "system": system,
+        # A cache_control breakpoint on the system block caches tools+system;
+        # prefixes shorter than the model minimum (1024-2048 tokens) are just
+        # billed normally.
+        "system": [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}] if cache_prefix else system,
         "messages": [{"role": "user", "content": user}],
         "temperature": temperature,
         "max_tokens": max_tokens or 8192,
     }
+    if stream:
+        payload["stream"] = True
     headers = {
         "x-api-key": ep.api_key,
         "anthropic-version": "2023-06-01",
         "Content-Type": "application/json",
     }
-    resp = requests.post(f"{base}/v1/messages", headers=headers, json=payload, timeout=timeout)
-    if resp.status_code != 200:
-        raise LLMError(f"HTTP {resp.status_code}: {resp.text[:300]}")
-    blocks = resp.json().get("content", [])
+    return f"{base}/v1/messages", headers, payload
+
+
+def _anthropic_text(data: dict) -> Optional[str]:
+    blocks = data.get("content", [])
     return "".join(b.get("text", "") for b in blocks if b.get("type") == "text")
+
+
+def _anthropic_delta(event: dict) -> Optional[str]:
+    kind = event.get("type")
+    if kind == "error":
+        raise LLMError(f"stream error: {str(event.get('error'))[:300]}")
+    if kind == "content_block_delta":
+        return (event.get("delta") or {}).get("text")
+    return None
+
+
+Parser = Callable[[dict], Optional[str]]
+
+_BACKENDS: Dict[str, Tuple[Callable[..., Request], Parser]] = {
+    "openai": (_openai_request, _openai_text),
+    "google": (_google_request, _google_text),
+    "anthropic": (_anthropic_request, _anthropic_text),
+}
+
+# provider -> parser for one streamed (SSE) event.
+_DELTAS: Dict[str, Parser] = {
+    "openai": _openai_delta,
+    "google": _google_delta,
+    "anthropic": _anthropic_delta,
+}
+
+
+_USAGE: Dict[str, Callable[[dict], Optional[Usage]]] = {
+    "openai": openai_usage,
+    "google": google_usage,
+    "anthropic": anthropic_usage,
+}
+
+
+def _usage_parser(provider: str) -> Callable[[dict], Optional[Usage]]:
+    return _USAGE.get(provider, openai_usage)
+
+
+def _backend(provider: str) -> Tuple[Callable[..., Request], Parser]:
+    # Unknown providers fall through to OpenAI-compatible, as before.
+    return _BACKENDS.get(provider, _BACKENDS["openai"])
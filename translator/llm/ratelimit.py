@@ -0,0 +1,246 @@
+"""Per-endpoint token-bucket rate limiting, shared across threads and processes.
+
+Each endpoint may set ``rpm`` (requests/min) and ``tpm`` (tokens/min) in
+config.yaml. Before every attempt ``chat()`` reserves one request and an
+estimate of the call's tokens from that endpoint's buckets and sleeps for as
+long as the reservation says. Bucket state lives in one SQLite file, and each
+reservation is a ``BEGIN IMMEDIATE`` transaction, so every thread and every
+process on the host draws from the same buckets.
+
+The limiter also listens to the providers:
+
+- a 429 (or a ``remaining: 0`` header) blocks the endpoint until the
+  ``Retry-After`` / rate-limit reset time for *all* callers, instead of each
+  thread hammering the server with its own backoff;
+- ``x-ratelimit-limit-*`` (OpenAI-compatible) and ``anthropic-ratelimit-*-limit``
+  headers are remembered and used as the ceiling when config sets none, so a
+  run converges on the provider's real limit rather than a guessed delay.
+"""
+
+from __future__ import annotations
+
+import email.utils
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Mapping, Optional
+
+from translator.config import REPO_ROOT, load_config
+from translator.llm.tokens import heuristic_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bucket capacity, in seconds' worth of the per-minute limit (burst allowance).
+BURST_S = 10.0
+# How long to block an endpoint after a 429 that carries no reset hint.
+DEFAULT_BLOCK_S = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    endpoint      TEXT PRIMARY KEY,
+    requests      REAL,
+    tokens        REAL,
+    updated       REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0,
+    learned_rpm   REAL,
+    learned_tpm   REAL
+);
+"""
+
+# Reservations only need a rough size, so they use the fast heuristic.
+estimate_tokens = heuristic_tokens
+
+
+class RateLimiter:
+    """Token buckets keyed by endpoint name, persisted in SQLite."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def reserve(self, key: str, tokens: int, rpm: Optional[float], tpm: Optional[float]) -> float:
+        """Debit one request + ``tokens`` and return how long to wait before sending.
+
+        Buckets may go negative: later callers queue up behind earlier ones
+        instead of racing for the same refill. An endpoint with no configured
+        or learned limit and no block only costs a read, not a write transaction.
+        """
+        now = time.time()
+        if not rpm and not tpm:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT blocked_until, learned_rpm, learned_tpm FROM buckets WHERE endpoint = ?", (key,)
+                ).fetchone()
+            if row is None or (row[0] <= now and not row[1] and not row[2]):
+                return 0.0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT requests, tokens, updated, blocked_until, learned_rpm, learned_tpm "
+                    "FROM buckets WHERE endpoint = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    row = (None, None, now, 0.0, None, None)
+                req_bal, tok_bal, updated, blocked_until, learned_rpm, learned_tpm = row
+                rpm = rpm or learned_rpm
+                tpm = tpm or learned_tpm
+                elapsed = max(0.0, now - updated)
+
+                wait = max(0.0, blocked_until - now)
+                req_bal, w = _debit(req_bal, 1, rpm, elapsed)
+                wait = max(wait, w)
+                tok_bal, w = _debit(tok_bal, tokens, tpm, elapsed)
+                wait = max(wait, w)
+
+                self._db.execute(
+                    "INSERT INTO buckets (endpoint, requests, tokens, updated, blocked_until, learned_rpm, learned_tpm) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(endpoint) DO UPDATE SET "
+                    "requests = excluded.requests, tokens = excluded.tokens, updated = excluded.updated",
+                    (key, req_bal, tok_bal, now, blocked_until, learned_rpm, learned_tpm),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return wait
+
+    def observe(self, key: str, status: int, headers: Mapping[str, str]) -> Optional[float]:
+        """Learn from a provider response; return the block duration set, if any."""
+        h = {k.lower(): v for k, v in headers.items()}
+        learned_rpm = _to_float(h.get("x-ratelimit-limit-requests") or h.get("anthropic-ratelimit-requests-limit"))
+        learned_tpm = _to_float(h.get("x-ratelimit-limit-tokens") or h.get("anthropic-ratelimit-tokens-limit"))
+
+        block_s: Optional[float] = None
+        if status == 429:
+            block_s = _retry_after(h) or DEFAULT_BLOCK_S
+        elif _exhausted(h):
+            block_s = _retry_after(h)
+
+        if block_s is None and learned_rpm is None and learned_tpm is None:
+            return None
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO buckets (endpoint, updated) VALUES (?, ?) "
+                    "ON CONFLICT(endpoint) DO NOTHING",
+                    (key, now),
+                )
+                if block_s is not None:
+                    self._db.execute(
+                        "UPDATE buckets SET blocked_until = MAX(blocked_until, ?) WHERE endpoint = ?",
+                        (now + block_s, key),
+                    )
+                if learned_rpm is not None or learned_tpm is not None:
+                    self._db.execute(
+                        "UPDATE buckets SET learned_rpm = COALESCE(?, learned_rpm), "
+                        "learned_tpm = COALESCE(?, learned_tpm) WHERE endpoint = ?",
+                        (learned_rpm, learned_tpm, key),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if block_s is not None:
+            logger.info("rate limit on %s: pausing all callers for %.1fs", key, block_s)
+        return block_s
+
+
+def _debit(balance: Optional[float], amount: float, per_minute: Optional[float], elapsed: float):
+    """Refill a bucket for ``elapsed`` seconds, take ``amount``; return (balance, wait_s)."""
+    if not per_minute:
+        return balance, 0.0
+    rate = per_minute / 60.0
+    capacity = max(1.0, rate * BURST_S)
+    balance = capacity if balance is None else min(capacity, balance + elapsed * rate)
+    balance -= amount
+    return balance, (-balance / rate if balance < 0 else 0.0)
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds until a reset given as seconds, '6m0s'/'20ms', an HTTP date or RFC 3339."""
+    if not value:
+        return None
+    value = value.strip()
+    seconds = _to_float(value)
+    if seconds is not None:
+        return max(0.0, seconds)
+    parts = _DURATION.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            when = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _retry_after(h: Mapping[str, str]) -> Optional[float]:
+    for name in (
+        "retry-after",
+        "x-ratelimit-reset-requests",
+        "x-ratelimit-reset-tokens",
+        "anthropic-ratelimit-requests-reset",
+        "anthropic-ratelimit-tokens-reset",
+    ):
+        seconds = _parse_reset(h.get(name))
+        if seconds:
+            return seconds
+    return None
+
+
+def _exhausted(h: Mapping[str, str]) -> bool:
+    for name in (
+        "x-ratelimit-remaining-requests",
+        "x-ratelimit-remaining-tokens",
+        "anthropic-ratelimit-requests-remaining",
+        "anthropic-ratelimit-tokens-remaining",
+    ):
+        if h.get(name) is not None and _to_float(h.get(name)) == 0:
+            return True
+    return False
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def limiter() -> Optional[RateLimiter]:
+    """The host-wide limiter, or None when ``rate_limit.enabled`` is false."""
+    global _limiter
+    cfg = load_config().get("rate_limit", {}) or {}
+    if not cfg.get("enabled", True):
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                path = Path(cfg.get("path", ".cache/ratelimit.sqlite"))
+                if not path.is_absolute():
+                    path = REPO_ROOT / path
+                _limiter = RateLimiter(path)
+    return _limiter
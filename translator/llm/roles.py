@@ -2,35 +2,63 @@
 
 Skills ask for a *role* ("translator", "editor", "critic"); config decides which
 endpoint/model/temperature that role maps to. Swapping providers is a config edit,
-never a code change.
+never a code change. A role may also list several ``endpoints`` (plus a
+``fallback``); calls are then load-balanced by translator.llm.router. A
+``hedge:`` block enables tail-latency hedging for the role (translator.llm.hedge).
 """
 
 from __future__ import annotations
 
-from typing import Optional
+import threading
+from functools import partial
+from typing import Dict, List, Optional
 
 from translator.config import load_config
-from translator.llm.provider import Endpoint, LLMError, chat
+from translator.llm.cache import cache_key, response_cache
+from translator.llm import telemetry
+from translator.llm.hedge import HedgePolicy, policy_from_config
+from translator.llm.prompts import prompt_digest
+from translator.llm.provider import Endpoint, LLMError, chat, stream_chat
+from translator.llm.router import EndpointPool
+from translator.llm.streaming import AbortPredicate, Stream
 
+PROMPT_LABEL_CHARS = 16  # system prompt digest prefix recorded as the ``prompt`` telemetry label
 
-def _resolve(role: str) -> tuple[Endpoint, str, float]:
-    cfg = load_config()
-    roles = cfg.get("roles", {})
-    if role not in roles:
-        raise LLMError(f"role '{role}' not defined in config.roles")
-    rc = roles[role]
 
-    endpoints = cfg.get("endpoints", {})
-    ep_name = rc.get("endpoint")
-    if ep_name not in endpoints:
-        raise LLMError(f"endpoint '{ep_name}' for role '{role}' not defined in config.endpoints")
-    ec = endpoints[ep_name]
-
-    endpoint = Endpoint(
+def _endpoint(name: str, role: str) -> Endpoint:
+    endpoints = load_config().get("endpoints", {})
+    if name not in endpoints:
+        raise LLMError(f"endpoint '{name}' for role '{role}' not defined in config.endpoints")
+    ec = endpoints[name]
+    return Endpoint(
         provider=ec.get("provider", "openai"),
         base_url=ec.get("base_url") or None,
         api_key=ec.get("api_key") or None,
+        name=name,
+        pool_size=int(ec.get("pool_size", 10)),
+        keepalive=bool(ec.get("keepalive", True)),
+        http2=bool(ec.get("http2", False)),
+        max_concurrency=int(ec["max_concurrency"]) if ec.get("max_concurrency") else None,
+        rpm=float(ec["rpm"]) if ec.get("rpm") else None,
+        tpm=float(ec["tpm"]) if ec.get("tpm") else None,
     )
+
+
+def _role_config(role: str) -> dict:
+    roles = load_config().get("roles", {})
+    if role not in roles:
+        raise LLMError(f"role '{role}' not defined in config.roles")
+    return roles[role]
+
+
+def _resolve(role: str) -> tuple[Endpoint, str, float]:
+    """(endpoint, model, temperature) for a role; a pooled role resolves to its first endpoint."""
+    rc = _role_config(role)
+    ep_name = rc.get("endpoint")
+    if ep_name is None and rc.get("endpoints"):
+        first = rc["endpoints"][0]
+        ep_name = first["name"] if isinstance(first, dict) else first
+    endpoint = _endpoint(ep_name, role)
     model = rc.get("model") or ""
     if not model:
         raise LLMError(f"role '{role}' has no model configured")
@@ -38,6 +66,63 @@ def _resolve(role: str) -> tuple[Endpoint, str, float]:
     return endpoint, model, temperature
 
 
+_pools: Dict[str, Optional[EndpointPool]] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(role: str) -> Optional[EndpointPool]:
+    """The multi-endpoint pool for a role with ``endpoints:``, else None."""
+    if role in _pools:
+        return _pools[role]
+    # Built once per role, even when several threads make its first call together.
+    with _pools_lock:
+        if role in _pools:
+            return _pools[role]
+        rc = _role_config(role)
+        pool = None
+        if rc.get("endpoints"):
+            members = []
+            for m in rc["endpoints"]:
+                name, weight = (m["name"], float(m.get("weight", 1.0))) if isinstance(m, dict) else (m, 1.0)
+                members.append((_endpoint(name, role), weight))
+            fallback = None
+            fb = rc.get("fallback")
+            if fb:
+                fb_name, fb_model = (fb["endpoint"], fb.get("model")) if isinstance(fb, dict) else (fb, None)
+                fallback = (_endpoint(fb_name, role), fb_model)
+            pool = EndpointPool(members, fallback)
+        _pools[role] = pool
+    return _pools[role]
+
+
+def role_model(role: str) -> str:
+    """The model a role is bound to (a pool's members share it; the fallback may differ)."""
+    return _resolve(role)[1]
+
+
+def role_capacity(role: str) -> int:
+    """Calls the role's endpoints take at once: ``max_concurrency`` (or ``pool_size``), summed over a pool."""
+    pool = _pool(role)
+    if pool is not None:
+        return sum(ep.max_concurrency or ep.pool_size for ep, _ in pool.members)
+    endpoint, _, _ = _resolve(role)
+    return endpoint.max_concurrency or endpoint.pool_size
+
+
+_hedges: Dict[str, Optional[HedgePolicy]] = {}
+_hedges_lock = threading.Lock()
+
+
+def _hedge(role: str) -> Optional[HedgePolicy]:
+    """The role's hedging policy (one per role: it holds the latency samples), else None."""
+    if role in _hedges:
+        return _hedges[role]
+    with _hedges_lock:
+        if role not in _hedges:
+            _hedges[role] = policy_from_config(_role_config(role).get("hedge"))
+    return _hedges[role]
+
+
 def chat_as(
     role: str,
     system: str,
@@ -45,14 +130,136 @@ def chat_as(
     *,
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
+    stream: bool = False,
+    abort_if: Optional[AbortPredicate] = None,
+    cache: bool = True,
+    cache_prefix: bool = False,
 ) -> str:
-    """Run a chat turn using whichever model `role` is bound to in config."""
+    """Run a chat turn using whichever model `role` is bound to in config.
+
+    ``stream``/``abort_if`` opt into streamed reads with an early-abort guard
+    (see translator.llm.streaming). Replies are served from / stored in the
+    response cache unless ``cache=False`` (see translator.llm.cache).
+    ``cache_prefix`` marks ``system`` as a provider-cacheable prefix.
+    """
     endpoint, model, role_temp = _resolve(role)
-    return chat(
+    temperature = role_temp if temperature is None else temperature
+    pool = _pool(role)
+    store, key = _cache_lookup(cache, role, endpoint, pool, model, temperature, max_tokens, system, user)
+    if store is not None:
+        hit = store.get(key)
+        if hit is not None:
+            return hit
+    answered: List[Endpoint] = []
+    call = partial(pool.chat, answered=lambda ep, m: answered.append(ep)) if pool is not None else partial(
+        chat, endpoint=endpoint
+    )
+    with telemetry.context(prompt=prompt_digest(system)[:PROMPT_LABEL_CHARS]):
+        text = call(
+            system,
+            user,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=stream,
+            abort_if=abort_if,
+            cache_prefix=cache_prefix,
+            role=role,
+            hedge=_hedge(role),
+        )
+    if store is not None and _cacheable(pool, answered):
+        store.put(key, text)
+    return text
+
+
+def _cache_lookup(use_cache, role, endpoint, pool, model, temperature, max_tokens, system, user):
+    """(cache, key) for this call, or (None, "") when caching is off.
+
+    Pooled roles key on the role rather than on whichever replica answered
+    (replies from the pool's fallback are not stored, see ``_cacheable``).
+    """
+    store = response_cache() if use_cache else None
+    if store is None:
+        return None, ""
+    provider, base_url = ("pool", role) if pool is not None else (endpoint.provider, endpoint.base_url)
+    key = cache_key(role, provider, base_url, model, temperature, max_tokens, system, user)
+    return store, key
+
+
+def _cacheable(pool: Optional[EndpointPool], answered: List[Endpoint]) -> bool:
+    """Whether a reply may be stored: a pooled one only if a pool member produced it.
+
+    A fallback's reply would be keyed on the role's own model and served on
+    later runs even with the replicas healthy.
+    """
+    return pool is None or (bool(answered) and all(pool.is_member(ep) for ep in answered))
+
+
+def stream_as(
+    role: str,
+    system: str,
+    user: str,
+    *,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    abort_if: Optional[AbortPredicate] = None,
+    cache_prefix: bool = False,
+) -> Stream:
+    """Start a streamed turn for `role`; iterate the result for text deltas.
+
+    A single caller-driven stream cannot be re-routed mid-way, so pooled roles
+    stream from their first endpoint.
+    """
+    endpoint, model, role_temp = _resolve(role)
+    return stream_chat(
         system,
         user,
         endpoint=endpoint,
         model=model,
         temperature=role_temp if temperature is None else temperature,
         max_tokens=max_tokens,
+        abort_if=abort_if,
+        cache_prefix=cache_prefix,
+    )
+
+
+async def achat_as(
+    role: str,
+    system: str,
+    user: str,
+    *,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    cache: bool = True,
+    cache_prefix: bool = False,
+) -> str:
+    """Awaitable ``chat_as``; needs the optional async client (requirements-async.txt)."""
+    from translator.llm.aio import achat
+
+    endpoint, model, role_temp = _resolve(role)
+    temperature = role_temp if temperature is None else temperature
+    pool = _pool(role)
+    # The cache is a local SQLite file: lookups are sub-millisecond, so they
+    # run inline rather than in an executor.
+    store, key = _cache_lookup(cache, role, endpoint, pool, model, temperature, max_tokens, system, user)
+    if store is not None:
+        hit = store.get(key)
+        if hit is not None:
+            return hit
+    answered: List[Endpoint] = []
+    call = partial(pool.achat, answered=lambda ep, m: answered.append(ep)) if pool is not None else partial(
+        achat, endpoint=endpoint
     )
+    with telemetry.context(prompt=prompt_digest(system)[:PROMPT_LABEL_CHARS]):
+        text = await call(
+            system,
+            user,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            cache_prefix=cache_prefix,
+            role=role,
+        )
+    if store is not None and _cacheable(pool, answered):
+        store.put(key, text)
+    return text
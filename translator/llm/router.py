@@ -0,0 +1,294 @@
+"""Multi-endpoint pools: least-latency routing, circuit breaking, paid fallback.
+
+A role may list several endpoints instead of one (e.g. vLLM replicas), plus an
+optional fallback that is only used when every listed endpoint is unavailable:
+
+    roles:
+      translator:
+        endpoints: [vllm-a, {name: vllm-b, weight: 2}]
+        fallback: {endpoint: anthropic, model: claude-sonnet-4-5}
+        model: ${LLM_MODEL}
+
+Each call goes to the healthy, unsaturated endpoint with the lowest
+``latency EWMA x (in-flight + 1) / weight``. An endpoint that fails
+``FAILURE_THRESHOLD`` calls in a row is ejected for ``COOLDOWN_S``; after the
+cooldown it must pass a health probe (``GET {base_url}/models`` for
+OpenAI-compatible servers) before it receives traffic again; on the async path
+the probes run in worker threads, off the event loop. An endpoint is
+saturated once its in-flight count reaches ``max_concurrency`` (or ``pool_size``).
+
+Routing is invisible to callers: ``chat_as`` / ``achat_as`` pick the pool when a
+role has ``endpoints:`` configured. ``answered=`` reports which endpoint and
+model produced the reply, so ``chat_as`` does not cache a fallback's reply
+under the role's own model. A hedged call (``hedge:`` on the role) routes
+each leg separately, so the duplicate usually lands on another replica.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from translator.llm.hedge import HedgePolicy
+from translator.llm.provider import Cancelled, Endpoint, LLMError, _client, backoff_s, chat
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 3
+COOLDOWN_S = 30.0
+PROBE_TIMEOUT_S = 3.0
+EWMA_ALPHA = 0.3
+# Latency assumed for an endpoint with no observations yet (explore it early).
+DEFAULT_LATENCY_S = 1.0
+
+# Told which (endpoint, model) produced a pooled reply.
+Answered = Callable[[Endpoint, str], None]
+
+
+@dataclass
+class EndpointStats:
+    """Live health/latency view of one endpoint (process-wide)."""
+
+    latency_s: Optional[float] = None  # EWMA of successful call wall time
+    inflight: int = 0
+    failures: int = 0  # consecutive
+    open_until: float = 0.0  # circuit open (ejected) until this time
+
+    def capacity(self, ep: Endpoint) -> int:
+        return ep.max_concurrency or ep.pool_size
+
+
+# Shared by every pool, so two roles on the same replica see the same load.
+_stats: Dict[Endpoint, EndpointStats] = {}
+_lock = threading.Lock()
+
+
+def stats_for(ep: Endpoint) -> EndpointStats:
+    with _lock:
+        return _stats.setdefault(ep, EndpointStats())
+
+
+def _probe(ep: Endpoint) -> bool:
+    """Active health check used before re-admitting an ejected endpoint."""
+    if (ep.provider or "openai").lower() != "openai" or not ep.base_url:
+        return True  # hosted APIs: let the half-open trial call decide
+    headers = {"Authorization": f"Bearer {ep.api_key}"} if ep.api_key else {}
+    try:
+        resp = _client(ep).get(f"{ep.base_url.rstrip('/')}/models", headers=headers, timeout=PROBE_TIMEOUT_S)
+        return resp.status_code == 200
+    except Exception:  # noqa: BLE001 - any transport error means unhealthy
+        return False
+
+
+class EndpointPool:
+    """Weighted endpoints for one role, with an optional fallback (endpoint, model)."""
+
+    def __init__(self, members: List[Tuple[Endpoint, float]], fallback: Optional[Tuple[Endpoint, Optional[str]]] = None):
+        if not members:
+            raise LLMError("endpoint pool needs at least one endpoint")
+        self.members = members
+        self.fallback = fallback
+        self._weights = dict(members)
+
+    # --- routing --------------------------------------------------------------
+
+    def pick(self, model: str, avoid: Sequence[Endpoint] = ()) -> Tuple[Endpoint, str]:
+        """Choose the endpoint (and model) for the next call and mark it in flight.
+
+        Endpoints in ``avoid`` (already serving another leg of a hedged call)
+        are only chosen when no other member is available. Cooled-down
+        endpoints are probed first, a blocking GET each.
+        """
+        candidates, reopened = self._scan()
+        for ep in reopened:
+            self._readmit(ep, _probe(ep), candidates)
+        return self._choose(model, avoid, candidates)
+
+    async def apick(self, model: str, avoid: Sequence[Endpoint] = ()) -> Tuple[Endpoint, str]:
+        """``pick`` for the event loop: health probes run in worker threads."""
+        candidates, reopened = self._scan()
+        if reopened:
+            healthy = await asyncio.gather(*(asyncio.to_thread(_probe, ep) for ep in reopened))
+            for ep, ok in zip(reopened, healthy):
+                self._readmit(ep, ok, candidates)
+        return self._choose(model, avoid, candidates)
+
+    def _score(self, ep: Endpoint, st: EndpointStats) -> float:
+        latency = st.latency_s if st.latency_s is not None else DEFAULT_LATENCY_S
+        return latency * (st.inflight + 1) / max(self._weights[ep], 1e-6)
+
+    def _scan(self) -> Tuple[List[Tuple[float, Endpoint]], List[Endpoint]]:
+        """(scored available members, cooled-down members awaiting a probe)."""
+        now = time.time()
+        candidates: List[Tuple[float, Endpoint]] = []
+        reopened: List[Endpoint] = []
+        with _lock:
+            for ep, _ in self.members:
+                st = _stats.setdefault(ep, EndpointStats())
+                if st.open_until > now:
+                    continue
+                if st.open_until:
+                    reopened.append(ep)
+                    continue
+                if st.inflight >= st.capacity(ep):
+                    continue
+                candidates.append((self._score(ep, st), ep))
+        return candidates, reopened
+
+    def _readmit(self, ep: Endpoint, healthy: bool, candidates: List[Tuple[float, Endpoint]]) -> None:
+        """Apply a probe's result: re-admit ``ep`` as a candidate, or restart its cooldown."""
+        with _lock:
+            st = _stats[ep]
+            if healthy:
+                st.open_until = 0.0
+                st.failures = FAILURE_THRESHOLD - 1  # half-open: one more failure re-ejects
+                candidates.append((self._score(ep, st), ep))
+                logger.info("endpoint %s passed health probe; re-admitted", ep.name)
+            else:
+                st.open_until = time.time() + COOLDOWN_S
+
+    def _choose(
+        self, model: str, avoid: Sequence[Endpoint], candidates: List[Tuple[float, Endpoint]]
+    ) -> Tuple[Endpoint, str]:
+        preferred = [c for c in candidates if c[1] not in avoid]
+        if candidates:
+            ep = min(preferred or candidates, key=lambda c: c[0])[1]
+            chosen = (ep, model)
+        elif self.fallback is not None:
+            fb_ep, fb_model = self.fallback
+            logger.info("all pool endpoints ejected or saturated; using fallback %s", fb_ep.name)
+            chosen = (fb_ep, fb_model or model)
+        else:
+            # Nothing healthy and no fallback: least-loaded member, breaker or not.
+            with _lock:
+                ep = min(self.members, key=lambda m: _stats[m[0]].inflight / max(m[1], 1e-6))[0]
+            chosen = (ep, model)
+
+        with _lock:
+            _stats.setdefault(chosen[0], EndpointStats()).inflight += 1
+        return chosen
+
+    def record(self, ep: Endpoint, ok: Optional[bool], elapsed_s: float) -> None:
+        """Release the in-flight slot and update latency / breaker state.
+
+        ``ok=None`` (a cancelled call) only releases the slot.
+        """
+        with _lock:
+            st = _stats.setdefault(ep, EndpointStats())
+            st.inflight = max(0, st.inflight - 1)
+            if ok is None:
+                return
+            if ok:
+                st.failures = 0
+                st.latency_s = elapsed_s if st.latency_s is None else (
+                    EWMA_ALPHA * elapsed_s + (1 - EWMA_ALPHA) * st.latency_s
+                )
+                return
+            st.failures += 1
+            if st.failures >= FAILURE_THRESHOLD and not st.open_until:
+                st.open_until = time.time() + COOLDOWN_S
+                logger.warning("endpoint %s ejected for %.0fs after %d failures", ep.name, COOLDOWN_S, st.failures)
+
+    def is_member(self, ep: Endpoint) -> bool:
+        """False for the fallback endpoint (unless it is also a listed member)."""
+        return ep in self._weights
+
+    # --- calls ----------------------------------------------------------------
+
+    def chat(
+        self,
+        system: str,
+        user: str,
+        *,
+        model: str,
+        retries: int = 3,
+        hedge: Optional[HedgePolicy] = None,
+        answered: Optional[Answered] = None,
+        **kwargs,
+    ) -> str:
+        """``chat()`` with one attempt per pick, so a retry can move to another endpoint.
+
+        ``answered(endpoint, model)`` is called with whoever produced the reply.
+        """
+        if hedge is not None:
+            used: List[Endpoint] = []  # the duplicate leg avoids the primary's endpoint
+            return hedge.run(
+                lambda leg: self._chat(system, user, model, retries, used, answered, cancel=leg, **kwargs),
+                size=len(user),
+            )
+        return self._chat(system, user, model, retries, [], answered, **kwargs)
+
+    def _chat(
+        self,
+        system: str,
+        user: str,
+        model: str,
+        retries: int,
+        used: List[Endpoint],
+        answered: Optional[Answered],
+        **kwargs,
+    ) -> str:
+        cancel = kwargs.get("cancel")
+        last_err: Optional[Exception] = None
+        for attempt in range(1, retries + 1):
+            ep, ep_model = self.pick(model, avoid=used)
+            used.append(ep)
+            started = time.monotonic()
+            try:
+                text = chat(system, user, endpoint=ep, model=ep_model, retries=1, **kwargs)
+            except Cancelled:
+                self.record(ep, None, time.monotonic() - started)
+                raise
+            except LLMError as e:
+                self.record(ep, False, time.monotonic() - started)
+                last_err = e
+                if attempt < retries:
+                    delay = self._retry_delay(ep, attempt)
+                    if cancel is not None:
+                        cancel.wait(delay)
+                    else:
+                        time.sleep(delay)
+                continue
+            self.record(ep, True, time.monotonic() - started)
+            if answered is not None:
+                answered(ep, ep_model)
+            return text
+        raise LLMError(f"pool failed after {retries} attempts: {last_err}")
+
+    async def achat(
+        self, system: str, user: str, *, model: str, retries: int = 3, answered: Optional[Answered] = None, **kwargs
+    ) -> str:
+        """Async twin of ``chat`` (needs the optional async client)."""
+        from translator.llm.aio import achat
+
+        last_err: Optional[Exception] = None
+        for attempt in range(1, retries + 1):
+            ep, ep_model = await self.apick(model)
+            started = time.monotonic()
+            try:
+                text = await achat(system, user, endpoint=ep, model=ep_model, retries=1, **kwargs)
+            except LLMError as e:
+                self.record(ep, False, time.monotonic() - started)
+                last_err = e
+                if attempt < retries:
+                    await asyncio.sleep(self._retry_delay(ep, attempt))
+                continue
+            self.record(ep, True, time.monotonic() - started)
+            if answered is not None:
+                answered(ep, ep_model)
+            return text
+        raise LLMError(f"pool failed after {retries} attempts: {last_err}")
+
+    def _retry_delay(self, failed: Endpoint, attempt: int) -> float:
+        """No wait when another healthy member can take the retry; else the usual backoff."""
+        now = time.time()
+        with _lock:
+            for ep, _ in self.members:
+                st = _stats.setdefault(ep, EndpointStats())
+                if ep != failed and st.open_until <= now and st.inflight < st.capacity(ep):
+                    return 0.0
+        return backoff_s(attempt)
@@ -0,0 +1,173 @@
+"""Streamed completions: SSE decoding, incremental text, early-abort guards.
+
+``provider.stream_chat()`` returns a ``Stream``; iterate it to get text deltas as
+the model produces them. After the first delta ``ttft_s`` holds the
+time-to-first-token. An ``abort_if(text_so_far) -> bool`` predicate is checked
+as text arrives; when it fires the connection is closed and ``StreamAborted`` is
+raised, which ``chat(stream=True)`` treats like any other failed attempt (retry).
+Token usage reported inside the stream ends up in ``Stream.usage``.
+
+Guards here are cheap, tail-only predicates meant for ``abort_if``. Stateful
+ones (``repetition_guard``) are copied fresh by every ``Stream``, so a retry or
+a concurrent hedge leg never inherits another attempt's progress:
+
+    chat_as("translator", system, chunk, stream=True,
+            abort_if=any_of(repetition_guard(), length_ratio_guard(chunk)))
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from translator.llm.usage import Usage
+
+AbortPredicate = Callable[[str], bool]
+
+
+class StreamAborted(RuntimeError):
+    """Raised from a ``Stream`` when its abort predicate fires."""
+
+
+def sse_data(lines: Iterable[str]) -> Iterator[dict]:
+    """Yield the JSON payload of each ``data:`` line of a server-sent-event stream.
+
+    All three providers send one JSON object per ``data:`` line, so multi-line
+    events are not reassembled. OpenAI's ``[DONE]`` sentinel ends the stream.
+    """
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield json.loads(data)
+
+
+class Stream:
+    """Iterator over the text deltas of one streamed completion."""
+
+    def __init__(
+        self,
+        events: Iterable[dict],
+        delta: Callable[[dict], Optional[str]],
+        close: Callable[[], None],
+        *,
+        abort_if: Optional[AbortPredicate] = None,
+        started: Optional[float] = None,
+        usage_of: Optional[Callable[[dict], Optional[Usage]]] = None,
+    ) -> None:
+        self._events = events
+        self._delta = delta
+        self._close = close
+        self._abort_if = fresh(abort_if)
+        self._started = time.monotonic() if started is None else started
+        self._usage_of = usage_of
+        self.text = ""
+        self.ttft_s: Optional[float] = None  # seconds until the first non-empty delta
+        self.elapsed_s: Optional[float] = None  # set when the stream ends
+        self.aborted = False
+        self.usage: Optional[Usage] = None  # merged from usage-bearing events, if any
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for event in self._events:
+                if self._usage_of is not None:
+                    u = self._usage_of(event)
+                    if u is not None:
+                        self.usage = u if self.usage is None else self.usage.merge(u)
+                piece = self._delta(event)
+                if not piece:
+                    continue
+                if self.ttft_s is None:
+                    self.ttft_s = time.monotonic() - self._started
+                self.text += piece
+                yield piece
+                if self._abort_if is not None and self._abort_if(self.text):
+                    self.aborted = True
+                    raise StreamAborted(f"aborted by guard after {len(self.text)} chars")
+        finally:
+            self.elapsed_s = time.monotonic() - self._started
+            self.close()
+
+    def read(self) -> str:
+        """Consume the rest of the stream and return the full text."""
+        for _ in self:
+            pass
+        return self.text
+
+    def close(self) -> None:
+        """Drop the underlying connection (safe to call more than once)."""
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+# --- Abort guards ---------------------------------------------------------------
+
+
+def fresh(predicate: Optional[AbortPredicate]) -> Optional[AbortPredicate]:
+    """A copy of a stateful guard with its state reset; stateless predicates as is."""
+    renew = getattr(predicate, "fresh", None)
+    return renew() if renew is not None else predicate
+
+
+class _RepetitionGuard:
+    def __init__(self, repeats: int, min_unit: int, max_unit: int, every: int) -> None:
+        self.params = (repeats, min_unit, max_unit, every)
+        self.last_checked = 0
+
+    def fresh(self) -> "_RepetitionGuard":
+        return _RepetitionGuard(*self.params)
+
+    def __call__(self, text: str) -> bool:
+        repeats, min_unit, max_unit, every = self.params
+        if len(text) < self.last_checked:
+            self.last_checked = 0  # a new attempt fed to a reused guard
+        if len(text) - self.last_checked < every:
+            return False
+        self.last_checked = len(text)
+        tail = text[-max_unit * repeats:]
+        for size in range(min_unit, min(max_unit, len(tail) // repeats) + 1):
+            unit = tail[-size:]
+            if unit.strip() and tail.endswith(unit * repeats):
+                return True
+        return False
+
+
+def repetition_guard(repeats: int = 4, min_unit: int = 8, max_unit: int = 120, every: int = 32) -> AbortPredicate:
+    """Fire when the output ends in the same ``min_unit..max_unit``-char unit
+    repeated ``repeats`` times back to back (a model stuck in a loop).
+
+    Only re-checks after ``every`` new characters, and only looks at the tail.
+    The check position is per guard; ``Stream`` takes a ``fresh`` copy per attempt.
+    """
+    return _RepetitionGuard(repeats, min_unit, max_unit, every)
+
+
+def length_ratio_guard(source: str, max_ratio: float = 8.0, min_chars: int = 500) -> AbortPredicate:
+    """Fire when the output grows past ``max_ratio`` x the source length.
+
+    A zh->vi translation is usually 3-4x the Chinese character count, so the
+    default leaves plenty of room for honest output.
+    """
+    limit = max(min_chars, int(len(source) * max_ratio))
+    return lambda text: len(text) > limit
+
+
+class _AnyOf:
+    def __init__(self, predicates: List[AbortPredicate]) -> None:
+        self.predicates = predicates
+
+    def fresh(self) -> "_AnyOf":
+        return _AnyOf([fresh(p) for p in self.predicates])
+
+    def __call__(self, text: str) -> bool:
+        return any(p(text) for p in self.predicates)
+
+
+def any_of(*predicates: Optional[AbortPredicate]) -> AbortPredicate:
+    """Combine guards: abort as soon as any of them fires."""
+    return _AnyOf([p for p in predicates if p is not None])
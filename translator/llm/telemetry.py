@@ -0,0 +1,338 @@
+"""Per-call LLM telemetry: one record per ``chat()`` call, aggregated per run.
+
+Every call records role, model, endpoint, token usage (from the provider's
+``usage`` block), wall time, time-to-first-token (streamed calls), attempts and
+outcome. Records are
+
+- appended to a JSONL trace (``telemetry.trace``), one line per call;
+- aggregated into counters and latency histograms per (role, model, endpoint),
+  exported in the Prometheus text format to a textfile (``telemetry.textfile``,
+  for node_exporter's textfile collector) and/or served over HTTP
+  (``telemetry.port``) while a run is going;
+- summarized at the end of a run (``summary()``): p50/p95 latency per role and
+  the chapters that spent the most time waiting on the model.
+
+Chapter attribution comes from ``context()``: ``call_tool`` labels every call
+made by a skill with its tool, book and chapter file.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from translator.config import REPO_ROOT, load_config
+
+logger = logging.getLogger(__name__)
+
+# Seconds; chosen around local-model chunk times (a 4k-char chunk takes 10-60 s).
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+TEXTFILE_EVERY_S = 15.0  # rewrite the textfile at most this often during a run
+
+_labels: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("llm_telemetry_labels", default={})
+
+
+@contextlib.contextmanager
+def context(**labels: Optional[str]) -> Iterator[None]:
+    """Attach labels (e.g. ``book``, ``chapter``) to every call made inside."""
+    merged = {**_labels.get(), **{k: str(v) for k, v in labels.items() if v is not None}}
+    token = _labels.set(merged)
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def labels() -> Dict[str, str]:
+    """The labels ``context()`` has attached to the current call."""
+    return dict(_labels.get())
+
+
+@dataclass
+class CallRecord:
+    """One ``chat()`` call, as written to the trace."""
+
+    role: str
+    model: str
+    endpoint: str
+    outcome: str  # ok | error | cancelled
+    wall_s: float
+    attempts: int
+    ttft_s: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    error: Optional[str] = None
+    ts: float = field(default_factory=time.time)
+    labels: Dict[str, str] = field(default_factory=dict)
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus semantics: cumulative on export)."""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding rank q."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+
+@dataclass
+class _Series:
+    """Aggregates for one (role, model, endpoint)."""
+
+    calls: Dict[str, int] = field(default_factory=dict)  # outcome -> count
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+    ttft: Histogram = field(default_factory=Histogram)
+
+
+_Key = Tuple[str, str, str]
+
+
+class Telemetry:
+    """Thread-safe sink for ``CallRecord``s: trace file, aggregates, exports."""
+
+    def __init__(self, trace: Optional[Path] = None, textfile: Optional[Path] = None) -> None:
+        self.trace = trace
+        self.textfile = textfile
+        self._lock = threading.Lock()
+        self._series: Dict[_Key, _Series] = {}
+        self._chapter_s: Dict[str, float] = {}
+        self._last_textfile = 0.0
+        if trace is not None:
+            trace.parent.mkdir(parents=True, exist_ok=True)
+
+    def record(self, rec: CallRecord) -> None:
+        with self._lock:
+            s = self._series.setdefault((rec.role, rec.model, rec.endpoint), _Series())
+            s.calls[rec.outcome] = s.calls.get(rec.outcome, 0) + 1
+            s.retries += rec.attempts - 1
+            s.prompt_tokens += rec.prompt_tokens
+            s.completion_tokens += rec.completion_tokens
+            s.cached_tokens += rec.cached_tokens
+            s.latency.observe(rec.wall_s)
+            if rec.ttft_s is not None:
+                s.ttft.observe(rec.ttft_s)
+            chapter = rec.labels.get("chapter")
+            if chapter:
+                name = f"{rec.labels.get('book', '')}/{chapter}".lstrip("/")
+                self._chapter_s[name] = self._chapter_s.get(name, 0.0) + rec.wall_s
+            if self.trace is not None:
+                with open(self.trace, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(rec), ensure_ascii=False) + "\n")
+            flush = self.textfile is not None and time.monotonic() - self._last_textfile >= TEXTFILE_EVERY_S
+        if flush:
+            self.write_textfile()
+
+    # --- Export -----------------------------------------------------------------
+
+    def prometheus(self) -> str:
+        """All aggregates in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            items = sorted(self._series.items())
+            out: List[str] = []
+
+            def header(name: str, kind: str, help_: str) -> None:
+                out.append(f"# HELP {name} {help_}")
+                out.append(f"# TYPE {name} {kind}")
+
+            header("llm_calls_total", "counter", "LLM calls by outcome.")
+            for key, s in items:
+                for outcome, n in sorted(s.calls.items()):
+                    out.append(f"llm_calls_total{_labelset(key, outcome=outcome)} {n}")
+            for name, attr, help_ in (
+                ("llm_retries_total", "retries", "Extra attempts beyond the first."),
+                ("llm_prompt_tokens_total", "prompt_tokens", "Prompt tokens reported by the provider."),
+                ("llm_completion_tokens_total", "completion_tokens", "Completion tokens reported by the provider."),
+                ("llm_cached_tokens_total", "cached_tokens", "Prompt tokens served from the provider's prompt cache."),
+            ):
+                header(name, "counter", help_)
+                for key, s in items:
+                    out.append(f"{name}{_labelset(key)} {getattr(s, attr)}")
+            for name, attr, help_ in (
+                ("llm_call_duration_seconds", "latency", "Wall time of a chat() call, retries included."),
+                ("llm_ttft_seconds", "ttft", "Time to first streamed token."),
+            ):
+                header(name, "histogram", help_)
+                for key, s in items:
+                    h: Histogram = getattr(s, attr)
+                    cumulative = 0
+                    for bound, n in zip(list(h.bounds) + ["+Inf"], h.counts):
+                        cumulative += n
+                        out.append(f"{name}_bucket{_labelset(key, le=str(bound))} {cumulative}")
+                    out.append(f"{name}_sum{_labelset(key)} {h.sum:.6f}")
+                    out.append(f"{name}_count{_labelset(key)} {h.count}")
+            return "\n".join(out) + "\n"
+
+    def write_textfile(self) -> None:
+        """Atomically rewrite the textfile (node_exporter reads it whole)."""
+        if self.textfile is None:
+            return
+        self.textfile.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.textfile.with_suffix(self.textfile.suffix + ".tmp")
+        tmp.write_text(self.prometheus(), encoding="utf-8")
+        os.replace(tmp, self.textfile)
+        self._last_textfile = time.monotonic()
+
+    def summary(self, slowest: int = 5) -> Dict:
+        """Per-series call counts, latency percentiles and tokens; slowest chapters."""
+        with self._lock:
+            series = {}
+            for (role, model, endpoint), s in sorted(self._series.items()):
+                series[f"{role}:{model}@{endpoint}"] = {
+                    "calls": sum(s.calls.values()),
+                    "errors": s.calls.get("error", 0),
+                    "retries": s.retries,
+                    "p50_s": _round(s.latency.quantile(0.5)),
+                    "p95_s": _round(s.latency.quantile(0.95)),
+                    "ttft_p50_s": _round(s.ttft.quantile(0.5)),
+                    "prompt_tokens": s.prompt_tokens,
+                    "completion_tokens": s.completion_tokens,
+                    "cached_tokens": s.cached_tokens,
+                }
+            top = sorted(self._chapter_s.items(), key=lambda kv: kv[1], reverse=True)[:slowest]
+            return {"series": series, "slowest_chapters": [(name, round(s, 1)) for name, s in top]}
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labelset(key: _Key, **extra: str) -> str:
+    role, model, endpoint = key
+    pairs = {"role": role, "model": model, "endpoint": endpoint, **extra}
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs.items()) + "}"
+
+
+# --- Process-wide sink ------------------------------------------------------------
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def _path(value: Optional[str]) -> Optional[Path]:
+    if not value:
+        return None
+    path = Path(value)
+    return path if path.is_absolute() else REPO_ROOT / path
+
+
+def telemetry() -> Optional[Telemetry]:
+    """The process-wide sink, or None when ``telemetry.enabled`` is false."""
+    global _telemetry
+    cfg = load_config().get("telemetry", {}) or {}
+    if not cfg.get("enabled", True):
+        return None
+    if _telemetry is None:
+        with _telemetry_lock:
+            if _telemetry is None:
+                trace = cfg.get("trace")
+                if trace:
+                    trace = trace.format(run=time.strftime("%Y%m%d-%H%M%S"), pid=os.getpid())
+                _telemetry = Telemetry(_path(trace), _path(cfg.get("textfile")))
+    return _telemetry
+
+
+def record(rec: CallRecord) -> None:
+    """Add one call to the process-wide sink (labels come from ``context()``)."""
+    sink = telemetry()
+    if sink is None:
+        return
+    rec.labels = {**_labels.get(), **rec.labels}
+    try:
+        sink.record(rec)
+    except OSError as e:  # a full disk must not fail the translation
+        logger.warning("telemetry write failed: %s", e)
+
+
+def serve(port: Optional[int] = None, host: str = "127.0.0.1") -> Optional[int]:
+    """Serve ``/metrics`` from a daemon thread; returns the bound port.
+
+    ``port`` defaults to ``telemetry.port``; nothing is started when neither is
+    set or the sink is disabled. Safe to call more than once.
+    """
+    global _server
+    cfg = load_config().get("telemetry", {}) or {}
+    port = cfg.get("port") if port is None else port
+    sink = telemetry()
+    if port is None or sink is None:
+        return None
+    if _server is None:
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = sink.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        _server = ThreadingHTTPServer((host, int(port)), _Handler)
+        threading.Thread(target=_server.serve_forever, name="llm-metrics", daemon=True).start()
+        logger.info("LLM metrics on http://%s:%d/metrics", host, _server.server_port)
+    return _server.server_port
+
+
+def finish() -> Optional[Dict]:
+    """End of run: flush the textfile, log and return the summary."""
+    sink = _telemetry
+    if sink is None:
+        return None
+    sink.write_textfile()
+    summary = sink.summary()
+    for name, s in summary["series"].items():
+        logger.info(
+            "LLM %s: %d call(s), %d error(s), %d retr%s, p50 %ss, p95 %ss, TTFT p50 %ss.",
+            name, s["calls"], s["errors"], s["retries"], "y" if s["retries"] == 1 else "ies",
+            s["p50_s"], s["p95_s"], s["ttft_p50_s"],
+        )
+    if summary["slowest_chapters"]:
+        logger.info("Slowest chapters (LLM seconds): %s", summary["slowest_chapters"])
+    return summary
@@ -0,0 +1,116 @@
+"""Token counting per role, for budgeting prompts instead of counting characters.
+
+A 4000-character Chinese chunk and a 4000-character Vietnamese chunk differ
+several-fold in tokens, so chunk sizes are best expressed in the model's own
+tokens. Each role may name a tokenizer in config.yaml:
+
+    roles:
+      translator:
+        tokenizer: hf:Qwen/Qwen2.5-72B-Instruct   # or tiktoken:o200k_base, or heuristic
+        context_window: 32768
+
+``hf:`` needs ``tokenizers`` (or ``transformers``) and ``tiktoken:`` needs
+``tiktoken``; when the library is missing the fast heuristic is used instead.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Optional, Protocol
+
+from translator.config import load_config
+
+logger = logging.getLogger(__name__)
+
+_CJK = re.compile(r"[一-鿿㐀-䶿]")
+
+# Room left for chat-template tokens and tokenizer disagreement.
+SAFETY_MARGIN_TOKENS = 256
+
+
+def heuristic_tokens(text: str) -> int:
+    """Fast estimate: ~1 token per CJK char, ~3 chars per token otherwise.
+
+    Errs high for Vietnamese (diacritics split into extra tokens on most
+    tokenizers), which is the safe side for a context budget.
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 3)
+
+
+class Tokenizer(Protocol):
+    def count(self, text: str) -> int: ...
+
+
+class HeuristicTokenizer:
+    def count(self, text: str) -> int:
+        return heuristic_tokens(text)
+
+
+class _TiktokenTokenizer:
+    def __init__(self, encoding: str) -> None:
+        import tiktoken
+
+        self._enc = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        return len(self._enc.encode(text, disallowed_special=()))
+
+
+class _HFTokenizer:
+    def __init__(self, name: str) -> None:
+        try:
+            from tokenizers import Tokenizer as HFTokenizer
+
+            self._tok = HFTokenizer.from_pretrained(name)
+            self._encode = lambda t: self._tok.encode(t, add_special_tokens=False).ids
+        except ImportError:
+            from transformers import AutoTokenizer
+
+            self._tok = AutoTokenizer.from_pretrained(name)
+            self._encode = lambda t: self._tok.encode(t, add_special_tokens=False)
+
+    def count(self, text: str) -> int:
+        return len(self._encode(text))
+
+
+@lru_cache(maxsize=None)
+def load_tokenizer(spec: str) -> Tokenizer:
+    """``heuristic`` | ``tiktoken:<encoding>`` | ``hf:<model id>``; heuristic on failure."""
+    kind, _, name = (spec or "heuristic").partition(":")
+    try:
+        if kind == "tiktoken":
+            return _TiktokenTokenizer(name or "o200k_base")
+        if kind == "hf":
+            return _HFTokenizer(name)
+    except Exception as e:  # noqa: BLE001 - missing lib / offline hub: degrade, don't fail
+        logger.warning("tokenizer '%s' unavailable (%s); using heuristic", spec, e)
+    return HeuristicTokenizer()
+
+
+def tokenizer_for(role: str) -> Tokenizer:
+    rc = load_config().get("roles", {}).get(role, {})
+    return load_tokenizer(rc.get("tokenizer") or "heuristic")
+
+
+def chunk_token_budget(role: str, system_prompt: str) -> Optional[int]:
+    """Source tokens per chunk for ``role``, or None to keep character chunking.
+
+    ``pipeline.chunk_tokens`` wins if set. Otherwise, with a ``context_window``
+    on the role, the budget is what is left after the system prompt and a
+    safety margin, split between the input and its expected output
+    (``pipeline.output_expansion`` output tokens per input token).
+    """
+    cfg = load_config()
+    pipeline = cfg.get("pipeline", {})
+    if pipeline.get("chunk_tokens"):
+        return int(pipeline["chunk_tokens"])
+    window = cfg.get("roles", {}).get(role, {}).get("context_window")
+    if not window:
+        return None
+    expansion = float(pipeline.get("output_expansion", 1.6))
+    available = int(window) - tokenizer_for(role).count(system_prompt) - SAFETY_MARGIN_TOKENS
+    return max(1, int(available / (1 + expansion)))
@@ -0,0 +1,101 @@
+"""Token usage reported by the providers, including prompt-cache hits.
+
+Every successful call's ``usage`` block is normalized into a ``Usage`` and added
+to process-wide totals per (endpoint, model), so a run can report how much of
+its prompt traffic was served from the provider's prefix cache:
+
+- OpenAI-compatible (incl. vLLM): ``usage.prompt_tokens_details.cached_tokens``
+- Anthropic: ``usage.cache_read_input_tokens`` / ``cache_creation_input_tokens``
+- Gemini: ``usageMetadata.cachedContentTokenCount``
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class Usage:
+    """Normalized token counts for one call (prompt_tokens includes cached ones)."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0  # prompt tokens read from the provider's prefix cache
+    cache_write_tokens: int = 0  # prompt tokens written to it (Anthropic)
+
+    def merge(self, other: "Usage") -> "Usage":
+        """Field-wise max: streamed events report partial, cumulative counts."""
+        return Usage(
+            max(self.prompt_tokens, other.prompt_tokens),
+            max(self.completion_tokens, other.completion_tokens),
+            max(self.cached_tokens, other.cached_tokens),
+            max(self.cache_write_tokens, other.cache_write_tokens),
+        )
+
+
+def _int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def openai_usage(data: dict) -> Optional[Usage]:
+    u = data.get("usage")
+    if not u:
+        return None
+    details = u.get("prompt_tokens_details") or {}
+    return Usage(_int(u.get("prompt_tokens")), _int(u.get("completion_tokens")), _int(details.get("cached_tokens")))
+
+
+def anthropic_usage(data: dict) -> Optional[Usage]:
+    # Non-streamed replies carry ``usage`` at the top; streamed ones inside
+    # message_start.message and message_delta.
+    u = data.get("usage") or (data.get("message") or {}).get("usage")
+    if not u:
+        return None
+    read = _int(u.get("cache_read_input_tokens"))
+    write = _int(u.get("cache_creation_input_tokens"))
+    # Anthropic's input_tokens excludes cached/cache-written tokens.
+    prompt = _int(u.get("input_tokens")) + read + write
+    return Usage(prompt, _int(u.get("output_tokens")), read, write)
+
+
+def google_usage(data: dict) -> Optional[Usage]:
+    u = data.get("usageMetadata")
+    if not u:
+        return None
+    return Usage(
+        _int(u.get("promptTokenCount")),
+        _int(u.get("candidatesTokenCount")),
+        _int(u.get("cachedContentTokenCount")),
+    )
+
+
+class UsageTotals:
+    """Thread-safe running totals keyed by (endpoint name, model)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    def add(self, endpoint: str, model: str, usage: Usage) -> None:
+        with self._lock:
+            t = self._totals.setdefault((endpoint, model), {"calls": 0, **asdict(Usage())})
+            t["calls"] += 1
+            for k, v in asdict(usage).items():
+                t[k] += v
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """``{"endpoint/model": {calls, prompt_tokens, ..., cache_hit_rate}}``."""
+        with self._lock:
+            out = {}
+            for (endpoint, model), t in self._totals.items():
+                rate = t["cached_tokens"] / t["prompt_tokens"] if t["prompt_tokens"] else 0.0
+                out[f"{endpoint}/{model}"] = {**t, "cache_hit_rate": round(rate, 4)}
+            return out
+
+
+totals = UsageTotals()
@@ -10,6 +10,7 @@ from __future__ import annotations
 
 from typing import Callable, Dict, Tuple
 
+from translator.llm import telemetry
 from translator.skills import book, edit_chapter, glossary, qa_chapter, scrape_chapters, translate_chapter
 
 # name -> (json-schema tool def, callable)
@@ -30,8 +31,9 @@ def tool_schemas() -> list[dict]:
 
 
 def call_tool(name: str, args: dict) -> dict:
-    """Dispatch a tool call by name."""
+    """Dispatch a tool call by name (LLM telemetry is labelled with its chapter)."""
     if name not in TOOL_REGISTRY:
         raise KeyError(f"unknown tool: {name}")
     _, fn = TOOL_REGISTRY[name]
-    return fn(args)
+    with telemetry.context(tool=name, book=args.get("book_id"), chapter=args.get("chapter_file")):
+        return fn(args)
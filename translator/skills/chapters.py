@@ -13,19 +13,36 @@ Chapter markdown files (across scrape versions) look roughly like:
 
 We parse leniently so both old and new files work, and so translated files
 round-trip.
+
+Parsed chapters are kept in a small in-process LRU cache keyed on path, mtime
+and size (``pipeline.chapter_cache_mb``), since one chapter's sources are read
+again by edit, QA and every auto-fix round. ``write_chapter`` replaces a file
+atomically and refreshes its cache entry, so readers never see stale text.
 """
 
 from __future__ import annotations
 
+import os
 import re
+import sys
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
+
+from translator.config import load_config
 
 # Matches the "content" section heading in Chinese or Vietnamese.
 _CONTENT_HEADING = re.compile(r"^#{1,6}\s*(内容|Content|Nội dung).*$", re.IGNORECASE)
 _TITLE_HEADING = re.compile(r"^#{1,6}\s*(标题|Title|Tiêu đề).*$", re.IGNORECASE)
-_TIMESTAMP_FOOTER = re.compile(r"^\*?\s*(生成时间|Thời gian tạo)", re.IGNORECASE)
+# The generation-time footer: at the start of a body, or on any later line.
+# (Searching for "\n..." lets the regex engine skip ahead to each line break.)
+_FOOTER = re.compile(r"\*?\s*(生成时间|Thời gian tạo)", re.IGNORECASE)
+_FOOTER_LINE = re.compile(r"\n\s*\*?\s*(生成时间|Thời gian tạo)", re.IGNORECASE)
+_LEADING_RULES = re.compile(r"(---\s*\n?)+")
+# Line breaks str.splitlines() honours besides \n.
+_OTHER_BREAKS = ("\r", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
 _CJK = re.compile(r"[一-鿿㐀-䶿]")
 
 
@@ -46,54 +63,180 @@ def contains_cjk(text: str) -> bool:
 
 
 def read_chapter(path: Path) -> ChapterDoc:
-    """Parse a chapter markdown file into title + body, tolerant of layout drift."""
-    raw = Path(path).read_text(encoding="utf-8")
-    lines = raw.splitlines()
+    """Parse a chapter markdown file into title + body, tolerant of layout drift.
+
+    Served from the chapter cache while the file's mtime and size are unchanged;
+    treat the returned doc as read-only.
+    """
+    path = Path(path)
+    cache = _chapter_cache()
+    if cache is None:
+        return parse_chapter(path.read_text(encoding="utf-8"))
+    st = path.stat()
+    version = (st.st_mtime_ns, st.st_size)
+    doc = cache.get(path, version)
+    if doc is None:
+        doc = parse_chapter(path.read_text(encoding="utf-8"))
+        cache.put(path, version, doc)
+    return doc
+
+
+def write_chapter(path: Path, text: str) -> None:
+    """Replace a chapter file atomically and refresh its chapter-cache entry."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+    cache = _chapter_cache()
+    if cache is not None:
+        st = path.stat()
+        cache.put(path, (st.st_mtime_ns, st.st_size), parse_chapter(text))
+
+
+def parse_chapter(raw: str) -> ChapterDoc:
+    """Parse chapter markdown text; see the module doc for the layouts accepted.
+
+    Single pass over the header lines: once the content heading is found the
+    body is sliced out of ``raw`` rather than split into lines and re-joined.
+    """
+    text = raw
+    if any(b in text for b in _OTHER_BREAKS):
+        # \r\n and friends: normalize so every line ends in \n (as splitlines() would).
+        text = "\n".join(text.splitlines())
 
     title = ""
-    body_start = None
-    # First pass: locate title and the content heading.
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if not stripped:
-            continue
-        if not title:
-            if stripped.startswith("#") and not _TITLE_HEADING.match(stripped) and not _CONTENT_HEADING.match(stripped):
-                title = stripped.lstrip("#").strip()
-            elif _TITLE_HEADING.match(stripped):
-                # Title text is the next non-empty, non-separator line.
-                for j in range(i + 1, len(lines)):
-                    t = lines[j].strip()
-                    if t and t != "---" and not t.startswith("#"):
-                        title = t
-                        break
-        if _CONTENT_HEADING.match(stripped):
-            body_start = i + 1
-            break
-
-    if body_start is None:
+    body_at = None
+    pos = 0
+    n = len(text)
+    while pos < n:
+        nl = text.find("\n", pos)
+        end = n if nl < 0 else nl
+        stripped = text[pos:end].strip()
+        nxt = end + 1
+        if stripped:
+            if not title:
+                if _TITLE_HEADING.match(stripped):
+                    title = _title_after(text, nxt)
+                elif stripped.startswith("#") and not _CONTENT_HEADING.match(stripped):
+                    title = stripped.lstrip("#").strip()
+            if _CONTENT_HEADING.match(stripped):
+                body_at = nxt
+                break
+        pos = nxt
+
+    if body_at is None:
         # No content heading: body is everything after the title line.
-        body_lines = lines[1:] if title else lines
-    else:
-        body_lines = lines[body_start:]
+        if title:
+            nl = text.find("\n")
+            body_at = n if nl < 0 else nl + 1
+        else:
+            body_at = 0
 
     # Trim leading separators/blanks and the trailing footer/separators.
-    body = "\n".join(body_lines).strip()
-    body = re.sub(r"^(---\s*\n?)+", "", body).strip()
-    cleaned: List[str] = []
-    for line in body.splitlines():
-        if _TIMESTAMP_FOOTER.match(line.strip()):
-            break
-        cleaned.append(line)
-    body = "\n".join(cleaned).strip()
+    body = text[body_at:].strip()
+    lead = _LEADING_RULES.match(body)
+    if lead:
+        body = body[lead.end():].strip()
+    if _FOOTER.match(body):
+        body = ""
+    else:
+        footer = _FOOTER_LINE.search(body)
+        if footer:
+            body = body[: footer.start()].strip()
     # Drop a dangling trailing separator.
-    body = re.sub(r"\n?-{3,}\s*$", "", body).strip()
+    if body.endswith("---"):
+        trimmed = body.rstrip("-")
+        body = (trimmed[:-1] if trimmed.endswith("\n") else trimmed).strip()
 
     if not title:
         title = "Untitled"
     return ChapterDoc(title=title, body=body, raw=raw)
 
 
+def _title_after(text: str, pos: int) -> str:
+    """Title text under a title heading: the next non-empty, non-separator line."""
+    n = len(text)
+    while pos < n:
+        nl = text.find("\n", pos)
+        end = n if nl < 0 else nl
+        t = text[pos:end].strip()
+        if t and t != "---" and not t.startswith("#"):
+            return t
+        pos = end + 1
+    return ""
+
+
+class ChapterCache:
+    """Thread-safe LRU of parsed chapters, bounded by an estimate of their memory."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], ChapterDoc, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, version: Tuple[int, int]) -> Optional[ChapterDoc]:
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, path: Path, version: Tuple[int, int], doc: ChapterDoc) -> None:
+        key = str(path)
+        size = sys.getsizeof(doc.raw) + sys.getsizeof(doc.body) + sys.getsizeof(doc.title)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._entries[key] = (version, doc, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, freed) = self._entries.popitem(last=False)
+                self.bytes -= freed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self.bytes}
+
+
+_cache: Optional[ChapterCache] = None
+_cache_checked = False
+_cache_lock = threading.Lock()
+
+
+def _chapter_cache() -> Optional[ChapterCache]:
+    """The process-wide chapter cache, or None when ``pipeline.chapter_cache_mb`` is 0."""
+    global _cache, _cache_checked
+    if not _cache_checked:
+        with _cache_lock:
+            if not _cache_checked:
+                mb = float(load_config().get("pipeline", {}).get("chapter_cache_mb", 64) or 0)
+                _cache = ChapterCache(int(mb * 1024 * 1024)) if mb > 0 else None
+                _cache_checked = True
+    return _cache
+
+
+def chapter_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for this process (all zero if the cache is off)."""
+    if _cache is None:
+        return {"hits": 0, "misses": 0, "entries": 0, "bytes": 0}
+    return _cache.stats()
+
+
 def chunk_paragraphs(text: str, max_chars: int = 4000) -> List[str]:
     """Split text into <=max_chars chunks on paragraph (blank-line) boundaries.
 
@@ -118,6 +261,45 @@ def chunk_paragraphs(text: str, max_chars: int = 4000) -> List[str]:
     return chunks
 
 
+def pack_paragraphs(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Split text into chunks of <=max_tokens on paragraph boundaries, evenly sized.
+
+    Uses as few chunks as greedy packing would, but spreads paragraphs so the
+    largest chunk is as small as possible — no tiny trailing chunk that costs a
+    full round trip. An oversized paragraph is still emitted whole.
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text.strip()) if p.strip()]
+    if not paragraphs:
+        return []
+    sizes = [count_tokens(p) for p in paragraphs]
+    sep = count_tokens("\n\n")
+
+    def groups(limit: int) -> List[List[int]]:
+        out: List[List[int]] = []
+        current: List[int] = []
+        total = 0
+        for i, size in enumerate(sizes):
+            if current and total + sep + size > limit:
+                out.append(current)
+                current, total = [], 0
+            total += (sep if current else 0) + size
+            current.append(i)
+        if current:
+            out.append(current)
+        return out
+
+    target = len(groups(max_tokens))
+    # Smallest per-chunk limit that still needs no more chunks than greedy packing.
+    lo, hi = max(min(max(sizes), max_tokens), 1), max(max_tokens, max(sizes))
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if len(groups(mid)) <= target:
+            hi = mid
+        else:
+            lo = mid + 1
+    return ["\n\n".join(paragraphs[i] for i in g) for g in groups(lo)]
+
+
 def render_chapter(title: str, body: str) -> str:
     """Render an edited/translated chapter to the canonical Vietnamese layout."""
     return f"# {title}\n\n## Nội dung\n\n{body.strip()}\n"
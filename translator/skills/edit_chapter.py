@@ -15,21 +15,22 @@ from pathlib import Path
 from typing import Dict, List, Optional
 
 from translator.config import book_root
+from translator.llm.prompts import DEFAULT_ASSET, PromptAsset, load_asset
 from translator.llm.roles import chat_as
 from translator.skills import glossary as glo
-from translator.skills.chapters import read_chapter, render_chapter
+from translator.skills.chapters import read_chapter, render_chapter, write_chapter
+from translator.skills.memory import Segments, format_hints, memory_context, translation_memory
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_RULES = "Biên tập lại thành tiếng Việt tự nhiên, mượt mà, đúng văn phong tiểu thuyết."
 
 
-def _load_editor_rules(book_id: str) -> str:
-    path = book_root(book_id) / "EDITOR.md"
-    if path.exists():
-        return path.read_text(encoding="utf-8")
-    logger.warning("EDITOR.md not found for %s, using default rules", book_id)
-    return DEFAULT_RULES
+def _load_editor_rules(book_id: str) -> PromptAsset:
+    rules = load_asset(book_root(book_id) / "EDITOR.md", DEFAULT_RULES)
+    if rules.source == DEFAULT_ASSET:
+        logger.warning("EDITOR.md not found for %s, using default rules", book_id)
+    return rules
 
 
 def _build_user_content(
@@ -93,13 +94,34 @@ def edit_chapter(args: Dict) -> Dict:
     ref_zh = read_chapter(ref_path).body if ref_path.exists() else "(không có bản gốc)"
 
     rules = _load_editor_rules(book_id)
-    terms = glo.relevant_terms(ref_zh, glo.load_glossary(book_id))
-    system = rules + ("\n\n" + glo.format_glossary_block(terms) if terms else "")
+    glossary = glo.compiled_glossary(book_id)
+    terms = glossary.relevant(ref_zh)
+    system = glo.glossary_prompt(rules, terms)
+
+    # Translation memory: earlier edits of the same source paragraphs. A chapter
+    # made only of known paragraphs needs no call; otherwise they are hints.
+    # Forced runs, re-terming and fix passes must rework the text, so they are never served.
+    memory = translation_memory() if ref_path.exists() else None
+    segments = None
+    if memory is not None:
+        context = memory_context("editor", rules)
+        serve = not (force or reterm or fix_issues)
+        segments = Segments(memory, book_id, "edit", glossary, ref_zh, context=context, serve=serve)
+        if segments.complete:
+            write_chapter(out_path, render_chapter(raw_doc.title, segments.text()))
+            return {"chapter_file": chapter_file, "status": "edited", "fixed": False, "from_memory": True}
+        hints = format_hints(segments.hints(include_served=True))
+        if hints:
+            system += "\n\n" + hints
 
     user = _build_user_content(ref_zh, raw_doc.body, previous_context, fix_issues, reterm=reterm)
-    edited_body = chat_as("editor", system, user).strip()
+    # A fix pass resends the prompt of a rejected edit (same draft, often the same
+    # issues); a cached reply would replay that edit instead of resampling.
+    edited_body = chat_as("editor", system, user, cache=not fix_issues).strip()
+    if segments is not None:
+        segments.store(edited_body)  # store the pairs if the paragraphs line up
 
-    out_path.write_text(render_chapter(raw_doc.title, edited_body), encoding="utf-8")
+    write_chapter(out_path, render_chapter(raw_doc.title, edited_body))
     return {"chapter_file": chapter_file, "status": "edited", "fixed": bool(fix_issues)}
 
 
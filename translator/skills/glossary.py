@@ -11,39 +11,389 @@ A glossary lives at ``<book>/glossary.yaml``:
 This complements the prose ``EDITOR.md`` style guide: the glossary is the
 machine-checkable list of names/terms, used both to inject relevant terms into
 prompts and to verify compliance in QA.
+
+Updates are cheap and safe under concurrency: ``glossary_update`` appends its
+terms (one or a batch) to ``glossary.changes.jsonl`` under an exclusive file
+lock. Readers apply the log on top of glossary.yaml. Once the log grows past
+``COMPACT_LOG_BYTES`` it is folded into glossary.yaml, written to a temp file
+and renamed into place, and the log is removed. Replaying a log that was
+already folded in is harmless, so a crash mid-compaction loses nothing.
+
+Glossaries are held in a process-wide registry: glossary.yaml is parsed (with
+libyaml's C loader when available) once per file version (mtime + size), the
+change log likewise. Matching goes through ``compiled_glossary(book_id)``: an
+Aho-Corasick automaton over the Chinese forms, built once per version, that
+finds every term in a text (with positions) in one scan instead of one
+substring search per term.
 """
 
 from __future__ import annotations
 
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
 
 import yaml
 
 from translator.config import book_root
+from translator.llm.prompts import PromptAsset, SystemPrompt, render
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in one process are still serialized
+    fcntl = None
 
 GLOSSARY_FILE = "glossary.yaml"
+CHANGES_FILE = "glossary.changes.jsonl"
+LOCK_FILE = ".glossary.lock"
+COMPACT_LOG_BYTES = 64 * 1024  # fold the change log into glossary.yaml past this size
+TERM_FIELDS = ("chinese", "hanviet", "role", "note")
+# Below this many distinct forms, C-level substring checks beat a Python-level
+# automaton scan (~200 on a 3k-char chapter); above it the scan wins.
+AUTOMATON_MIN_TERMS = 200
 
 
 def glossary_path(book_id: str) -> Path:
     return book_root(book_id) / GLOSSARY_FILE
 
 
-def load_glossary(book_id: str) -> List[Dict[str, str]]:
-    """Return the list of term dicts for a book (empty if none)."""
-    path = glossary_path(book_id)
+def changes_path(book_id: str) -> Path:
+    return book_root(book_id) / CHANGES_FILE
+
+
+# libyaml's C loader is several times faster than the pure-Python one.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def read_yaml(path: Path) -> Dict:
+    """A YAML file as a mapping (``{}`` when empty), via the fast loader."""
+    return yaml.load(path.read_text(encoding="utf-8"), Loader=_YAML_LOADER) or {}
+
+
+def _read_changes(path: Path) -> List[Dict[str, str]]:
     if not path.exists():
         return []
-    data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
-    terms = data.get("terms", [])
+    changes = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                changes.append(json.loads(line))
+            except ValueError:
+                break  # a torn final line from a crashed writer
+    return changes
+
+
+def change_history(book_id: str) -> List[Dict[str, str]]:
+    """The changes logged since the last compaction, oldest first."""
+    return _read_changes(changes_path(book_id))
+
+
+def file_version(path: Path) -> Optional[Tuple[int, int]]:
+    """``(mtime_ns, size)`` of a file, or None if it doesn't exist; a cheap change check."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _apply_changes(terms: List[Dict[str, str]], changes: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """``terms`` with each change replacing the term of the same Chinese form, or appended."""
+    terms = list(terms)
+    index = {}
+    for i, t in enumerate(terms):
+        index.setdefault(t.get("chinese"), i)
+    for change in changes:
+        entry = {k: change[k] for k in TERM_FIELDS if change.get(k)}
+        i = index.get(entry["chinese"])
+        if i is None:
+            index[entry["chinese"]] = len(terms)
+            terms.append(entry)
+        else:
+            terms[i] = entry
+    return terms
+
+
+@dataclass
+class _Entry:
+    base_version: Optional[Tuple[int, int]]
+    log_version: Optional[Tuple[int, int]]
+    base: List[Dict[str, str]]  # valid terms of glossary.yaml alone
+    terms: List[Dict[str, str]]  # with the change log applied
+    compiled: Optional["CompiledGlossary"] = None
+
+
+_registry: Dict[Path, _Entry] = {}
+_registry_lock = threading.Lock()
+registry_stats = {"loads": 0, "hits": 0}
+
+
+def _valid(terms: List[Dict[str, str]]) -> List[Dict[str, str]]:
     return [t for t in terms if t.get("chinese") and t.get("hanviet")]
 
 
+def _entry(book_id: str) -> _Entry:
+    """The registry entry for a book, re-reading whichever of its files changed."""
+    path = glossary_path(book_id)
+    log = changes_path(book_id)
+    base_version, log_version = file_version(path), file_version(log)
+    with _registry_lock:
+        entry = _registry.get(path)
+    if entry is not None and entry.base_version == base_version and entry.log_version == log_version:
+        with _registry_lock:
+            registry_stats["hits"] += 1
+        return entry
+    if entry is not None and entry.base_version == base_version:
+        base = entry.base
+    else:
+        base = _valid(read_yaml(path).get("terms", [])) if base_version is not None else []
+    terms = _apply_changes(base, _read_changes(log)) if log_version is not None else base
+    entry = _Entry(base_version, log_version, base, terms)
+    with _registry_lock:
+        _registry[path] = entry
+        registry_stats["loads"] += 1
+    return entry
+
+
+def load_glossary(book_id: str) -> List[Dict[str, str]]:
+    """Return the list of term dicts for a book (empty if none); treat the dicts as read-only."""
+    return list(_entry(book_id).terms)
+
+
+_write_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def book_lock(book_id: str) -> Iterator[None]:
+    """Exclusive hold on a book's glossary files, across threads and processes.
+
+    Other per-book files written read-modify-write (``titles_vi.yaml``) use it too.
+    """
+    root = book_root(book_id)
+    root.mkdir(parents=True, exist_ok=True)
+    with _write_lock, open(root / LOCK_FILE, "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _forget(book_id: str) -> None:
+    # Same-size rewrites within the filesystem's mtime granularity would look unchanged.
+    with _registry_lock:
+        _registry.pop(glossary_path(book_id), None)
+
+
+def _write_yaml(path: Path, data: Dict) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(yaml.safe_dump(data, allow_unicode=True, sort_keys=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def save_glossary(book_id: str, data: Dict) -> Path:
+    """Replace a book's glossary.yaml (``{"terms": [...], ...}``) and clear its change log.
+
+    ``data`` should already include any logged changes (``load_glossary`` does).
+    """
+    path = glossary_path(book_id)
+    with book_lock(book_id):
+        _write_yaml(path, data)
+        changes_path(book_id).unlink(missing_ok=True)
+        _forget(book_id)
+    return path
+
+
+def compact_glossary(book_id: str) -> int:
+    """Fold the change log into glossary.yaml; returns how many changes were folded."""
+    with book_lock(book_id):
+        return _compact(book_id)
+
+
+def _compact(book_id: str) -> int:
+    log = changes_path(book_id)
+    changes = _read_changes(log)
+    if changes:
+        path = glossary_path(book_id)
+        data = read_yaml(path) if path.exists() else {}
+        data["terms"] = _apply_changes(data.get("terms") or [], changes)
+        _write_yaml(path, data)
+    log.unlink(missing_ok=True)
+    _forget(book_id)
+    return len(changes)
+
+
+def update_terms(book_id: str, terms: List[Dict[str, str]], *, replace: bool = True) -> Dict:
+    """Add or replace several terms in one locked append to the change log.
+
+    With ``replace=False`` terms already in the glossary (as read under the
+    lock) are left as they are and counted as ``skipped``.
+    """
+    entries = []
+    for t in terms:
+        entry = {k: str(t[k]).strip() for k in TERM_FIELDS if t.get(k)}
+        if not entry.get("chinese") or not entry.get("hanviet"):
+            raise ValueError(f"a glossary term needs chinese and hanviet: {t!r}")
+        entries.append(entry)
+    with book_lock(book_id):
+        known = {t["chinese"] for t in _entry(book_id).terms}
+        added = updated = skipped = 0
+        written = []
+        for entry in entries:
+            if entry["chinese"] not in known:
+                known.add(entry["chinese"])
+                added += 1
+            elif replace:
+                updated += 1
+            else:
+                skipped += 1
+                continue
+            written.append(entry)
+        log = changes_path(book_id)
+        if written:
+            ts = round(time.time(), 3)
+            with open(log, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps({**e, "ts": ts}, ensure_ascii=False) + "\n" for e in written))
+            _forget(book_id)
+            if log.stat().st_size > COMPACT_LOG_BYTES:
+                _compact(book_id)
+    return {"added": added, "updated": updated, "skipped": skipped, "terms": written, "total": len(known)}
+
+
 def relevant_terms(source_text: str, terms: List[Dict[str, str]]) -> List[Dict[str, str]]:
     """Subset of terms whose Chinese form appears in source_text."""
     return [t for t in terms if t["chinese"] in source_text]
 
 
+class Automaton:
+    """Aho-Corasick matcher: every occurrence of every pattern in one pass.
+
+    Transitions are precomputed along failure links, so the scan costs one or
+    two dict lookups per character whatever the number of patterns.
+    """
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.patterns = patterns
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for idx, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            if pattern:
+                out[state].append(idx)
+
+        # Breadth-first: a state's failure target is shallower, so it is complete
+        # (transitions and outputs) by the time the state itself is visited.
+        # delta[s] holds the non-root moves only; anything else restarts at the root.
+        root = goto[0]
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [root] + [{} for _ in goto[1:]]
+        queue = deque(root.values())
+        while queue:
+            state = queue.popleft()
+            f = fail[state]
+            delta[state] = {**delta[f], **goto[state]} if f else goto[state]
+            out[state] = out[state] + out[f]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[f].get(ch) or root.get(ch, 0) if f else root.get(ch, 0)
+                queue.append(nxt)
+        self._root = root
+        self._delta = delta
+        self._out = {s: o for s, o in enumerate(out) if o}
+
+    def scan(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield ``(start, pattern index)`` for every occurrence, overlaps included."""
+        root, delta, outs, patterns = self._root, self._delta, self._out, self.patterns
+        state = 0
+        for i, ch in enumerate(text):
+            state = delta[state].get(ch) or root.get(ch, 0)
+            if state in outs:
+                for idx in outs[state]:
+                    yield i - len(patterns[idx]) + 1, idx
+
+    def replace(self, text: str, mapping: Mapping[str, str]) -> Tuple[str, int]:
+        """Replace leftmost-longest, non-overlapping occurrences; returns (text, count)."""
+        hits = sorted(((start, -len(self.patterns[idx]), idx) for start, idx in self.scan(text)))
+        parts: List[str] = []
+        pos = count = 0
+        for start, neg_len, idx in hits:
+            if start < pos:
+                continue
+            parts.append(text[pos:start])
+            parts.append(mapping[self.patterns[idx]])
+            pos = start - neg_len
+            count += 1
+        parts.append(text[pos:])
+        return "".join(parts), count
+
+
+@dataclass
+class TermMatch:
+    """A glossary term found in a text, with where it occurs."""
+
+    term: Dict[str, str]
+    positions: List[int] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.positions)
+
+
+class CompiledGlossary:
+    """A glossary's terms plus an automaton over their Chinese forms."""
+
+    def __init__(self, terms: List[Dict[str, str]]) -> None:
+        self.terms = terms
+        self._by_form: Dict[str, List[int]] = {}
+        for i, t in enumerate(terms):
+            self._by_form.setdefault(t["chinese"], []).append(i)
+        self._automaton = Automaton(list(self._by_form))
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def find(self, text: str) -> List[TermMatch]:
+        """Terms occurring in ``text`` (glossary order), with start positions."""
+        hits: Dict[int, List[int]] = {}
+        forms = self._automaton.patterns
+        for start, idx in self._automaton.scan(text):
+            hits.setdefault(idx, []).append(start)
+        found = []
+        for idx, positions in hits.items():
+            for i in self._by_form[forms[idx]]:
+                found.append((i, TermMatch(self.terms[i], positions)))
+        return [m for _, m in sorted(found, key=lambda x: x[0])]
+
+    def relevant(self, text: str) -> List[Dict[str, str]]:
+        """Same result as ``relevant_terms(text, self.terms)``, in one scan for large glossaries."""
+        if len(self._by_form) < AUTOMATON_MIN_TERMS:
+            return relevant_terms(text, self.terms)
+        return [m.term for m in self.find(text)]
+
+
+def compiled_glossary(book_id: str) -> CompiledGlossary:
+    """The book's glossary, compiled once per version of glossary.yaml."""
+    entry = _entry(book_id)
+    if entry.compiled is None:
+        entry.compiled = CompiledGlossary(entry.terms)  # a racing thread builds an equal one
+    return entry.compiled
+
+
 def format_glossary_block(terms: List[Dict[str, str]]) -> str:
     """Render terms as a compact prompt block (Chinese -> Hán Việt [role/note])."""
     if not terms:
@@ -56,49 +406,43 @@ def format_glossary_block(terms: List[Dict[str, str]]) -> str:
     return "\n".join(lines)
 
 
+def glossary_prompt(rules: PromptAsset, terms: List[Dict[str, str]]) -> SystemPrompt:
+    """``rules`` followed by the glossary block for ``terms``, rendered once per (rules, terms)."""
+    key = (rules.digest, tuple((t["chinese"], t["hanviet"], t.get("role"), t.get("note")) for t in terms))
+    return render(key, lambda: rules.text + ("\n\n" + format_glossary_block(terms) if terms else ""))
+
+
 # --- Skill entry points ------------------------------------------------------
 
 
 def glossary_lookup(args: Dict) -> Dict:
     """Skill: return glossary terms for a book, optionally only those in a text."""
     book_id = args["book_id"]
-    terms = load_glossary(book_id)
+    compiled = compiled_glossary(book_id)
     text = args.get("source_text")
-    if text:
-        terms = relevant_terms(text, terms)
-    return {"count": len(terms), "terms": terms}
+    if not text:
+        return {"count": len(compiled.terms), "terms": compiled.terms}
+    matches = compiled.find(text)
+    return {
+        "count": len(matches),
+        "terms": [m.term for m in matches],
+        "occurrences": {m.term["chinese"]: m.count for m in matches},
+    }
 
 
 def glossary_update(args: Dict) -> Dict:
-    """Skill: add or update a term in a book's glossary.yaml."""
+    """Skill: add or update one term, or a batch of ``terms``, in a book's glossary."""
     book_id = args["book_id"]
-    path = glossary_path(book_id)
-    data = {}
-    if path.exists():
-        data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
-    terms: List[Dict[str, str]] = data.get("terms", [])
-
-    entry = {"chinese": args["chinese"], "hanviet": args["hanviet"]}
-    for opt in ("role", "note"):
-        if args.get(opt):
-            entry[opt] = args[opt]
-
-    replaced = False
-    for i, t in enumerate(terms):
-        if t.get("chinese") == entry["chinese"]:
-            terms[i] = entry
-            replaced = True
-            break
-    if not replaced:
-        terms.append(entry)
-
-    data["terms"] = terms
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(
-        yaml.safe_dump(data, allow_unicode=True, sort_keys=False),
-        encoding="utf-8",
-    )
-    return {"book_id": book_id, "action": "updated" if replaced else "added", "term": entry, "total": len(terms)}
+    batch = args.get("terms")
+    single = {k: args[k] for k in TERM_FIELDS if args.get(k)}
+    try:
+        result = update_terms(book_id, list(batch or []) + ([single] if single else []))
+    except ValueError as e:
+        return {"book_id": book_id, "status": "error", "error": str(e)}
+    if batch is None and len(result["terms"]) == 1:
+        action = "updated" if result["updated"] else "added"
+        return {"book_id": book_id, "action": action, "term": result["terms"][0], "total": result["total"]}
+    return {"book_id": book_id, **result}
 
 
 LOOKUP_SCHEMA = {
@@ -106,7 +450,7 @@ LOOKUP_SCHEMA = {
     "function": {
         "name": "glossary_lookup",
         "description": "Look up the fixed Chinese->Vietnamese glossary for a book. "
-        "Optionally pass source_text to get only terms that appear in it.",
+        "Optionally pass source_text to get only terms that appear in it (with occurrence counts).",
         "parameters": {
             "type": "object",
             "properties": {
@@ -122,7 +466,7 @@ UPDATE_SCHEMA = {
     "type": "function",
     "function": {
         "name": "glossary_update",
-        "description": "Add or update one fixed term in a book's glossary.",
+        "description": "Add or update fixed terms in a book's glossary: one term, or many at once via `terms`.",
         "parameters": {
             "type": "object",
             "properties": {
@@ -131,8 +475,22 @@ UPDATE_SCHEMA = {
                 "hanviet": {"type": "string", "description": "Mandated Sino-Vietnamese (Hán Việt) rendering."},
                 "role": {"type": "string", "description": "Optional role, e.g. 'nữ chính'."},
                 "note": {"type": "string", "description": "Optional note."},
+                "terms": {
+                    "type": "array",
+                    "description": "Batch of terms to add or update in one call.",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "chinese": {"type": "string"},
+                            "hanviet": {"type": "string"},
+                            "role": {"type": "string"},
+                            "note": {"type": "string"},
+                        },
+                        "required": ["chinese", "hanviet"],
+                    },
+                },
             },
-            "required": ["book_id", "chinese", "hanviet"],
+            "required": ["book_id"],
         },
     },
 }
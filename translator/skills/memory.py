@@ -0,0 +1,345 @@
+"""Translation memory: source paragraph -> translated paragraph, reused across chapters.
+
+Web-novel sources repeat text verbatim: page-split overlaps, recurring system
+messages, author notes, ad lines. ``translate_chapter`` and ``edit_chapter``
+store every paragraph pair of a reply whose paragraphs line up one-to-one with
+the request's (the prompts ask the model to keep the paragraphing), and consult
+the memory before calling the model:
+
+- **exact matches** are served without an LLM call when every paragraph of a
+  chunk is known; a partly known chunk is still sent whole (its short,
+  context-dependent lines need their surroundings), with the known pairs as
+  reference translations. A match only counts for the same model and rules
+  file (TRANSLATOR.md / EDITOR.md) and when the glossary renders the
+  paragraph's terms the same way as when it was stored, so neither a model
+  switch, a rules edit nor a glossary change replays old output. ``--force``
+  runs never serve from memory;
+- **fuzzy matches** (``fuzzy_threshold`` similarity, character trigrams then
+  difflib) of the paragraphs still to translate go into the system prompt as
+  reference translations.
+
+Paragraphs shorter than ``min_chars`` are neither stored nor served (a bare
+"他说。" depends on context). Entries are per book, and with ``shared: true``
+other books' entries are matched too. One SQLite file, configured under
+``memory:`` in config.yaml; off unless ``memory.enabled`` is set.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from translator.config import REPO_ROOT, load_config
+from translator.llm.prompts import PromptAsset
+from translator.llm.roles import role_model
+from translator.skills.glossary import CompiledGlossary
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    book    TEXT NOT NULL,
+    stage   TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    terms   TEXT NOT NULL,
+    source  TEXT NOT NULL,
+    target  TEXT NOT NULL,
+    uses    INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    PRIMARY KEY (book, stage, key)
+);
+CREATE INDEX IF NOT EXISTS segments_key ON segments(stage, key);
+"""
+
+# Longer paragraphs are still reused verbatim but never offered as fuzzy hints:
+# a near-miss of a page-long paragraph costs more prompt than it saves.
+HINT_MAX_CHARS = 400
+_CANDIDATES = 20
+
+
+def source_key(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def terms_signature(terms: List[Dict[str, str]], context: str = "") -> str:
+    """Fingerprint of how one paragraph gets rendered: its glossary terms plus ``context``."""
+    pairs = sorted((t["chinese"], t["hanviet"]) for t in terms)
+    return hashlib.sha256(json.dumps([context, pairs], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def memory_context(role: str, rules: PromptAsset) -> str:
+    """What besides the glossary decides a stored reply: the role's model and rules file."""
+    return f"{role_model(role)}:{rules.digest}"
+
+
+def _trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass
+class Match:
+    """A stored pair similar to a paragraph being translated."""
+
+    source: str
+    target: str
+    score: float
+
+
+class _FuzzyIndex:
+    """In-process trigram index over the hintable sources of one scope."""
+
+    def __init__(self, rows: List[Tuple[str, str]]) -> None:
+        self.pairs: List[Tuple[str, str]] = []
+        self.seen: set = set()
+        self.postings: Dict[str, List[int]] = {}
+        for source, target in rows:
+            self.add(source, target)
+
+    def add(self, source: str, target: str) -> None:
+        if source in self.seen:
+            return
+        self.seen.add(source)
+        idx = len(self.pairs)
+        self.pairs.append((source, target))
+        for gram in _trigrams(source):
+            self.postings.setdefault(gram, []).append(idx)
+
+    def similar(self, text: str, threshold: float, limit: int) -> List[Match]:
+        counts: Counter = Counter()
+        for gram in _trigrams(text):
+            counts.update(self.postings.get(gram, ()))
+        found = []
+        for idx, _ in counts.most_common(_CANDIDATES):
+            source, target = self.pairs[idx]
+            if source == text:
+                continue  # the exact pair is served, not hinted
+            matcher = difflib.SequenceMatcher(None, text, source, autojunk=False)
+            if matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold:
+                found.append(Match(source, target, round(matcher.ratio(), 3)))
+        found.sort(key=lambda m: -m.score)
+        return found[:limit]
+
+
+class TranslationMemory:
+    """SQLite-backed store of paragraph pairs, per book and stage."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        shared: bool = False,
+        min_chars: int = 12,
+        fuzzy_threshold: float = 0.8,
+        max_hints: int = 5,
+    ) -> None:
+        self.path = Path(path)
+        self.shared = shared
+        self.min_chars = min_chars
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_hints = max_hints
+        self.counts = {"hits": 0, "misses": 0, "stored": 0, "hinted": 0, "chars_served": 0}
+        self._lock = threading.Lock()
+        self._fuzzy: Dict[Tuple[str, str], _FuzzyIndex] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def lookup(self, book: str, stage: str, source: str, terms: str) -> Optional[str]:
+        """The stored translation of ``source``, or None."""
+        if len(source) < self.min_chars:
+            return None
+        key = source_key(source)
+        with self._lock:
+            if self.shared:
+                row = self._db.execute(
+                    "SELECT book, target FROM segments WHERE stage = ? AND key = ? AND terms = ? "
+                    "ORDER BY book = ? DESC LIMIT 1",
+                    (stage, key, terms, book),
+                ).fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT book, target FROM segments WHERE book = ? AND stage = ? AND key = ? AND terms = ?",
+                    (book, stage, key, terms),
+                ).fetchone()
+            if row is None:
+                self.counts["misses"] += 1
+                return None
+            self._db.execute(
+                "UPDATE segments SET uses = uses + 1 WHERE book = ? AND stage = ? AND key = ?", (row[0], stage, key)
+            )
+            self.counts["hits"] += 1
+            self.counts["chars_served"] += len(source)
+        return row[1]
+
+    def similar(self, book: str, stage: str, source: str) -> List[Match]:
+        """Stored pairs at least ``fuzzy_threshold`` similar to ``source``."""
+        if self.fuzzy_threshold <= 0 or not self.min_chars <= len(source) <= HINT_MAX_CHARS:
+            return []
+        scope = ("*" if self.shared else book, stage)
+        with self._lock:
+            index = self._fuzzy.get(scope)
+            if index is None:  # built on first use, then kept current by put_many
+                sql = "SELECT source, target FROM segments WHERE stage = ? AND length(source) <= ?"
+                params: tuple = (stage, HINT_MAX_CHARS)
+                if not self.shared:
+                    sql += " AND book = ?"
+                    params += (book,)
+                index = self._fuzzy[scope] = _FuzzyIndex(self._db.execute(sql, params).fetchall())
+            return index.similar(source, self.fuzzy_threshold, self.max_hints)
+
+    def put_many(self, book: str, stage: str, pairs: List[Tuple[str, str, str]]) -> int:
+        """Store ``(source, target, terms signature)`` pairs; returns how many were kept."""
+        rows = [
+            (book, stage, source_key(s), terms, s, t, time.time())
+            for s, t, terms in pairs
+            if len(s) >= self.min_chars and t
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO segments (book, stage, key, terms, source, target, updated) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(book, stage, key) DO UPDATE SET terms = excluded.terms, target = excluded.target, "
+                "updated = excluded.updated",
+                rows,
+            )
+            self.counts["stored"] += len(rows)
+            index = self._fuzzy.get(("*" if self.shared else book, stage))
+            if index is not None:
+                for _, _, _, _, s, t, _ in rows:
+                    if len(s) <= HINT_MAX_CHARS:
+                        index.add(s, t)
+        return len(rows)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()
+        return {**self.counts, "entries": entries}
+
+
+class Segments:
+    """One request's source text split into paragraphs, with what the memory knows.
+
+    Paragraphs are the non-empty lines. ``served`` holds the ones memory
+    translated; ``missing`` the ones left for the model. ``context`` (see
+    ``memory_context``) is part of every key. ``store`` takes the model's reply
+    to the whole text and, when its paragraphs line up, stores the pairs.
+    """
+
+    def __init__(
+        self,
+        memory: TranslationMemory,
+        book_id: str,
+        stage: str,
+        glossary: CompiledGlossary,
+        text: str,
+        *,
+        context: str = "",
+        serve: bool = True,
+    ) -> None:
+        self.memory = memory
+        self.book_id = book_id
+        self.stage = stage
+        self.lines = text.split("\n")
+        self.paragraphs = [i for i, line in enumerate(self.lines) if line.strip()]
+        self.terms = {i: terms_signature(glossary.relevant(self.lines[i].strip()), context) for i in self.paragraphs}
+        self.served: Dict[int, str] = {}
+        if serve:
+            for i in self.paragraphs:
+                target = memory.lookup(book_id, stage, self.lines[i].strip(), self.terms[i])
+                if target is not None:
+                    self.served[i] = target
+        self.missing = [i for i in self.paragraphs if i not in self.served]
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.paragraphs) and not self.missing
+
+    def text(self) -> str:
+        """The source with every known paragraph replaced by its translation."""
+        return "\n".join(self.served.get(i, line) for i, line in enumerate(self.lines)).strip()
+
+    def hints(self, *, include_served: bool = False) -> List[Match]:
+        matches: List[Match] = []
+        if include_served:
+            matches += [Match(self.lines[i].strip(), t, 1.0) for i, t in self.served.items()]
+        for i in self.missing:
+            if len(matches) >= self.memory.max_hints:
+                break
+            matches += self.memory.similar(self.book_id, self.stage, self.lines[i].strip())
+        matches = matches[: self.memory.max_hints]
+        if matches:
+            with self.memory._lock:
+                self.memory.counts["hinted"] += len(matches)
+        return matches
+
+    def store(self, reply: str) -> bool:
+        """Store the pairs of a reply to the whole text; False if its paragraphs don't line up."""
+        out = [line.strip() for line in reply.splitlines() if line.strip()]
+        if len(out) != len(self.paragraphs):
+            return False
+        self.memory.put_many(
+            self.book_id, self.stage, [(self.lines[i].strip(), t, self.terms[i]) for i, t in zip(self.paragraphs, out)]
+        )
+        return True
+
+
+def format_hints(matches: List[Match]) -> str:
+    """Render matches as a prompt block (source -> earlier translation)."""
+    if not matches:
+        return ""
+    lines = ["## BẢN DỊCH THAM KHẢO (đoạn tương tự đã dịch trước đây; giữ nhất quán nếu phù hợp):"]
+    for m in matches:
+        lines.append(f"- {m.source} → {m.target}")
+    return "\n".join(lines)
+
+
+# --- Process-wide memory ------------------------------------------------------------
+
+_memory: Optional[TranslationMemory] = None
+_memory_lock = threading.Lock()
+_disabled = False
+
+
+def disable() -> None:
+    """Turn the memory off for the rest of this process."""
+    global _disabled
+    _disabled = True
+
+
+def translation_memory() -> Optional[TranslationMemory]:
+    """The process-wide memory, or None when disabled."""
+    global _memory
+    cfg = load_config().get("memory", {}) or {}
+    if _disabled or not cfg.get("enabled", False):
+        return None
+    path = Path(cfg.get("path") or ".cache/translation_memory.sqlite")
+    if not path.is_absolute():
+        path = REPO_ROOT / path
+    with _memory_lock:
+        if _memory is None or _memory.path != path:
+            _memory = TranslationMemory(
+                path,
+                shared=bool(cfg.get("shared", False)),
+                min_chars=int(cfg.get("min_chars", 12)),
+                fuzzy_threshold=float(cfg.get("fuzzy_threshold", 0.8)),
+                max_hints=int(cfg.get("max_hints", 5)),
+            )
+    return _memory
+
+
+def stats() -> Dict[str, int]:
+    """Counters for this process (all zero if the memory was never used)."""
+    if _memory is None:
+        return {"hits": 0, "misses": 0, "stored": 0, "hinted": 0, "chars_served": 0, "entries": 0}
+    return _memory.stats()
@@ -0,0 +1,233 @@
+"""Several short chapters translated in one request.
+
+52shuku books are scraped page by page (``第N页``), so most chapters are a
+single chunk well below the chunk budget, and each one still pays the whole
+system prompt and a round trip. ``translate_packed`` fills the chunk budget
+(``pipeline.chunk_tokens`` / the role's ``context_window``, else
+``chunk_chars``) with runs of consecutive short chapters, sends them in one
+request with a marker line (``<<<n>>>``) before each, and splits the reply
+back on the markers.
+
+The budget is checked once more per pack against the prompt it will really
+be sent with: the marker lines count, and so do the glossary terms of every
+packed chapter, which all land in the one system prompt. A pack that no longer
+fits is split (``_fit_packs``), so no request is larger than what
+``plan_chapter`` would send for a single chapter.
+
+A reply is accepted only if every marker comes back once and in order, no
+section is empty, and each section's length stays in line with its source
+(a section that swallowed its neighbour's text, or lost half of its own,
+stands out against the rest of the pack). Otherwise, or if the request fails
+(``LLMError``), the pack's chapters are left to ``translate_chapter``, one
+request each as before.
+
+Only chapters ``translate_chapter`` would send as one body request take part:
+no stored translation, no checkpoint to resume, a title already translated
+(``translator.skills.titles``) and a body the translation memory can't serve.
+The pipeline runs this at the start of the translate stage
+(``pipeline.pack_chapters``).
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from translator.config import book_root, load_config
+from translator.llm import telemetry
+from translator.llm.provider import LLMError
+from translator.llm.roles import chat_as
+from translator.llm.tokens import chunk_token_budget, tokenizer_for
+from translator.skills import glossary as glo
+from translator.skills.chapters import read_chapter, write_chapter
+from translator.skills.memory import Segments, memory_context, translation_memory
+from translator.skills.translate_chapter import (
+    _load_translator_rules,
+    _run_requests,
+    _stable_system_prompt,
+    _system_prompt,
+    assemble_chapter,
+    checkpoint_path,
+    plan_chapter,
+)
+
+logger = logging.getLogger(__name__)
+
+PACK_PROMPT = (
+    "Văn bản dưới đây gồm {n} chương, mỗi chương mở đầu bằng một dòng đánh dấu <<<số>>>. "
+    "Dịch từng chương, giữ nguyên từng dòng đánh dấu đúng vị trí và không gộp, không bỏ chương nào:\n\n{body}"
+)
+_MARKER = re.compile(r"^[ \t]*<<<[ \t]*(\d+)[ \t]*>>>[ \t]*$", re.MULTILINE)
+# A section may deviate this much from the pack's overall output/source length ratio.
+MAX_RATIO_SKEW = 2.5
+
+
+def pack_text(bodies: List[str]) -> str:
+    return "\n\n".join(f"<<<{i}>>>\n{body.strip()}" for i, body in enumerate(bodies, 1))
+
+
+def split_packed(reply: str, sources: List[str]) -> Optional[List[str]]:
+    """Per-chapter sections of a packed reply, or None unless they map one-to-one onto ``sources``."""
+    markers = list(_MARKER.finditer(reply))
+    if [int(m.group(1)) for m in markers] != list(range(1, len(sources) + 1)):
+        return None
+    if reply[: markers[0].start()].strip():
+        return None  # text before the first marker belongs to no chapter
+    ends = [m.start() for m in markers[1:]] + [len(reply)]
+    parts = [reply[m.end() : end].strip() for m, end in zip(markers, ends)]
+    if not all(parts):
+        return None
+    overall = sum(map(len, parts)) / max(1, sum(len(s) for s in sources))
+    for part, source in zip(parts, sources):
+        ratio = len(part) / max(1, len(source))
+        if not overall / MAX_RATIO_SKEW <= ratio <= overall * MAX_RATIO_SKEW:
+            return None
+    return parts
+
+
+def _candidates(
+    book_id: str, files: List[str], force: bool, count: Callable[[str], int]
+) -> List[Optional[Tuple[str, str, str, int]]]:
+    """Per file, ``(file, title_vi, body, size)`` if it can be packed, else None (a run breaker)."""
+    root = book_root(book_id)
+    memory = translation_memory()
+    glossary = glo.compiled_glossary(book_id)
+    context = memory_context("translator", _load_translator_rules()) if memory is not None else ""
+    out: List[Optional[Tuple[str, str, str, int]]] = []
+    for name in files:
+        in_path = root / "raw_chinese" / name
+        out_path = root / "raw_vietnamese" / name
+        if not in_path.exists() or checkpoint_path(out_path).exists():
+            out.append(None)
+            continue
+        if out_path.exists() and out_path.stat().st_size > 0 and not force:
+            out.append(None)
+            continue
+        plan = plan_chapter(book_id, read_chapter(in_path), name, force=force)
+        if plan.title_request or len(plan.chunks) != 1:
+            out.append(None)
+            continue
+        body = plan.chunks[0]
+        if memory is not None and not force:
+            if Segments(memory, book_id, "translate", glossary, body, context=context).complete:
+                out.append(None)
+                continue
+        out.append((name, plan.title_vi or plan.title, body, count(body)))
+    return out
+
+
+def _packs(candidates: List[Optional[Tuple[str, str, str, int]]], budget: int) -> List[List[Tuple[str, str, str, int]]]:
+    """Greedy runs of consecutive candidates whose total size fits ``budget``; runs of one are dropped."""
+    packs: List[List[Tuple[str, str, str, int]]] = []
+    run: List[Tuple[str, str, str, int]] = []
+    size = 0
+    for c in candidates + [None]:
+        if c is not None and run and size + c[3] <= budget:
+            run.append(c)
+            size += c[3]
+            continue
+        if len(run) > 1:
+            packs.append(run)
+        run, size = ([c], c[3]) if c is not None else ([], 0)
+    return packs
+
+
+def _pack_fits(
+    system_for: Callable[[str], str], count: Callable[[str], int], max_chars: int
+) -> Callable[[List[Tuple[str, str, str, int]]], bool]:
+    """Whether a pack, as sent (markers included), fits the budget its own system prompt leaves."""
+
+    def fits(pack: List[Tuple[str, str, str, int]]) -> bool:
+        text = pack_text([body for _, _, body, _ in pack])
+        return count(text) <= (chunk_token_budget("translator", system_for(text)) or max_chars)
+
+    return fits
+
+
+def _fit_packs(
+    packs: List[List[Tuple[str, str, str, int]]], fits: Callable[[List[Tuple[str, str, str, int]]], bool]
+) -> List[List[Tuple[str, str, str, int]]]:
+    """``packs`` split into the longest leading runs for which ``fits``; runs of one are dropped."""
+    out: List[List[Tuple[str, str, str, int]]] = []
+    for pack in packs:
+        start = 0
+        while len(pack) - start > 1:
+            end = len(pack)
+            while end - start > 1 and not fits(pack[start:end]):
+                end -= 1
+            if end - start > 1:
+                out.append(pack[start:end])
+            start = end
+    return out
+
+
+def translate_packed(book_id: str, files: List[str], *, force: bool = False) -> Dict[str, Dict]:
+    """Translate the short chapters among ``files`` in packed requests.
+
+    Returns a ``translate_chapter``-style result for each chapter written;
+    chapters not returned (not packable, or their pack's request failed or its
+    reply didn't split cleanly) are left for ``translate_chapter``.
+    """
+    pipeline_cfg = load_config().get("pipeline", {})
+    rules = _load_translator_rules()
+    glossary = glo.compiled_glossary(book_id)
+    stable = pipeline_cfg.get("prompt_layout", "per_chunk") == "stable_prefix"
+    stable_system = _stable_system_prompt(rules, glossary.terms) if stable else ""
+
+    def system_for(text: str) -> str:
+        return stable_system or _system_prompt(rules, glossary.relevant(text))
+
+    # The same budget and measure plan_chapter chunks by: model tokens, else characters.
+    budget = chunk_token_budget("translator", system_for(""))
+    count: Callable[[str], int] = tokenizer_for("translator").count if budget else len
+    max_chars = int(pipeline_cfg.get("chunk_chars", 4000))
+    budget = budget or max_chars
+
+    fits = _pack_fits(system_for, count, max_chars)
+    packs = _fit_packs(_packs(_candidates(book_id, files, force, count), budget), fits)
+    if not packs:
+        return {}
+
+    root = book_root(book_id)
+    memory = translation_memory()
+    context = memory_context("translator", rules) if memory is not None else ""
+
+    def pack_call(pack: List[Tuple[str, str, str, int]]) -> Callable[[], Dict[str, Dict]]:
+        names = [name for name, _, _, _ in pack]
+        bodies = [body for _, _, body, _ in pack]
+
+        def call() -> Dict[str, Dict]:
+            text = pack_text(bodies)
+            try:
+                with telemetry.context(tool="translate_chapter", book=book_id, chapter=f"{names[0]}..{names[-1]}"):
+                    reply = chat_as(
+                        "translator", system_for(text), PACK_PROMPT.format(n=len(pack), body=text), cache_prefix=stable
+                    )
+            except LLMError as e:
+                # translate_chapter (and its Prefect retries) will handle these chapters one by one.
+                logger.warning("packed request for %s..%s failed (%s); translating them one by one", names[0], names[-1], e)
+                return {}
+            parts = split_packed(reply, bodies)
+            if parts is None:
+                logger.warning("packed reply for %s..%s did not split cleanly; translating them one by one", names[0], names[-1])
+                return {}
+            written = {}
+            for (name, title_vi, body, _), part in zip(pack, parts):
+                if memory is not None:
+                    Segments(memory, book_id, "translate", glossary, body, context=context, serve=False).store(part)
+                write_chapter(root / "raw_vietnamese" / name, assemble_chapter(title_vi, [part]))
+                written[name] = {"chapter_file": name, "status": "translated", "chunks": 1, "packed": len(pack)}
+            return written
+
+        return call
+
+    (root / "raw_vietnamese").mkdir(parents=True, exist_ok=True)
+    results: Dict[str, Dict] = {}
+    for written in _run_requests([pack_call(p) for p in packs], int(pipeline_cfg.get("chunk_concurrency", 4))):
+        results.update(written)
+    logger.info(
+        "packed %d chapter(s) of %s into %d request(s); %d left to translate one by one",
+        len(results), book_id, len(packs), sum(len(p) for p in packs) - len(results),
+    )
+    return results
@@ -43,7 +43,7 @@ def _deterministic_checks(book_id: str, ref_zh: str, edited_vi: str, raw_vi: str
     # 2. Glossary compliance (case-insensitive: a term at sentence start is
     #    capitalized, e.g. "Liên tinh" vs the glossary's "liên tinh").
     edited_lower = edited_vi.lower()
-    for term in glo.relevant_terms(ref_zh, glo.load_glossary(book_id)):
+    for term in glo.compiled_glossary(book_id).relevant(ref_zh):
         if term["hanviet"].lower() not in edited_lower:
             issues.append(
                 f"Thuật ngữ '{term['chinese']}' phải được dịch là '{term['hanviet']}' nhưng không xuất hiện."
@@ -17,6 +17,7 @@ import requests
 from bs4 import BeautifulSoup
 
 from translator.config import book_root
+from translator.skills.chapters import write_chapter
 
 logger = logging.getLogger(__name__)
 
@@ -115,7 +116,7 @@ def _save_chapter(raw_dir: Path, number: int, title: str, content: str) -> Path:
         f"### 内容 | Content\n\n{content}\n\n---\n"
         f"*生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}*\n"
     )
-    path.write_text(md, encoding="utf-8")
+    write_chapter(path, md)
     return path
 
 
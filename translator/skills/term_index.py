@@ -0,0 +1,248 @@
+"""Per-book index of where glossary terms occur, for targeted re-terming.
+
+For every chapter the index records, by paragraph, where each glossary term's
+Chinese form occurs in ``raw_chinese/`` and where each of its known Vietnamese
+renderings occurs in ``edited_vietnamese/`` (case-insensitive, like QA). A
+paragraph is a non-empty line: raw Chinese chapters put one per line, edited
+ones a blank line between them. The index is stored at
+``<book>/.term_index.json`` and kept current incrementally:
+
+- a chapter is rescanned only when its file changed (mtime + size), so
+  scraping or editing a chapter costs one scan of that chapter;
+- a term added to the glossary is looked up across the book for that term
+  alone, and a dropped term is simply forgotten;
+- every rendering a term has had (seen in earlier syncs or still in the
+  glossary change log) stays indexed, so text using an old rendering is found.
+
+``stale_chapters`` answers the re-term question: which edited chapters contain
+a term in the source but not its current rendering, or still carry an older
+one. ``pipeline --stage reterm`` re-edits only those (``--force`` re-edits all).
+
+    python -m translator.skills.term_index bqg/2013956118 --stale
+    python -m translator.skills.term_index bqg/2013956118 --term 星网
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from translator.config import book_root
+from translator.skills import glossary as glo
+from translator.skills.chapters import read_chapter
+
+INDEX_FILE = ".term_index.json"
+INDEX_VERSION = 1
+_LINE_BREAK = re.compile(r"\n\s*")
+
+
+def index_path(book_id: str) -> Path:
+    return book_root(book_id) / INDEX_FILE
+
+
+def _paragraph_starts(text: str) -> List[int]:
+    return [0] + [m.end() for m in _LINE_BREAK.finditer(text)]
+
+
+def _occurrences(text: str, forms: Iterable[str]) -> Dict[str, List[int]]:
+    """``{form: [paragraph number per occurrence]}`` for the forms found in ``text``."""
+    forms = [f for f in forms if f]
+    found: Dict[str, List[int]] = {}
+    if not forms or not text:
+        return found
+    if len(forms) < glo.AUTOMATON_MIN_TERMS:
+        hits = []
+        for idx, form in enumerate(forms):
+            pos = text.find(form)
+            while pos != -1:
+                hits.append((pos, idx))
+                pos = text.find(form, pos + 1)
+    else:
+        hits = glo.Automaton(forms).scan(text)
+    starts = _paragraph_starts(text)
+    for pos, idx in hits:
+        found.setdefault(forms[idx], []).append(bisect.bisect_right(starts, pos) - 1)
+    for paras in found.values():
+        paras.sort()
+    return found
+
+
+def _version(path: Path) -> Optional[List[int]]:
+    version = glo.file_version(path)
+    return list(version) if version is not None else None
+
+
+class TermIndex:
+    """A book's term-occurrence index; ``sync()`` brings it up to date."""
+
+    def __init__(self, book_id: str, data: Optional[Dict] = None) -> None:
+        self.book_id = book_id
+        self.root = book_root(book_id)
+        data = data if data and data.get("version") == INDEX_VERSION else {}
+        self.zh_forms: List[str] = data.get("zh_forms", [])
+        self.vi_forms: List[str] = data.get("vi_forms", [])
+        self.renderings: Dict[str, List[str]] = data.get("renderings", {})
+        self.chapters: Dict[str, Dict] = data.get("chapters", {})
+        self.current: Dict[str, str] = {}
+        self.scanned = 0
+
+    @classmethod
+    def load(cls, book_id: str) -> "TermIndex":
+        path = index_path(book_id)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            data = None  # missing or torn: rebuilt by sync()
+        return cls(book_id, data)
+
+    def save(self) -> Path:
+        path = index_path(self.book_id)
+        data = {
+            "version": INDEX_VERSION,
+            "zh_forms": self.zh_forms,
+            "vi_forms": self.vi_forms,
+            "renderings": self.renderings,
+            "chapters": self.chapters,
+        }
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    def _sync_glossary(self) -> None:
+        terms = glo.load_glossary(self.book_id)
+        self.current = {t["chinese"]: t["hanviet"] for t in terms}
+        history = [(c["chinese"], c["hanviet"]) for c in glo.change_history(self.book_id) if c.get("hanviet")]
+        renderings = {}
+        for chinese, hanviet in history + list(self.current.items()):
+            if chinese not in self.current:
+                continue
+            known = renderings.setdefault(chinese, list(self.renderings.get(chinese, [])))
+            if hanviet in known:
+                known.remove(hanviet)
+            known.append(hanviet)  # the current rendering is always last
+        self.renderings = renderings
+
+    def _sync_side(self, side: str, folder: str, forms: List[str], previous: List[str], lower: bool) -> None:
+        added = sorted(set(forms) - set(previous))
+        dropped = set(previous) - set(forms)
+        directory = self.root / folder
+        present = {p.name for p in directory.glob("chapter_*.md")} if directory.is_dir() else set()
+        for name in present:
+            chapter = self.chapters.setdefault(name, {})
+            entry = chapter.get(side)
+            version = _version(directory / name)
+            if entry is not None and entry["version"] == version and not added:
+                if dropped:
+                    entry["terms"] = {k: v for k, v in entry["terms"].items() if k not in dropped}
+                continue
+            text = read_chapter(directory / name).body
+            if lower:
+                text = text.lower()
+            if entry is None or entry["version"] != version:
+                chapter[side] = {"version": version, "terms": _occurrences(text, forms)}
+                self.scanned += 1
+            else:  # unchanged file, new terms only
+                terms = {k: v for k, v in entry["terms"].items() if k not in dropped}
+                terms.update(_occurrences(text, added))
+                entry["terms"] = terms
+        for name, chapter in list(self.chapters.items()):
+            if name not in present:
+                chapter.pop(side, None)
+            if not chapter:
+                del self.chapters[name]
+
+    def sync(self) -> "TermIndex":
+        """Rescan changed chapters and newly added terms; returns self."""
+        self._sync_glossary()
+        zh_forms = sorted(self.current)
+        vi_forms = sorted({r.lower() for known in self.renderings.values() for r in known})
+        self._sync_side("zh", "raw_chinese", zh_forms, self.zh_forms, lower=False)
+        self._sync_side("vi", "edited_vietnamese", vi_forms, self.vi_forms, lower=True)
+        self.zh_forms, self.vi_forms = zh_forms, vi_forms
+        return self
+
+    def occurrences(self, chinese: str) -> Dict[str, Dict[str, List[int]]]:
+        """Where a term occurs: ``{chapter: {"zh": [paragraphs], "vi": [paragraphs]}}``.
+
+        ``vi`` lists the paragraphs holding its current rendering.
+        """
+        current = self.current.get(chinese, "").lower()
+        found = {}
+        for name in sorted(self.chapters):
+            chapter = self.chapters[name]
+            zh = chapter.get("zh", {}).get("terms", {}).get(chinese)
+            if zh:
+                vi = chapter.get("vi", {}).get("terms", {}).get(current, [])
+                found[name] = {"zh": sorted(set(zh)), "vi": sorted(set(vi))}
+        return found
+
+    def stale_chapters(self, files: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        """Edited chapters the current glossary would change: ``{chapter: [chinese, ...]}``.
+
+        A chapter is stale for a term whose Chinese form is in its source when
+        its edited text lacks the current rendering, or holds an older rendering
+        more often than the current one accounts for (an old rendering may be
+        part of the new one, e.g. "Thu Thu" inside "Giang Thu Thu").
+        """
+        names = sorted(self.chapters) if files is None else [f for f in files if f in self.chapters]
+        stale = {}
+        for name in names:
+            chapter = self.chapters[name]
+            if "vi" not in chapter or "zh" not in chapter:
+                continue
+            zh, vi = chapter["zh"]["terms"], chapter["vi"]["terms"]
+            terms = []
+            for chinese in self.current:
+                if chinese not in zh:
+                    continue
+                current = self.current[chinese].lower()
+                n_current = len(vi.get(current, []))
+                old = (r.lower() for r in self.renderings.get(chinese, [])[:-1])
+                if not n_current or any(
+                    r != current and len(vi.get(r, [])) > n_current * current.count(r) for r in old
+                ):
+                    terms.append(chinese)
+            if terms:
+                stale[name] = terms
+        return stale
+
+
+def term_index(book_id: str) -> TermIndex:
+    """Load a book's index, bring it up to date and save it."""
+    index = TermIndex.load(book_id).sync()
+    if index.root.is_dir():
+        index.save()
+    return index
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Show where glossary terms occur in a book")
+    ap.add_argument("book_id")
+    ap.add_argument("--term", action="append", default=[], help="Chinese form to look up (repeatable)")
+    ap.add_argument("--stale", action="store_true", help="List edited chapters the current glossary would change")
+    args = ap.parse_args()
+
+    index = term_index(args.book_id)
+    print(f"{len(index.chapters)} chapter(s), {len(index.zh_forms)} term(s); rescanned {index.scanned} file(s).")
+    for chinese in args.term:
+        found = index.occurrences(chinese)
+        print(f"{chinese} → {index.current.get(chinese, '(not in glossary)')}: {len(found)} chapter(s)")
+        for name, where in found.items():
+            print(f"  {name}  zh ¶{where['zh']}  vi ¶{where['vi']}")
+    if args.stale:
+        stale = index.stale_chapters()
+        print(f"{len(stale)} chapter(s) to re-term:")
+        for name, terms in stale.items():
+            print(f"  {name}  {', '.join(f'{t} → {index.current[t]}' for t in terms)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+"""Chapter titles translated in batches, stored per book for translate_chapter.
+
+Translating each chapter's one-line title in its own request repeats the whole
+system prompt once per chapter (1,214 extra requests for a 1,214-chapter book).
+``translate_titles`` instead collects the untranslated titles of a range, sends
+them as numbered lists of up to ``pipeline.title_batch`` lines (with the
+glossary terms they contain), and checks that every reply maps one-to-one back
+onto its titles: each number once, nothing empty, no Chinese left. A batch
+that fails the check is split in half and retried, down to single titles
+with the per-chapter prompt.
+
+Results go to ``<book>/titles_vi.yaml``, keyed on chapter file and source
+title (a rescraped title is translated again) and stamped with the time they
+were stored. ``plan_chapter`` takes a stored title instead of planning a
+title request; a forced re-translation only takes one stored after the
+chapter's current output (i.e. re-batched for this run). A batch whose request
+fails (``LLMError``) is skipped and its chapters keep their per-chapter title
+request. The pipeline runs this before the translate stage
+(``pipeline.batch_titles``, on by default); by hand:
+
+    python -m translator.skills.titles bqg/2013956118 --range 1-200
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from translator.config import book_root, load_config
+from translator.llm.provider import LLMError
+from translator.llm.roles import chat_as
+from translator.skills import glossary as glo
+from translator.skills.chapters import contains_cjk, read_chapter
+
+logger = logging.getLogger(__name__)
+
+TITLES_FILE = "titles_vi.yaml"
+TITLES_PROMPT = (
+    "Dịch {n} tiêu đề chương sau. Trả về đúng {n} dòng theo đúng thứ tự, mỗi dòng giữ "
+    'nguyên số thứ tự ở đầu ("1. ..."), không thêm gì khác:\n{lines}'
+)
+_NUMBERED = re.compile(r"^\s*(\d+)\s*[.)、:：]\s*(.*?)\s*$")
+
+
+def titles_path(book_id: str) -> Path:
+    return book_root(book_id) / TITLES_FILE
+
+
+_cache: Dict[Path, Tuple[Optional[Tuple[int, int]], Dict[str, Dict]]] = {}
+_lock = threading.Lock()
+
+
+def load_titles(book_id: str) -> Dict[str, Dict]:
+    """``{chapter_file: {"source", "title", "at"}}``, parsed once per file version; read-only."""
+    path = titles_path(book_id)
+    version = glo.file_version(path)
+    with _lock:
+        cached = _cache.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    titles = (glo.read_yaml(path).get("titles") or {}) if version is not None else {}
+    with _lock:
+        _cache[path] = (version, titles)
+    return titles
+
+
+def stored_title(book_id: str, chapter_file: str, source: str, *, after: Optional[float] = None) -> Optional[str]:
+    """The batch-translated title of a chapter, if its source title is unchanged.
+
+    ``after``: only a title stored later than this (epoch seconds) counts.
+    """
+    entry = load_titles(book_id).get(chapter_file)
+    if not entry or entry.get("source") != source or not entry.get("title"):
+        return None
+    if after is not None and float(entry.get("at", 0)) <= after:
+        return None
+    return entry["title"]
+
+
+def _save(book_id: str, new: Dict[str, Dict]) -> None:
+    path = titles_path(book_id)
+    # Re-read under the book's lock, so concurrent runs add to each other's titles.
+    with glo.book_lock(book_id):
+        titles = (glo.read_yaml(path).get("titles") or {}) if path.exists() else {}
+        titles.update(new)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(yaml.safe_dump({"titles": titles}, allow_unicode=True, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, path)
+        with _lock:
+            _cache.pop(path, None)  # a same-size rewrite could look unchanged
+
+
+def parse_numbered(reply: str, n: int) -> Optional[List[str]]:
+    """The ``n`` titles of a numbered reply, in order, or None unless it maps one-to-one."""
+    found: Dict[int, str] = {}
+    for line in reply.splitlines():
+        m = _NUMBERED.match(line)
+        if not m:
+            continue
+        idx, text = int(m.group(1)), m.group(2).strip()
+        if idx in found or not 1 <= idx <= n or not text or contains_cjk(text):
+            return None
+        found[idx] = text
+    if len(found) != n:
+        return None
+    return [found[i] for i in range(1, n + 1)]
+
+
+def _translate_batch(system_for: Callable[[str], str], titles: List[str]) -> Tuple[List[str], int]:
+    """Translate ``titles`` in one request, halving the batch when the reply doesn't map back.
+
+    Returns the titles and the number of requests it took.
+    """
+    from translator.skills.translate_chapter import TITLE_PROMPT
+
+    if len(titles) == 1:
+        return [chat_as("translator", system_for(titles[0]), TITLE_PROMPT.format(title=titles[0])).strip()], 1
+    lines = "\n".join(f"{i}. {t}" for i, t in enumerate(titles, 1))
+    reply = chat_as("translator", system_for(lines), TITLES_PROMPT.format(n=len(titles), lines=lines))
+    parsed = parse_numbered(reply, len(titles))
+    if parsed is not None:
+        return parsed, 1
+    logger.warning("title batch of %d did not map one-to-one; splitting it", len(titles))
+    half = len(titles) // 2
+    first, a = _translate_batch(system_for, titles[:half])
+    second, b = _translate_batch(system_for, titles[half:])
+    return first + second, 1 + a + b
+
+
+def translate_titles(book_id: str, files: List[str], *, force: bool = False, batch: Optional[int] = None) -> Dict:
+    """Batch-translate the titles of ``files`` that have neither a stored title nor translated output.
+
+    Returns ``{"titles": translated, "requests": requests sent}``.
+    """
+    from translator.skills.translate_chapter import _load_translator_rules, _stable_system_prompt, _system_prompt
+
+    root = book_root(book_id)
+    batch = batch or int(load_config().get("pipeline", {}).get("title_batch", 100))
+    todo: List[Tuple[str, str]] = []
+    for name in files:
+        if not force and (root / "raw_vietnamese" / name).exists():
+            continue
+        title = read_chapter(root / "raw_chinese" / name).title
+        if title and title != "Untitled" and (force or stored_title(book_id, name, title) is None):
+            todo.append((name, title))
+    if not todo:
+        return {"titles": 0, "requests": 0}
+
+    rules = _load_translator_rules()
+    glossary = glo.compiled_glossary(book_id)
+    stable = load_config().get("pipeline", {}).get("prompt_layout", "per_chunk") == "stable_prefix"
+    stable_system = _stable_system_prompt(rules, glossary.terms) if stable else ""
+
+    def system_for(text: str) -> str:
+        return stable_system or _system_prompt(rules, glossary.relevant(text))
+
+    new: Dict[str, Dict] = {}
+    requests = 0
+    for start in range(0, len(todo), batch):
+        part = todo[start : start + batch]
+        try:
+            translated, sent = _translate_batch(system_for, [t for _, t in part])
+        except LLMError as e:
+            # Not fatal: translate_chapter sends these titles with their chapters.
+            logger.warning(
+                "title batch %d-%d of %s failed (%s); leaving it to translate_chapter", start + 1, start + len(part), book_id, e
+            )
+            continue
+        requests += sent
+        at = round(time.time(), 3)
+        new.update({name: {"source": source, "title": vi, "at": at} for (name, source), vi in zip(part, translated)})
+        _save(book_id, new)  # keep finished batches if a later one fails
+    logger.info("translated %d title(s) of %s in %d request(s)", len(new), book_id, requests)
+    return {"titles": len(new), "requests": requests}
+
+
+def main() -> int:
+    from translator.workflow.pipeline import _chapter_files, _parse_range
+
+    ap = argparse.ArgumentParser(description="Batch-translate chapter titles into titles_vi.yaml")
+    ap.add_argument("book_id")
+    ap.add_argument("--range", help="Chapter range, e.g. 1-200 or a single number")
+    ap.add_argument("--force", action="store_true", help="Retranslate stored titles and titles of translated chapters")
+    ap.add_argument("--batch", type=int, help="Titles per request (default pipeline.title_batch)")
+    args = ap.parse_args()
+    files = _chapter_files(args.book_id, _parse_range(args.range))
+    print(translate_titles(args.book_id, files, force=args.force, batch=args.batch))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
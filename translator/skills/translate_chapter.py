@@ -4,19 +4,50 @@ Replaces the old Google-Translate step. Reads <book>/raw_chinese/<file>, strips
 the markdown scaffolding, translates the title and body (paragraph-chunked) with
 the book glossary injected, and writes <book>/raw_vietnamese/<file>.
 
+The title and chunks are independent requests, so they run concurrently, up to
+``pipeline.chunk_concurrency`` per chapter, and are reassembled in order. All
+chapters translating in the process (e.g. the Prefect flow's parallel
+chapters) share one set of slots sized to the translator endpoints' capacity
+(``max_concurrency`` or ``pool_size``), so chapter-level and chunk-level
+fan-out together never oversubscribe the endpoint.
+
+Each finished request is appended to a sidecar checkpoint
+(``raw_vietnamese/.<file>.chunks.jsonl``) as it completes; the chapter file is
+written atomically once all are in and the sidecar is then removed. A run that
+dies mid-chapter (or a Prefect retry) resumes from the sidecar and only sends
+the requests still missing.
+
 Uses the "translator" role, so which model runs it is a config choice.
 """
 
 from __future__ import annotations
 
+import contextvars
+import hashlib
+import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple
 
 from translator.config import book_root, load_config
-from translator.llm.roles import chat_as
+from translator.llm.prompts import PromptAsset, load_asset
+from translator.llm.roles import chat_as, role_capacity, role_model
+from translator.llm.streaming import any_of, length_ratio_guard, repetition_guard
+from translator.llm.tokens import chunk_token_budget, tokenizer_for
 from translator.skills import glossary as glo
-from translator.skills.chapters import chunk_paragraphs, read_chapter, render_chapter
+from translator.skills.chapters import (
+    ChapterDoc,
+    chunk_paragraphs,
+    pack_paragraphs,
+    read_chapter,
+    render_chapter,
+    write_chapter,
+)
+from translator.skills.memory import Segments, format_hints, memory_context, translation_memory
+from translator.skills.titles import stored_title
 
 logger = logging.getLogger(__name__)
 
@@ -29,15 +60,183 @@ QUY TẮC BẮT BUỘC:
 3. Cấu trúc: Giữ nguyên cách phân đoạn/xuống dòng như bản gốc.
 4. CHỈ trả về bản dịch tiếng Việt, không kèm giải thích, không kèm bản gốc."""
 
+TITLE_PROMPT = "Dịch tiêu đề chương sau:\n{title}"
+CHECKPOINT_SUFFIX = ".chunks.jsonl"
 
-def _load_translator_rules() -> str:
+
+def _load_translator_rules() -> PromptAsset:
     """Base rules: repo TRANSLATOR.md if present, else the built-in default."""
     from translator.config import REPO_ROOT
 
-    path = REPO_ROOT / "TRANSLATOR.md"
-    if path.exists():
-        return path.read_text(encoding="utf-8")
-    return BASE_RULES
+    return load_asset(REPO_ROOT / "TRANSLATOR.md", BASE_RULES)
+
+
+@dataclass
+class ChapterPlan:
+    """Every translator request one chapter needs, in output order.
+
+    Shared by the synchronous skill below and the offline batch mode
+    (translator.workflow.batch), so both send byte-identical prompts unless
+    the translation memory is on: the skill then adds reference translations
+    to the system prompt and serves fully known chunks, batch mode does not.
+    """
+
+    title: str
+    title_request: Optional[Tuple[str, str]]  # (system, user); None if untitled or already translated
+    chunks: List[str]
+    chunk_requests: List[Tuple[str, str]]  # (system, user) per chunk
+    cache_prefix: bool = False  # every request shares one provider-cacheable system prompt
+    title_vi: Optional[str] = None  # batch-translated title (translator.skills.titles)
+
+
+def _system_prompt(base_rules: PromptAsset, terms: List[Dict[str, str]]) -> str:
+    return glo.glossary_prompt(base_rules, terms)
+
+
+def _stable_system_prompt(base_rules: PromptAsset, terms: List[Dict[str, str]]) -> str:
+    """Rules + the whole book glossary in a canonical order.
+
+    Identical for every chunk of every chapter until the glossary changes, so
+    providers with prefix caching serve it from cache after the first call.
+    """
+    return _system_prompt(base_rules, sorted(terms, key=lambda t: t["chinese"]))
+
+
+def plan_chapter(book_id: str, doc: ChapterDoc, chapter_file: Optional[str] = None, *, force: bool = False) -> ChapterPlan:
+    """Build the title + per-chunk prompts for a parsed raw Chinese chapter.
+
+    With ``chapter_file``, a title already translated by
+    ``translator.skills.titles`` is used as is instead of planning a request.
+    With ``force`` (re-translating existing output) only a title stored after
+    that output was written counts, so an old title is never carried over.
+
+    ``pipeline.prompt_layout`` picks the system prompt: ``per_chunk`` (default)
+    injects only the glossary terms each chunk contains; ``stable_prefix``
+    sends one byte-identical prompt (rules + full glossary) with every request
+    so the provider's prompt cache can reuse it and only the chunk varies.
+    """
+    base_rules = _load_translator_rules()
+    glossary = glo.compiled_glossary(book_id)
+    terms = glossary.terms
+    pipeline_cfg = load_config().get("pipeline", {})
+    max_chars = int(pipeline_cfg.get("chunk_chars", 4000))
+    stable = pipeline_cfg.get("prompt_layout", "per_chunk") == "stable_prefix"
+    stable_system = _stable_system_prompt(base_rules, terms) if stable else ""
+
+    def system_for(text: str) -> str:
+        return stable_system or _system_prompt(base_rules, glossary.relevant(text))
+
+    title_request = None
+    title_vi = None
+    if chapter_file:
+        out_path = book_root(book_id) / "raw_vietnamese" / chapter_file
+        after = out_path.stat().st_mtime if force and out_path.exists() else None
+        title_vi = stored_title(book_id, chapter_file, doc.title, after=after)
+    if doc.title and doc.title != "Untitled" and title_vi is None:
+        title_request = (system_for(doc.title), TITLE_PROMPT.format(title=doc.title))
+
+    # Body chunks. With a token budget (role context_window or
+    # pipeline.chunk_tokens) chunks are packed by the translator model's
+    # tokens; otherwise by characters.
+    budget = chunk_token_budget("translator", system_for(doc.body))
+    if budget:
+        chunks = pack_paragraphs(doc.body, budget, tokenizer_for("translator").count)
+    else:
+        chunks = chunk_paragraphs(doc.body, max_chars=max_chars)
+    chunk_requests = [(system_for(c), c) for c in chunks]
+    return ChapterPlan(
+        title=doc.title,
+        title_request=title_request,
+        chunks=chunks,
+        chunk_requests=chunk_requests,
+        cache_prefix=stable,
+        title_vi=title_vi,
+    )
+
+
+def assemble_chapter(title_vi: str, translated_chunks: List[str]) -> str:
+    """Render translated title + chunks into the raw_vietnamese file layout."""
+    return render_chapter(title_vi, "\n\n".join(c.strip() for c in translated_chunks))
+
+
+def checkpoint_path(out_path: Path) -> Path:
+    """Sidecar holding the finished requests of a chapter still being translated."""
+    return out_path.with_name(f".{out_path.name}{CHECKPOINT_SUFFIX}")
+
+
+class ChunkCheckpoint:
+    """Translated title/chunks of one chapter, persisted as they finish.
+
+    One JSONL line per finished request, keyed on the model and the exact
+    prompt (system prompt with its glossary subset, plus the source chunk), so
+    a resumed run reuses only results that the same request would reproduce.
+    """
+
+    def __init__(self, path: Path, model: str) -> None:
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._done: Dict[str, str] = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # a torn final line from a killed worker
+                    self._done[entry["key"]] = entry["text"]
+
+    def key(self, system: str, user: str) -> str:
+        blob = json.dumps([self.model, system, user], ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._done.get(key)
+
+    def put(self, key: str, text: str) -> None:
+        line = json.dumps({"key": key, "text": text}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._done[key] = text
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+_slots: Optional[Tuple[int, threading.BoundedSemaphore]] = None
+_slots_lock = threading.Lock()
+
+
+def _translator_slots() -> threading.BoundedSemaphore:
+    """Process-wide cap on in-flight translator calls, sized to the role's endpoints."""
+    global _slots
+    capacity = max(1, role_capacity("translator"))
+    with _slots_lock:
+        if _slots is None or _slots[0] != capacity:  # first use, or the config changed
+            _slots = (capacity, threading.BoundedSemaphore(capacity))
+        return _slots[1]
+
+
+def _run_requests(calls: List[Callable[[], str]], width: int) -> List[str]:
+    """Run ``calls`` with up to ``width`` in flight; results in call order."""
+    slots = _translator_slots()
+
+    def run(call: Callable[[], str]) -> str:
+        with slots:
+            return call()
+
+    if width <= 1 or len(calls) <= 1:
+        return [run(call) for call in calls]
+    with ThreadPoolExecutor(max_workers=min(width, len(calls)), thread_name_prefix="chunk") as pool:
+        # copy_context: keep the telemetry labels (book, chapter) on the worker threads.
+        futures = [pool.submit(contextvars.copy_context().run, run, call) for call in calls]
+        try:
+            return [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
 
 
 def translate_chapter(args: Dict) -> Dict:
@@ -60,30 +259,77 @@ def translate_chapter(args: Dict) -> Dict:
     if not in_path.exists():
         return {"chapter_file": chapter_file, "status": "error", "error": "raw_chinese file missing"}
 
-    doc = read_chapter(in_path)
-    base_rules = _load_translator_rules()
-    terms = glo.load_glossary(book_id)
-    max_chars = int(load_config().get("pipeline", {}).get("chunk_chars", 4000))
-
-    # Translate the title (usually short).
-    title_vi = doc.title
-    if doc.title and doc.title != "Untitled":
-        title_terms = glo.relevant_terms(doc.title, terms)
-        system = base_rules + ("\n\n" + glo.format_glossary_block(title_terms) if title_terms else "")
-        title_vi = chat_as("translator", system, f"Dịch tiêu đề chương sau:\n{doc.title}").strip()
-
-    # Translate the body chunk by chunk, injecting only relevant glossary terms.
-    chunks = chunk_paragraphs(doc.body, max_chars=max_chars)
-    translated = []
-    for idx, chunk in enumerate(chunks, 1):
-        chunk_terms = glo.relevant_terms(chunk, terms)
-        system = base_rules + ("\n\n" + glo.format_glossary_block(chunk_terms) if chunk_terms else "")
-        translated.append(chat_as("translator", system, chunk).strip())
-        logger.info("translated chunk %d/%d of %s", idx, len(chunks), chapter_file)
-
-    body_vi = "\n\n".join(translated)
-    out_path.write_text(render_chapter(title_vi, body_vi), encoding="utf-8")
-    return {"chapter_file": chapter_file, "status": "translated", "chunks": len(chunks)}
+    plan = plan_chapter(book_id, read_chapter(in_path), chapter_file, force=force)
+    pipeline_cfg = load_config().get("pipeline", {})
+    # Opt-in streaming: abort (and retry) a chunk whose output loops or balloons.
+    stream = bool(pipeline_cfg.get("stream", False))
+    width = int(pipeline_cfg.get("chunk_concurrency", 4))
+
+    checkpoint = ChunkCheckpoint(checkpoint_path(out_path), role_model("translator"))
+    memory = translation_memory()
+    glossary = glo.compiled_glossary(book_id)
+    context = memory_context("translator", _load_translator_rules()) if memory is not None else ""
+    # (source chunk, system, user, memory segments) per request; the title has no chunk.
+    requests: List[Tuple[Optional[str], str, str, Optional[Segments]]] = []
+    # Checkpoint keys come from the prompts before memory hints: a resumed run
+    # finds this run's own finished chunks in the memory, so its hints differ.
+    keys: List[str] = []
+    if plan.title_request:  # usually short: send it first, alongside the chunks
+        requests.append((None, *plan.title_request, None))
+        keys.append(checkpoint.key(*plan.title_request))
+    for chunk, (system, user) in zip(plan.chunks, plan.chunk_requests):
+        keys.append(checkpoint.key(system, user))
+        segments = None
+        if memory is not None:
+            # --force means "translate again": never serve, only hint and store.
+            segments = Segments(memory, book_id, "translate", glossary, chunk, context=context, serve=not force)
+            if not segments.complete:
+                hints = format_hints(segments.hints(include_served=True))
+                system = system + "\n\n" + hints if hints else system
+        requests.append((chunk, system, user, segments))
+
+    results: List[Optional[str]] = [
+        segments.text() if segments is not None and segments.complete else checkpoint.get(key)
+        for (_, _, _, segments), key in zip(requests, keys)
+    ]
+    pending = [i for i, text in enumerate(results) if text is None]
+    reused = len(results) - len(pending)
+    if reused:
+        logger.info("%s: %d/%d request(s) from translation memory or checkpoint", chapter_file, reused, len(results))
+
+    done = reused
+    done_lock = threading.Lock()
+
+    def request_call(i: int) -> Callable[[], str]:
+        chunk, system, user, segments = requests[i]
+
+        def call() -> str:
+            nonlocal done
+            guard = any_of(repetition_guard(), length_ratio_guard(user)) if stream and chunk is not None else None
+            text = chat_as(
+                "translator", system, user, stream=stream and chunk is not None, abort_if=guard, cache_prefix=plan.cache_prefix
+            ).strip()
+            if segments is not None:
+                segments.store(text)
+            checkpoint.put(keys[i], text)
+            with done_lock:
+                done += 1
+                logger.info("translated %d/%d request(s) of %s", done, len(requests), chapter_file)
+            return text
+
+        return call
+
+    for i, text in zip(pending, _run_requests([request_call(i) for i in pending], width)):
+        results[i] = text
+    title_vi = results.pop(0) if plan.title_request else plan.title_vi or plan.title
+    translated = results
+
+    write_chapter(out_path, assemble_chapter(title_vi, translated))
+    checkpoint.discard()
+    result = {"chapter_file": chapter_file, "status": "translated", "chunks": len(plan.chunks)}
+    if reused:
+        result["reused"] = reused
+    return result
 
 
 SCHEMA = {
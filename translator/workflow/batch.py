@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Offline batch mode for the translate stage.
+
+For large backfills (e.g. all 1,214 chapters of bqg/2013956118) per-chunk
+synchronous calls are the slowest and most expensive way to translate. This
+module runs the same requests ``translate_chapter`` would send, but as a batch:
+
+1. ``prepare`` — plan every untranslated chapter in a range and write one JSONL
+   line per request (title + body chunks) to ``<book>/batches/<name>/requests.jsonl``.
+2. ``submit``  — hand the file to a backend:
+     * ``openai``    — OpenAI Batch API (upload file, create /v1/batches job);
+     * ``anthropic`` — Anthropic Message Batches API;
+     * ``local``     — stand-in that works the file off against the translator
+       role's endpoint (any OpenAI-compatible server, Gemini, ...) with a thread
+       pool, through ``chat_as`` (response cache and rate limiter included).
+3. ``poll``    — refresh the remote job; download results once it finished.
+4. ``collect`` — reassemble ``raw_vietnamese/`` for every chapter whose title and
+   chunks all succeeded. Chapters with a failed request are left for the normal
+   pipeline to redo.
+
+``run`` does all four, polling until the job ends.
+
+Prompts come from ``translate_chapter.plan_chapter``, so they match what the
+synchronous skill sends with the translation memory off. The batch path does
+not consult the memory (``memory:``): it neither serves known chunks nor adds
+reference translations, so with the memory on the two paths can differ.
+
+Usage:
+    python -m translator.workflow.batch run --book bqg/2013956118 --range 1-1214 --backend local
+    python -m translator.workflow.batch prepare --book bqg/2013956118 --range 1-200
+    python -m translator.workflow.batch submit  --book bqg/2013956118 --batch <name> --backend openai
+    python -m translator.workflow.batch poll    --book bqg/2013956118 --batch <name>
+    python -m translator.workflow.batch collect --book bqg/2013956118 --batch <name>
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from translator.config import book_root
+from translator.llm.provider import Endpoint, LLMError, _backend, _client
+from translator.llm.roles import _resolve, chat_as
+from translator.skills.chapters import read_chapter, write_chapter
+from translator.skills.translate_chapter import assemble_chapter, plan_chapter
+from translator.workflow.pipeline import _chapter_files, _parse_range
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("batch")
+
+ROLE = "translator"
+BACKENDS = ("auto", "local", "openai", "anthropic")
+POLL_INTERVAL_S = 60
+
+
+def _batch_dir(book_id: str, name: str) -> Path:
+    return book_root(book_id) / "batches" / name
+
+
+def _load_state(bdir: Path) -> Dict:
+    path = bdir / "state.json"
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def _save_state(bdir: Path, state: Dict) -> None:
+    (bdir / "state.json").write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _read_jsonl(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _write_jsonl(path: Path, rows: List[Dict]) -> None:
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows), encoding="utf-8")
+
+
+# custom_id = "<chapter stem>-t" (title) or "<chapter stem>-c<NNN>" (chunk). Only
+# [A-Za-z0-9_-], which both batch APIs accept.
+def _custom_id(chapter_file: str, part: str) -> str:
+    return f"{chapter_file[:-3]}-{part}"
+
+
+def _split_id(custom_id: str) -> tuple[str, str]:
+    stem, part = custom_id.rsplit("-", 1)
+    return f"{stem}.md", part
+
+
+# --- prepare ----------------------------------------------------------------------
+
+
+def prepare(book_id: str, rng: Optional[tuple[int, int]] = None, *, force: bool = False, name: Optional[str] = None) -> str:
+    """Write requests.jsonl for every chapter in range still needing translation."""
+    root = book_root(book_id)
+    name = name or time.strftime("translate-%Y%m%d-%H%M%S")
+    bdir = _batch_dir(book_id, name)
+    bdir.mkdir(parents=True, exist_ok=True)
+
+    rows: List[Dict] = []
+    chapters: Dict[str, Dict] = {}
+    for f in _chapter_files(book_id, rng):
+        out = root / "raw_vietnamese" / f
+        if out.exists() and out.stat().st_size > 0 and not force:
+            continue
+        plan = plan_chapter(book_id, read_chapter(root / "raw_chinese" / f), f, force=force)
+        chapters[f] = {"title": plan.title_vi or plan.title, "chunks": len(plan.chunks), "has_title": plan.title_request is not None}
+        if plan.title_request:
+            system, user = plan.title_request
+            rows.append({"custom_id": _custom_id(f, "t"), "system": system, "user": user, "cache_prefix": plan.cache_prefix})
+        for idx, (system, user) in enumerate(plan.chunk_requests, 1):
+            rows.append(
+                {"custom_id": _custom_id(f, f"c{idx:03d}"), "system": system, "user": user, "cache_prefix": plan.cache_prefix}
+            )
+
+    _write_jsonl(bdir / "requests.jsonl", rows)
+    _save_state(bdir, {"book_id": book_id, "status": "prepared", "chapters": chapters, "requests": len(rows)})
+    logger.info("Prepared batch %s: %d request(s) for %d chapter(s).", name, len(rows), len(chapters))
+    return name
+
+
+# --- submit / poll ----------------------------------------------------------------
+
+
+def _pick_backend(backend: str, endpoint: Endpoint) -> str:
+    if backend != "auto":
+        return backend
+    if endpoint.provider == "anthropic":
+        return "anthropic"
+    if endpoint.provider == "openai" and "api.openai.com" in (endpoint.base_url or ""):
+        return "openai"
+    return "local"
+
+
+def submit(book_id: str, name: str, backend: str = "auto", workers: Optional[int] = None) -> Dict:
+    """Send a prepared batch to a backend. The local backend finishes before returning."""
+    bdir = _batch_dir(book_id, name)
+    state = _load_state(bdir)
+    rows = _read_jsonl(bdir / "requests.jsonl")
+    endpoint, model, temperature = _resolve(ROLE)
+    backend = _pick_backend(backend, endpoint)
+    state.update({"backend": backend, "model": model, "submitted_at": time.time()})
+
+    if backend == "local":
+        _run_local(bdir, rows, workers or endpoint.max_concurrency or endpoint.pool_size)
+        state["status"] = "completed"
+    elif backend == "openai":
+        state["remote_id"] = _openai_submit(bdir, rows, endpoint, model, temperature)
+        state["status"] = "submitted"
+    elif backend == "anthropic":
+        state["remote_id"] = _anthropic_submit(rows, endpoint, model, temperature)
+        state["status"] = "submitted"
+    else:
+        raise ValueError(f"unknown batch backend: {backend}")
+    _save_state(bdir, state)
+    logger.info("Batch %s: %s via %s", name, state["status"], backend)
+    return state
+
+
+def poll(book_id: str, name: str) -> Dict:
+    """Refresh a submitted job; writes results.jsonl when it has finished."""
+    bdir = _batch_dir(book_id, name)
+    state = _load_state(bdir)
+    if state.get("status") != "submitted":
+        return state
+    endpoint, _, _ = _resolve(ROLE)
+    if state["backend"] == "openai":
+        done = _openai_poll(bdir, state["remote_id"], endpoint)
+    else:
+        done = _anthropic_poll(bdir, state["remote_id"], endpoint)
+    if done:
+        state["status"] = "completed"
+        _save_state(bdir, state)
+    return state
+
+
+def _run_local(bdir: Path, rows: List[Dict], workers: int) -> None:
+    """Stand-in backend: work the file off with a thread pool via chat_as."""
+
+    def one(row: Dict) -> Dict:
+        try:
+            text = chat_as(ROLE, row["system"], row["user"], cache_prefix=row.get("cache_prefix", False))
+            return {"custom_id": row["custom_id"], "text": text.strip()}
+        except LLMError as e:
+            return {"custom_id": row["custom_id"], "error": str(e)}
+
+    logger.info("Running %d request(s) locally with %d worker(s) ...", len(rows), workers)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(one, rows))
+    _write_jsonl(bdir / "results.jsonl", results)
+
+
+def _http(endpoint: Endpoint, method: str, url: str, headers: Dict[str, str], **kwargs):
+    resp = _client(endpoint).request(method, url, headers=headers, timeout=300, **kwargs)
+    if resp.status_code >= 300:
+        raise LLMError(f"HTTP {resp.status_code}: {resp.text[:300]}")
+    return resp
+
+
+def _openai_submit(bdir: Path, rows: List[Dict], endpoint: Endpoint, model: str, temperature: float) -> str:
+    build, _ = _backend("openai")
+    lines = []
+    for row in rows:
+        _, _, payload = build(
+            row["system"], row["user"], endpoint, model, temperature, None, cache_prefix=row.get("cache_prefix", False)
+        )
+        lines.append({"custom_id": row["custom_id"], "method": "POST", "url": "/v1/chat/completions", "body": payload})
+    _write_jsonl(bdir / "openai_input.jsonl", lines)
+
+    base = endpoint.base_url.rstrip("/")
+    auth = {"Authorization": f"Bearer {endpoint.api_key}"}
+    with open(bdir / "openai_input.jsonl", "rb") as f:
+        uploaded = _http(endpoint, "POST", f"{base}/files", auth, data={"purpose": "batch"}, files={"file": f}).json()
+    job = _http(
+        endpoint,
+        "POST",
+        f"{base}/batches",
+        auth,
+        json={"input_file_id": uploaded["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h"},
+    ).json()
+    return job["id"]
+
+
+def _openai_poll(bdir: Path, remote_id: str, endpoint: Endpoint) -> bool:
+    base = endpoint.base_url.rstrip("/")
+    auth = {"Authorization": f"Bearer {endpoint.api_key}"}
+    job = _http(endpoint, "GET", f"{base}/batches/{remote_id}", auth).json()
+    logger.info("openai batch %s: %s %s", remote_id, job.get("status"), job.get("request_counts"))
+    if job.get("status") not in ("completed", "failed", "expired", "cancelled"):
+        return False
+    _, parse = _backend("openai")
+    results: List[Dict] = []
+    for file_key in ("output_file_id", "error_file_id"):
+        if not job.get(file_key):
+            continue
+        content = _http(endpoint, "GET", f"{base}/files/{job[file_key]}/content", auth).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            resp = item.get("response") or {}
+            if resp.get("status_code") == 200:
+                results.append({"custom_id": item["custom_id"], "text": (parse(resp["body"]) or "").strip()})
+            else:
+                results.append({"custom_id": item["custom_id"], "error": str(item.get("error") or resp)[:300]})
+    _write_jsonl(bdir / "results.jsonl", results)
+    return True
+
+
+def _anthropic_headers(endpoint: Endpoint) -> Dict[str, str]:
+    return {"x-api-key": endpoint.api_key or "", "anthropic-version": "2023-06-01", "Content-Type": "application/json"}
+
+
+def _anthropic_submit(rows: List[Dict], endpoint: Endpoint, model: str, temperature: float) -> str:
+    build, _ = _backend("anthropic")
+    requests_ = []
+    for row in rows:
+        _, _, payload = build(
+            row["system"], row["user"], endpoint, model, temperature, None, cache_prefix=row.get("cache_prefix", False)
+        )
+        requests_.append({"custom_id": row["custom_id"], "params": payload})
+    base = (endpoint.base_url or "https://api.anthropic.com").rstrip("/")
+    job = _http(
+        endpoint, "POST", f"{base}/v1/messages/batches", _anthropic_headers(endpoint), json={"requests": requests_}
+    ).json()
+    return job["id"]
+
+
+def _anthropic_poll(bdir: Path, remote_id: str, endpoint: Endpoint) -> bool:
+    base = (endpoint.base_url or "https://api.anthropic.com").rstrip("/")
+    headers = _anthropic_headers(endpoint)
+    job = _http(endpoint, "GET", f"{base}/v1/messages/batches/{remote_id}", headers).json()
+    logger.info("anthropic batch %s: %s %s", remote_id, job.get("processing_status"), job.get("request_counts"))
+    if job.get("processing_status") != "ended":
+        return False
+    _, parse = _backend("anthropic")
+    results: List[Dict] = []
+    for line in _http(endpoint, "GET", job["results_url"], headers).text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        result = item.get("result") or {}
+        if result.get("type") == "succeeded":
+            results.append({"custom_id": item["custom_id"], "text": (parse(result["message"]) or "").strip()})
+        else:
+            results.append({"custom_id": item["custom_id"], "error": str(result)[:300]})
+    _write_jsonl(bdir / "results.jsonl", results)
+    return True
+
+
+# --- collect ----------------------------------------------------------------------
+
+
+def collect(book_id: str, name: str) -> Dict:
+    """Write raw_vietnamese/ for every chapter whose requests all succeeded."""
+    root = book_root(book_id)
+    bdir = _batch_dir(book_id, name)
+    state = _load_state(bdir)
+    texts: Dict[str, Dict[str, str]] = {}
+    errors: Dict[str, str] = {}
+    for r in _read_jsonl(bdir / "results.jsonl"):
+        chapter_file, part = _split_id(r["custom_id"])
+        if r.get("text"):
+            texts.setdefault(chapter_file, {})[part] = r["text"]
+        else:
+            errors[chapter_file] = r.get("error") or "empty response"
+
+    written, incomplete = [], []
+    for chapter_file, meta in state.get("chapters", {}).items():
+        parts = texts.get(chapter_file, {})
+        chunk_ids = [f"c{i:03d}" for i in range(1, meta["chunks"] + 1)]
+        missing = [p for p in chunk_ids + (["t"] if meta["has_title"] else []) if p not in parts]
+        if missing or chapter_file in errors:
+            incomplete.append(chapter_file)
+            continue
+        title_vi = parts["t"] if meta["has_title"] else meta["title"]
+        out = root / "raw_vietnamese" / chapter_file
+        out.parent.mkdir(parents=True, exist_ok=True)
+        write_chapter(out, assemble_chapter(title_vi, [parts[p] for p in chunk_ids]))
+        written.append(chapter_file)
+
+    state["collected"] = len(written)
+    state["incomplete"] = incomplete
+    _save_state(bdir, state)
+    logger.info("Collected %d chapter(s); %d incomplete (re-run the translate stage for those).", len(written), len(incomplete))
+    return {"written": written, "incomplete": incomplete}
+
+
+def run(book_id: str, rng: Optional[tuple[int, int]] = None, *, backend: str = "auto", force: bool = False) -> Dict:
+    """prepare -> submit -> poll until done -> collect."""
+    name = prepare(book_id, rng, force=force)
+    state = submit(book_id, name, backend)
+    while state.get("status") == "submitted":
+        time.sleep(POLL_INTERVAL_S)
+        state = poll(book_id, name)
+    return collect(book_id, name)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Batch-mode translate stage")
+    ap.add_argument("command", choices=["prepare", "submit", "poll", "collect", "run"])
+    ap.add_argument("--book", required=True, help="Book id, e.g. bqg/2013956118")
+    ap.add_argument("--range", help="Chapter range for prepare/run, e.g. 1-200")
+    ap.add_argument("--batch", help="Batch name (from prepare) for submit/poll/collect")
+    ap.add_argument("--backend", default="auto", choices=BACKENDS)
+    ap.add_argument("--workers", type=int, help="Local backend: parallel requests")
+    ap.add_argument("--force", action="store_true", help="Include chapters that already have output")
+    args = ap.parse_args()
+
+    if args.command == "run":
+        run(args.book, _parse_range(args.range), backend=args.backend, force=args.force)
+        return 0
+    if args.command == "prepare":
+        print(prepare(args.book, _parse_range(args.range), force=args.force))
+        return 0
+    if not args.batch:
+        ap.error("--batch is required for submit/poll/collect")
+    if args.command == "submit":
+        print(json.dumps(submit(args.book, args.batch, args.backend, args.workers), ensure_ascii=False, indent=2))
+    elif args.command == "poll":
+        state = poll(args.book, args.batch)
+        print(state.get("status"))
+    else:
+        collect(args.book, args.batch)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Load-test the pipeline against the deterministic mock LLM server.
+
+Copies a real book's source chapters, glossary and style guide into a scratch
+workspace, starts ``translator.llm.mock_server`` in-process, points every role
+at it and runs the chosen stage through the normal runner (``pipeline`` or the
+Prefect ``flows``). Nothing in the book directory is touched and no real
+endpoint is called, so the numbers measure our own overhead and concurrency:
+chunking, glossary handling, retries, rate limiting and routing.
+
+Reported: chapters/minute, p50/p95 chapter latency (per skill and end to end),
+LLM calls and statuses, and the peak / mean number of requests the server saw
+in flight.
+
+CLI:
+    python -m translator.workflow.benchmark --book 52shuku/bjXRF --range 1-20 --latency-ms 300
+    python -m translator.workflow.benchmark --book 52shuku/bjXRF --runner flows --concurrency 8 --json bench.json
+    python -m translator.workflow.benchmark --book 52shuku/bjXRF --replay .cache/cassettes/prod.jsonl --replay-scale 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import yaml
+
+from translator.config import book_root, load_config
+from translator.llm import cache as llm_cache
+from translator.llm import cassette, mock_server
+from translator.skills import TOOL_REGISTRY
+from translator.workflow import pipeline
+
+_BOOK_FILES = ("book.yaml", "glossary.yaml", "EDITOR.md")
+_CHAPTER_TOOLS = ("translate_chapter", "edit_chapter", "qa_chapter")
+
+
+def _workspace(book_id: str, rng: Optional[tuple[int, int]], dest: Path) -> Path:
+    """Copy the book's inputs (not its outputs) into ``dest``."""
+    src = book_root(book_id)
+    if not (src / "raw_chinese").is_dir():
+        raise SystemExit(f"{book_id}: no raw_chinese/ to benchmark with")
+    dest.mkdir(parents=True, exist_ok=True)
+    for name in _BOOK_FILES:
+        if (src / name).exists():
+            shutil.copy2(src / name, dest / name)
+    (dest / "raw_chinese").mkdir(exist_ok=True)
+    for name in pipeline._chapter_files(book_id, rng):
+        shutil.copy2(src / "raw_chinese" / name, dest / "raw_chinese" / name)
+    return dest
+
+
+def _mock_config(base: Dict, server: mock_server.MockLLMServer, provider: str, scratch: Path, stream: bool) -> Dict:
+    """The live config with every role routed to the mock server."""
+    cfg = copy.deepcopy(base)
+    base_url = server.openai_base_url if provider == "openai" else server.base_url
+    cfg["endpoints"] = {"mock": {"provider": provider, "base_url": base_url, "api_key": "mock", "pool_size": 64}}
+    roles = {}
+    for name, rc in (cfg.get("roles") or {}).items():
+        rc = {k: v for k, v in rc.items() if k not in ("endpoint", "endpoints", "fallback")}
+        rc["endpoint"] = "mock"
+        rc["model"] = rc.get("model") or "mock-model"
+        roles[name] = rc
+    cfg["roles"] = roles
+    cfg["cache"] = {**(cfg.get("cache") or {}), "enabled": False}
+    cfg["rate_limit"] = {**(cfg.get("rate_limit") or {}), "path": str(scratch / "ratelimit.sqlite")}
+    cfg["memory"] = {**(cfg.get("memory") or {}), "path": str(scratch / "memory.sqlite")}
+    cfg["telemetry"] = {"enabled": True, "trace": str(scratch / "calls.jsonl"), "textfile": None, "port": None}
+    cfg["cassette"] = {"mode": None}
+    cfg.setdefault("pipeline", {})["stream"] = stream
+    return cfg
+
+
+def _timed_tools(spans: List[dict]) -> Dict[str, tuple]:
+    """Wrap the chapter skills in TOOL_REGISTRY to time each call; returns the originals."""
+    originals = {name: TOOL_REGISTRY[name] for name in _CHAPTER_TOOLS}
+
+    def wrap(name: str, fn: Callable[[dict], dict]) -> Callable[[dict], dict]:
+        def timed(args: dict) -> dict:
+            started = time.monotonic()
+            result = fn(args)
+            spans.append({"tool": name, "chapter": args.get("chapter_file"), "s": time.monotonic() - started, "result": result})
+            return result
+
+        return timed
+
+    for name, (schema, fn) in originals.items():
+        TOOL_REGISTRY[name] = (schema, wrap(name, fn))
+    return originals
+
+
+def _quantiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50_s": None, "p95_s": None}
+    ordered = sorted(values)
+
+    def q(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 2)
+
+    return {"p50_s": q(0.5), "p95_s": q(0.95)}
+
+
+def _run_flows(book_id: str, stage: str, rng: Optional[tuple[int, int]], concurrency: int, use_critic: bool) -> None:
+    try:
+        from prefect.task_runners import ThreadPoolTaskRunner
+
+        from translator.workflow import flows
+    except ImportError as e:
+        raise SystemExit(f"--runner flows needs Prefect (pip install -r requirements-prefect.txt): {e}")
+    flow = flows.book_flow.with_options(task_runner=ThreadPoolTaskRunner(max_workers=concurrency))
+    flow(book_id, stage=stage, rng=rng, use_critic=use_critic)
+
+
+def benchmark(
+    book_id: str,
+    *,
+    stage: str = "all",
+    rng: Optional[tuple[int, int]] = None,
+    runner: str = "pipeline",
+    concurrency: int = 4,
+    use_critic: bool = False,
+    provider: str = "openai",
+    stream: bool = False,
+    mock: Optional[mock_server.MockConfig] = None,
+    replay: Optional[str] = None,
+    replay_scale: float = 1.0,
+    keep: bool = False,
+) -> Dict:
+    """Run one stage over a scratch copy of ``book_id`` against a mock server; returns the report.
+
+    With ``replay`` the calls are answered from a recorded cassette instead,
+    and only prompts it lacks reach the mock server.
+    """
+    scratch = Path(tempfile.mkdtemp(prefix="translator-bench-"))
+    # An absolute book id: book_root() resolves it as-is, never to the real book.
+    work = _workspace(book_id, rng, scratch / "book")
+    server = mock_server.MockLLMServer(mock or mock_server.MockConfig()).start()
+    cfg_path = scratch / "config.yaml"
+    cfg_path.write_text(
+        yaml.safe_dump(_mock_config(load_config(), server, provider, scratch, stream), allow_unicode=True),
+        encoding="utf-8",
+    )
+    previous_cfg = os.environ.get("TRANSLATOR_CONFIG")
+    os.environ["TRANSLATOR_CONFIG"] = str(cfg_path)
+    load_config.cache_clear()
+    llm_cache.disable()
+    tape = cassette.start("replay", replay, latency_scale=replay_scale, on_miss="live") if replay else None
+
+    spans: List[dict] = []
+    originals = _timed_tools(spans)
+    started = time.monotonic()
+    try:
+        if runner == "flows":
+            _run_flows(str(work), stage, None, concurrency, use_critic)
+        else:
+            pipeline.run(str(work), stage=stage, use_critic=use_critic)
+        elapsed = time.monotonic() - started
+    finally:
+        TOOL_REGISTRY.update(originals)
+        server.stop()
+        if previous_cfg is None:
+            os.environ.pop("TRANSLATOR_CONFIG", None)
+        else:
+            os.environ["TRANSLATOR_CONFIG"] = previous_cfg
+        load_config.cache_clear()
+        if not keep:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    per_chapter: Dict[str, float] = defaultdict(float)
+    per_tool: Dict[str, List[float]] = defaultdict(list)
+    for span in spans:
+        per_chapter[span["chapter"]] += span["s"]
+        per_tool[span["tool"]].append(span["s"])
+    # The fix loop may QA a chapter more than once; its last verdict counts.
+    qa = {s["chapter"]: s["result"] for s in spans if s["tool"] == "qa_chapter"}
+    chapters = len(per_chapter)
+    stats = server.stats()
+    report = {
+        "book": book_id,
+        "stage": stage,
+        "runner": runner,
+        "provider": provider,
+        "mock": asdict(server.config),
+        "chapters": chapters,
+        "elapsed_s": round(elapsed, 1),
+        "chapters_per_min": round(60 * chapters / elapsed, 2) if elapsed > 0 else None,
+        "chapter_latency": _quantiles(list(per_chapter.values())),
+        "skills": {name: {"calls": len(v), **_quantiles(v)} for name, v in per_tool.items()},
+        "qa_clean": sum(1 for r in qa.values() if r.get("ok")) if qa else None,
+        "llm": stats,
+        "cassette": tape.counts if tape is not None else None,
+        "workspace": str(scratch) if keep else None,
+    }
+    return report
+
+
+def _print_report(r: Dict) -> None:
+    lat = r["chapter_latency"]
+    llm = r["llm"]
+    print(f"\n{r['book']} · {r['stage']} · {r['runner']} · mock {r['provider']}")
+    print(f"  chapters        {r['chapters']} in {r['elapsed_s']}s  ({r['chapters_per_min']} chapters/min)")
+    print(f"  chapter latency p50 {lat['p50_s']}s  p95 {lat['p95_s']}s")
+    for name, s in r["skills"].items():
+        print(f"    {name:<18} {s['calls']:>4} call(s)  p50 {s['p50_s']}s  p95 {s['p95_s']}s")
+    if r["qa_clean"] is not None:
+        print(f"  QA clean        {r['qa_clean']}/{r['chapters']}")
+    print(f"  LLM requests    {llm['requests']}  by status {llm['by_status']}")
+    print(f"  LLM in flight   peak {llm['peak_inflight']}  mean {llm['mean_inflight']}")
+    if r["cassette"]:
+        print(f"  cassette        {r['cassette']['replayed']} replayed, {r['cassette']['missed']} sent to the mock")
+    if r["workspace"]:
+        print(f"  workspace kept  {r['workspace']}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the pipeline against a mock LLM server")
+    ap.add_argument("--book", required=True, help="Book to copy chapters from, e.g. 52shuku/bjXRF")
+    ap.add_argument("--stage", default="all", choices=["translate", "all"], help="translate, or translate+edit+qa")
+    ap.add_argument("--range", help="Chapter range, e.g. 1-20 or a single number")
+    ap.add_argument("--runner", default="pipeline", choices=["pipeline", "flows"])
+    ap.add_argument("--concurrency", type=int, default=4, help="Prefect worker threads (--runner flows)")
+    ap.add_argument("--critic", action="store_true", help="Include the LLM critic in QA")
+    ap.add_argument("--provider", default="openai", choices=["openai", "anthropic", "google"], help="Wire format")
+    ap.add_argument("--stream", action="store_true", help="Stream translator replies (pipeline.stream)")
+    mock_server.add_arguments(ap)
+    ap.add_argument("--replay", metavar="PATH", help="Answer calls from a recorded cassette (misses go to the mock)")
+    ap.add_argument("--replay-scale", type=float, default=1.0, help="Scale recorded latencies (0 = instant)")
+    ap.add_argument("--json", help="Also write the report to this file")
+    ap.add_argument("--keep", action="store_true", help="Keep the scratch workspace (outputs, trace)")
+    args = ap.parse_args()
+
+    report = benchmark(
+        args.book,
+        stage=args.stage,
+        rng=pipeline._parse_range(args.range),
+        runner=args.runner,
+        concurrency=args.concurrency,
+        use_critic=args.critic,
+        provider=args.provider,
+        stream=args.stream,
+        mock=mock_server.config_from_args(args),
+        replay=args.replay,
+        replay_scale=args.replay_scale,
+        keep=args.keep,
+    )
+    _print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,7 +5,10 @@ The new-workflow way to seed a glossary: instead of scraping an existing
 EDITOR.md, this sends the first N (default 5) raw Chinese chapters to the LLM and
 asks it to extract proper nouns — character/place/sect/technique/item names — as
 ``chinese -> hanviet`` (Sino-Vietnamese / Hán Việt) pairs. The result is *merged*
-into ``<book>/glossary.yaml``: existing (human-curated) terms are preserved.
+into the book's glossary: existing (human-curated) terms are preserved. New
+terms go through ``update_terms`` (one locked append to the change log), which
+re-checks what is already there under the glossary lock, so terms added by a
+concurrent ``glossary_update`` during the extraction call are kept.
 
 Which model runs the extraction is a config choice — the "glossary" role in
 config.yaml (low temperature by default). See translator/config.py.
@@ -34,7 +37,7 @@ from translator.config import book_root
 from translator.llm.provider import LLMError
 from translator.llm.roles import chat_as
 from translator.skills.chapters import read_chapter
-from translator.skills.glossary import glossary_path, load_glossary
+from translator.skills.glossary import load_glossary, update_terms
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("extract_glossary")
@@ -122,10 +125,11 @@ def _to_entry(item: Dict[str, str]) -> Dict[str, str]:
 
 
 def extract(book_id: str, chapters: int = 5, force: bool = False) -> Dict:
-    """Extract terms from the first `chapters` chapters and merge into glossary.yaml.
+    """Extract terms from the first `chapters` chapters and merge them with the glossary.
 
-    Returns a dict with the merged term list plus added/updated/skipped counts.
-    Does not write to disk — the caller decides (see main()).
+    Returns a dict with the merged term list, the entries to write (``changes``:
+    the added and, with ``force``, the updated ones) and added/updated/skipped
+    counts. Does not write to disk — the caller decides (see main()).
     """
     files = _leading_chapters(book_id, chapters)
     if not files:
@@ -143,6 +147,7 @@ def extract(book_id: str, chapters: int = 5, force: bool = False) -> Dict:
     order: List[str] = [t["chinese"] for t in existing]
 
     added = updated = skipped = 0
+    changes: List[Dict[str, str]] = []
     for item in extracted:
         entry = _to_entry(item)
         zh = entry["chinese"]
@@ -152,15 +157,18 @@ def extract(book_id: str, chapters: int = 5, force: bool = False) -> Dict:
             added += 1
         elif force:
             # Keep an existing role/note if the model didn't supply richer info.
-            merged = {**by_chinese[zh], **entry}
-            by_chinese[zh] = merged
+            entry = {**by_chinese[zh], **entry}
+            by_chinese[zh] = entry
             updated += 1
         else:
             skipped += 1
+            continue
+        changes.append(entry)
 
     terms = [by_chinese[zh] for zh in order]
     return {
         "terms": terms,
+        "changes": changes,
         "added": added,
         "updated": updated,
         "skipped": skipped,
@@ -182,23 +190,21 @@ def main() -> int:
         logger.error("%s", e)
         return 1
 
-    doc = {"terms": result["terms"]}
-    out = yaml.safe_dump(doc, allow_unicode=True, sort_keys=False)
-
     if args.print_only:
-        print(out)
+        print(yaml.safe_dump({"terms": result["terms"]}, allow_unicode=True, sort_keys=False))
         logger.info(
             "Dry run: %d added, %d updated, %d skipped (%d total).",
             result["added"], result["updated"], result["skipped"], len(result["terms"]),
         )
         return 0
 
-    path = glossary_path(args.book_id)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(out, encoding="utf-8")
+    # Re-checked under the glossary lock: a term that appeared since load_glossary is
+    # only replaced with --force, and nothing written meanwhile is dropped.
+    written = update_terms(args.book_id, result["changes"], replace=args.force)
     logger.info(
-        "Wrote %d term(s) to %s (%d added, %d updated, %d skipped).",
-        len(result["terms"]), path, result["added"], result["updated"], result["skipped"],
+        "Glossary of %s now has %d term(s) (%d added, %d updated, %d skipped).",
+        args.book_id, written["total"], written["added"], written["updated"],
+        result["skipped"] + written["skipped"],
     )
     return 0
 
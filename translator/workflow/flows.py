@@ -13,6 +13,10 @@ Parity with pipeline.py:
 - **Option A concurrency**: translation fans out in parallel (independent per
   chapter); editing/re-terming run sequentially per book so each chapter can use
   the previous *edited* chapter as style context (see pipeline._prev_edited_text).
+- **Chunk fan-out**: within a chapter, translate_chapter sends its title and
+  chunks concurrently (``pipeline.chunk_concurrency``). All chapters share one
+  in-flight cap sized to the translator endpoints' ``max_concurrency`` (or
+  ``pool_size``), so ``--concurrency`` x chunk fan-out never oversubscribes them.
 
 Stages: scrape | translate | edit | qa | reterm | all.
 
@@ -23,7 +27,9 @@ Run:
 
 Global rate limiting (optional, needs a Prefect server): all LLM tasks carry the
 ``llm`` tag, so a tag concurrency limit caps concurrent LLM calls across every
-run:  ``prefect concurrency-limit create llm 4``.
+run:  ``prefect concurrency-limit create llm 4``. Request/token *rate* pacing
+is handled per endpoint by the client itself (``rpm``/``tpm`` in config.yaml,
+see translator.llm.ratelimit), with or without a server.
 """
 
 from __future__ import annotations
@@ -37,11 +43,23 @@ from prefect import flow, get_run_logger, task
 from prefect.task_runners import ThreadPoolTaskRunner
 
 from translator.config import book_root, load_config
-from translator.skills import call_tool
+from translator.llm import cache as llm_cache
+from translator.llm import cassette
+from translator.llm import telemetry
+from translator.llm import usage as llm_usage
+from translator.skills import call_tool, memory
+from translator.skills.term_index import index_path, term_index
 
 # Reuse the pipeline's chapter-selection and range helpers verbatim — no
 # duplicated logic, and behavior stays identical to the deterministic runner.
-from translator.workflow.pipeline import _chapter_files, _parse_range, _prev_edited_text
+from translator.workflow.pipeline import (
+    _batch_titles,
+    _chapter_files,
+    _pack_chapters,
+    _parse_range,
+    _prev_edited_text,
+    _stale_files,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -189,6 +207,8 @@ def book_flow(
             return {"scrape": res}
 
     files = _chapter_files(book_id, rng)
+    if stage == "reterm" and not force:
+        files = _stale_files(book_id, files)
     if limit is not None:
         files = files[:limit]
     if not files:
@@ -196,9 +216,11 @@ def book_flow(
         return {"processed": 0}
     logger.info("Book %s: %d chapter(s), stage=%s", book_id, len(files), stage)
 
-    # Parallel fidelity translation (independent per chapter).
+    # Parallel fidelity translation (independent per chapter), titles batched up front.
     if stage in ("translate", "all"):
-        futures = [translate_task.submit(book_id, f, force) for f in files]
+        _batch_titles(book_id, files, force)
+        packed = _pack_chapters(book_id, files, force)
+        futures = [translate_task.submit(book_id, f, force) for f in files if f not in packed]
         for fut in futures:
             fut.result()
         if stage == "translate":
@@ -219,6 +241,15 @@ def book_flow(
         if r.get("qa_ok"):
             clean += 1
         logger.info("%s", r)
+    if index_path(book_id).exists():
+        term_index(book_id)  # index the new edits now rather than on the next reterm
+    logger.info("LLM cache: %s", llm_cache.stats())
+    logger.info("Translation memory: %s", memory.stats())
+    logger.info("LLM usage: %s", llm_usage.totals.snapshot())
+    tape = cassette.active()
+    if tape is not None:
+        logger.info("Cassette %s: %s", tape.path, tape.counts)
+    logger.info("LLM telemetry: %s", telemetry.finish())
     return {"processed": len(files), "clean": clean}
 
 
@@ -228,12 +259,22 @@ def main() -> None:
     ap.add_argument("--stage", default="all", choices=["scrape", "translate", "edit", "qa", "reterm", "all"])
     ap.add_argument("--range", help="Chapter range, e.g. 1-10 or a single number")
     ap.add_argument("--limit", type=int, help="Max chapters to process this run")
-    ap.add_argument("--force", action="store_true", help="Redo stages even if output exists")
+    ap.add_argument(
+        "--force", action="store_true", help="Redo stages even if output exists (reterm: every chapter, not just stale ones)"
+    )
     ap.add_argument("--critic", action="store_true", help="Use LLM critic in QA")
     ap.add_argument("--source-url", help="TOC URL for the scrape stage")
-    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel translations (default 4)")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel chapter translations (default 4)")
+    ap.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache")
+    ap.add_argument("--metrics-port", type=int, help="Serve Prometheus LLM metrics on this port during the run")
+    cassette.add_arguments(ap)
     args = ap.parse_args()
 
+    if args.no_cache:
+        llm_cache.disable()
+    telemetry.serve(args.metrics_port)
+    cassette.from_args(args)
+
     runner = ThreadPoolTaskRunner(max_workers=args.concurrency)
     book_flow.with_options(task_runner=runner)(
         args.book,
@@ -17,6 +17,8 @@ import argparse
 import sys
 
 from translator.config import book_root
+from translator.skills.chapters import write_chapter
+from translator.skills.glossary import Automaton
 
 # Per-book safe replacement maps: {book_id: {old_rendering: new_rendering}}.
 # Only distinctive strings — never substrings that occur as ordinary words.
@@ -41,19 +43,18 @@ def main() -> int:
 
     edited = book_root(args.book_id) / "edited_vietnamese"
     files = sorted(edited.glob("chapter_*.md"))
+    # One pass per chapter for all mappings (leftmost-longest, non-overlapping).
+    automaton = Automaton(list(repl))
     total_files = 0
     total_hits = 0
     for f in files:
-        text = f.read_text(encoding="utf-8")
-        hits = sum(text.count(old) for old in repl)
+        text, hits = automaton.replace(f.read_text(encoding="utf-8"), repl)
         if not hits:
             continue
         total_files += 1
         total_hits += hits
         if args.apply:
-            for old, new in repl.items():
-                text = text.replace(old, new)
-            f.write_text(text, encoding="utf-8")
+            write_chapter(f, text)
 
     verb = "Replaced" if args.apply else "Would replace"
     print(f"{verb} {total_hits} occurrence(s) across {total_files} chapter(s).")
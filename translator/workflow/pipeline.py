@@ -22,11 +22,19 @@ import argparse
 import logging
 import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from translator.config import book_root, load_config
+from translator.llm import cache as llm_cache
+from translator.llm import cassette
+from translator.llm import telemetry
+from translator.llm import usage as llm_usage
 from translator.skills import call_tool
-from translator.skills.chapters import read_chapter
+from translator.skills import memory
+from translator.skills.chapters import chapter_cache_stats, read_chapter
+from translator.skills.term_index import index_path, term_index
+from translator.skills.packing import translate_packed
+from translator.skills.titles import translate_titles
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("pipeline")
@@ -58,11 +66,16 @@ def process_chapter(
     force: bool = False,
     use_critic: bool = False,
     max_fix: int = 2,
+    translated: Optional[dict] = None,
 ) -> dict:
-    """Run translate -> edit -> qa (+auto-fix) for one chapter."""
+    """Run translate -> edit -> qa (+auto-fix) for one chapter.
+
+    ``translated``: the chapter's translate result if it was already
+    translated in a packed request (translator.skills.packing).
+    """
     result = {"chapter_file": chapter_file}
 
-    t = call_tool("translate_chapter", {"book_id": book_id, "chapter_file": chapter_file, "force": force})
+    t = translated or call_tool("translate_chapter", {"book_id": book_id, "chapter_file": chapter_file, "force": force})
     result["translate"] = t["status"]
     if t["status"] == "error":
         return result
@@ -143,6 +156,31 @@ def reterm_chapter(
     return result
 
 
+def _stale_files(book_id: str, files: List[str]) -> List[str]:
+    """The chapters of ``files`` whose edited text the current glossary would change."""
+    stale = term_index(book_id).stale_chapters(files)
+    logger.info("Term index: %d of %d chapter(s) need re-terming.", len(stale), len(files))
+    for name, terms in stale.items():
+        logger.debug("%s: %s", name, ", ".join(terms))
+    return [f for f in files if f in stale]
+
+
+def _batch_titles(book_id: str, files: List[str], force: bool) -> None:
+    """Translate the chapters' titles in a few packed requests ahead of the translate stage."""
+    if not load_config().get("pipeline", {}).get("batch_titles", True):
+        return
+    r = translate_titles(book_id, files, force=force)
+    if r["titles"]:
+        logger.info("Titles: %d translated in %d request(s).", r["titles"], r["requests"])
+
+
+def _pack_chapters(book_id: str, files: List[str], force: bool) -> Dict[str, dict]:
+    """Translate runs of short chapters in shared requests; results of the chapters written."""
+    if not load_config().get("pipeline", {}).get("pack_chapters", True):
+        return {}
+    return translate_packed(book_id, files, force=force)
+
+
 def run(
     book_id: str,
     *,
@@ -155,7 +193,8 @@ def run(
 ) -> None:
     cfg = load_config().get("pipeline", {})
     max_fix = int(cfg.get("max_fix_attempts", 2))
-    delay = float(cfg.get("request_delay_s", 1.0))
+    # Legacy fixed pacing; the per-endpoint rate limiter makes it unnecessary.
+    delay = float(cfg.get("request_delay_s", 0.0))
 
     if stage in ("scrape", "all") and source_url:
         logger.info("Scraping %s ...", book_id)
@@ -164,10 +203,16 @@ def run(
             return
 
     files = _chapter_files(book_id, rng)
+    if stage == "reterm" and not force:
+        files = _stale_files(book_id, files)
     if not files:
         logger.warning("No chapters found for %s (range=%s)", book_id, rng)
         return
     logger.info("Processing %d chapter(s) of %s [stage=%s]", len(files), book_id, stage)
+    packed: Dict[str, dict] = {}
+    if stage in ("translate", "all"):
+        _batch_titles(book_id, files[:limit] if limit is not None else files, force)
+        packed = _pack_chapters(book_id, files[:limit] if limit is not None else files, force)
 
     done = 0
     clean = 0
@@ -176,7 +221,7 @@ def run(
             logger.info("Reached limit of %d", limit)
             break
         if stage == "translate":
-            r = call_tool("translate_chapter", {"book_id": book_id, "chapter_file": f, "force": force})
+            r = packed.get(f) or call_tool("translate_chapter", {"book_id": book_id, "chapter_file": f, "force": force})
         elif stage == "edit":
             prev = _prev_edited_text(book_id, f)
             r = call_tool("edit_chapter", {"book_id": book_id, "chapter_file": f, "force": force, "previous_context": prev})
@@ -187,17 +232,40 @@ def run(
             if r.get("qa_ok"):
                 clean += 1
         else:  # all
-            r = process_chapter(book_id, f, force=force, use_critic=use_critic, max_fix=max_fix)
+            r = process_chapter(book_id, f, force=force, use_critic=use_critic, max_fix=max_fix, translated=packed.get(f))
             if r.get("qa_ok"):
                 clean += 1
         logger.info("%s", r)
         done += 1
-        time.sleep(delay)
+        if delay > 0:
+            time.sleep(delay)
 
     if stage in ("all", "reterm"):
         logger.info("Done. %d processed, %d passed QA clean.", done, clean)
     else:
         logger.info("Done. %d processed.", done)
+    if stage in ("edit", "all", "reterm") and index_path(book_id).exists():
+        term_index(book_id)  # index the new edits now rather than on the next reterm
+    chapter_stats = chapter_cache_stats()
+    logger.info("Chapter cache: %d hit(s), %d miss(es).", chapter_stats["hits"], chapter_stats["misses"])
+    tm = memory.stats()
+    if tm["hits"] or tm["stored"]:
+        logger.info(
+            "Translation memory: %d paragraph(s) served (%d source chars), %d stored, %d hint(s).",
+            tm["hits"], tm["chars_served"], tm["stored"], tm["hinted"],
+        )
+    cache_stats = llm_cache.stats()
+    if cache_stats["hits"] or cache_stats["misses"]:
+        logger.info("LLM cache: %d hit(s), %d miss(es).", cache_stats["hits"], cache_stats["misses"])
+    for name, u in llm_usage.totals.snapshot().items():
+        logger.info(
+            "LLM usage %s: %d call(s), %d prompt token(s) (%.0f%% from provider cache), %d completion token(s).",
+            name, u["calls"], u["prompt_tokens"], 100 * u["cache_hit_rate"], u["completion_tokens"],
+        )
+    tape = cassette.active()
+    if tape is not None:
+        logger.info("Cassette %s: %s", tape.path, tape.counts)
+    telemetry.finish()
 
 
 def _parse_range(s: Optional[str]) -> Optional[tuple[int, int]]:
@@ -216,11 +284,20 @@ def main() -> None:
     ap.add_argument("--stage", default="all", choices=["scrape", "translate", "edit", "qa", "reterm", "all"])
     ap.add_argument("--range", help="Chapter range, e.g. 1-10 or a single number")
     ap.add_argument("--limit", type=int, help="Max chapters to process this run")
-    ap.add_argument("--force", action="store_true", help="Redo stages even if output exists")
+    ap.add_argument(
+        "--force", action="store_true", help="Redo stages even if output exists (reterm: every chapter, not just stale ones)"
+    )
     ap.add_argument("--critic", action="store_true", help="Use LLM critic in QA")
     ap.add_argument("--source-url", help="TOC URL for the scrape stage")
+    ap.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache")
+    ap.add_argument("--metrics-port", type=int, help="Serve Prometheus LLM metrics on this port during the run")
+    cassette.add_arguments(ap)
     args = ap.parse_args()
 
+    if args.no_cache:
+        llm_cache.disable()
+    telemetry.serve(args.metrics_port)
+    cassette.from_args(args)
     run(
         args.book,
         stage=args.stage,